@@ -0,0 +1,46 @@
+"""
+Compare the latency of exact name lookups against the unanchored regex
+searches handles used to make, on a stand-in WAPI seeded with a large
+number of A records.
+
+    PYTHONPATH=. python benchmarks/bench_lookup.py [records] [lookups]
+"""
+import sys
+import time
+import infoblox
+from infoblox.test.fake_wapi import FakeWAPI
+
+
+def bench(iblox, names, regex):
+    start = time.time()
+    for name in names:
+        iblox.a(name, regex=regex).fetch()
+    return (time.time() - start) / len(names) * 1000
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    server = FakeWAPI().start()
+    server.load('record:a', [{'name': 'host{0}.example.com'.format(i),
+                              'ipv4addr': '10.{0}.{1}.{2}'.format(
+                                  i >> 16, (i >> 8) & 255, i & 255)}
+                             for i in range(records)])
+    iblox = infoblox.infoblox(auth=server.auth)
+    step = max(1, records // lookups)
+    names = ['host{0}.example.com'.format(i)
+             for i in range(0, records, step)][:lookups]
+
+    exact = bench(iblox, names, False)
+    regex = bench(iblox, names, True)
+    print('{0} records, {1} lookups'.format(records, len(names)))
+    print('regex (name~=): {0:8.2f} ms/lookup'.format(regex))
+    print('exact (name=):  {0:8.2f} ms/lookup'.format(exact))
+    print('speedup:        {0:8.1f}x'.format(regex / exact))
+
+    del(iblox)
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Compare WAPI calls per second over the pooled keep-alive session against one
+connection per call, using the in-process stand-in WAPI.
+
+    PYTHONPATH=. python benchmarks/bench_pool.py [calls]
+"""
+import sys
+import time
+import requests
+import infoblox
+from infoblox.test.fake_wapi import FakeWAPI
+
+
+def bench_unpooled(iblox, calls):
+    url = iblox._url('record:host?name=foo.example.com')
+    headers = {'Authorization': 'Basic {0}'.format(iblox.creds),
+               'Accept': 'application/json'}
+    start = time.time()
+    for _ in range(calls):
+        requests.get(url, headers=headers, verify=False)
+    return calls / (time.time() - start)
+
+
+def bench_pooled(iblox, calls):
+    start = time.time()
+    for _ in range(calls):
+        iblox.get('record:host?name=foo.example.com')
+    return calls / (time.time() - start)
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    server = FakeWAPI().start()
+    iblox = infoblox.infoblox(auth=server.auth)
+    iblox.host('foo.example.com').add('10.0.0.1')
+
+    unpooled = bench_unpooled(iblox, calls)
+    connections = server.connections
+    pooled = bench_pooled(iblox, calls)
+    print('connection per call: {0:8.1f} calls/s ({1} connections)'
+          .format(unpooled, connections))
+    print('pooled keep-alive:   {0:8.1f} calls/s ({1} connections)'
+          .format(pooled, server.connections - connections))
+    print('speedup:             {0:8.2f}x'.format(pooled / unpooled))
+
+    del(iblox)
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Compare the memory held by a listing kept as the dicts json returns against
+the same listing kept as compact records, for host and A records.
+
+    PYTHONPATH=. python benchmarks/bench_records.py [records]
+"""
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from infoblox import _internal
+
+
+def hosts(records):
+    return [{'_ref': 'record:host/ZG5zLmhvc3QkLl9kZWZhdWx0{0}:h{0}.example.com'
+                     '/default'.format(i),
+             'name': 'h{0}.example.com'.format(i),
+             'view': 'default',
+             'zone': 'example.com',
+             'ipv4addrs': [{'_ref': 'record:host_ipv4addr/ZG5zLmhvc3RfYWRk{0}:'
+                                    '10.{1}.{2}.{3}/h{0}.example.com/default'
+                                    .format(i, i >> 16, (i >> 8) & 255,
+                                            i & 255),
+                            'host': 'h{0}.example.com'.format(i),
+                            'ipv4addr': '10.{0}.{1}.{2}'.format(
+                                i >> 16, (i >> 8) & 255, i & 255),
+                            'mac': '00:50:56:{0:02x}:{1:02x}:{2:02x}'.format(
+                                i >> 16, (i >> 8) & 255, i & 255),
+                            'configure_for_dhcp': False}]}
+            for i in range(records)]
+
+
+def a_records(records):
+    return [{'_ref': 'record:a/ZG5zLmJpbmRfYSQuX2RlZmF1bHQ{0}:a{0}.example.com'
+                     '/default'.format(i),
+             'name': 'a{0}.example.com'.format(i),
+             'ipv4addr': '10.{0}.{1}.{2}'.format(i >> 16, (i >> 8) & 255,
+                                                 i & 255),
+             'view': 'default',
+             'zone': 'example.com'}
+            for i in range(records)]
+
+
+def measure(text, objtype, compact):
+    gc.collect()
+    tracemalloc.start()
+    start = time.time()
+    parser = _internal._json_stream()
+    objects = list(_internal._iter_stream([text], parser))
+    if compact:
+        objects = [_internal._to_record(objtype, obj) for obj in objects]
+    elapsed = time.time() - start
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del(objects)
+    return held / 1048576.0, elapsed
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print('{0} records'.format(records))
+    for objtype, build in (('record:host', hosts), ('record:a', a_records)):
+        text = json.dumps(build(records)).encode('utf-8')
+        as_dict, dict_s = measure(text, objtype, False)
+        compact, compact_s = measure(text, objtype, True)
+        print('{0:12} dict: {1:7.1f} MiB {2:5.2f} s  compact: {3:7.1f} MiB '
+              '{4:5.2f} s  {5:4.1f}x'.format(objtype, as_dict, dict_s, compact,
+                                            compact_s, as_dict / compact))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Compare the response bytes of a _ref lookup that asks only for the _ref
+against one returning the default fields, for host records carrying many
+addresses and extensible attributes.
+
+    PYTHONPATH=. python benchmarks/bench_refbytes.py [records] [addresses]
+"""
+import sys
+import infoblox
+from infoblox.test.fake_wapi import FakeWAPI
+
+
+def bench(iblox, names, **return_fields):
+    metrics = iblox.metrics()
+    for name in names:
+        iblox.host(name).fetch(**return_fields)
+    iblox.remove_hook(metrics)
+    stats = metrics.stats()[('GET', 'record:host')]
+    return stats['received'] / float(stats['count']), stats['latency']
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    addresses = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    server = FakeWAPI().start()
+    server.load('record:host', [{
+        'name': 'host{0}.example.com'.format(i),
+        'ipv4addrs': [{'ipv4addr': '10.{0}.{1}.{2}'.format(i >> 8, i & 255, j),
+                       'mac': '00:00:00:00:{0:02x}:{1:02x}'.format(i & 255, j),
+                       'configure_for_dhcp': True}
+                      for j in range(addresses)],
+        'extattrs': {'Owner': {'value': 'team{0}'.format(i)},
+                     'Site': {'value': 'dc1'}}}
+        for i in range(records)])
+    iblox = infoblox.infoblox(auth=server.auth, cache_size=0)
+    names = ['host{0}.example.com'.format(i) for i in range(records)]
+
+    full, full_ms = bench(iblox, names)
+    ref, ref_ms = bench(iblox, names, _ref=True)
+    print('{0} host records with {1} addresses'.format(records, addresses))
+    print('default fields: {0:9.0f} bytes/lookup {1:6.2f} ms'
+          .format(full, full_ms * 1000))
+    print('_ref only:      {0:9.0f} bytes/lookup {1:6.2f} ms'
+          .format(ref, ref_ms * 1000))
+    print('reduction:      {0:9.1f}x'.format(full / ref))
+
+    del(iblox)
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Compare the time a full grid restart takes to finish against restarting only
+the members serving the zones and networks a few writes touched, on a
+stand-in WAPI where every member restarted in turn takes a fixed time.
+
+    PYTHONPATH=. python benchmarks/bench_restart.py [members] [seconds]
+"""
+import sys
+import time
+import infoblox
+from infoblox.test.fake_wapi import FakeWAPI
+
+
+def wait(grid):
+    start = time.time()
+    while infoblox._internal.grid._restarting(grid.restart_status()):
+        time.sleep(0.01)
+    return time.time() - start
+
+
+def main():
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    per_member = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    server = FakeWAPI().start()
+    server.restart_time = per_member
+    names = ['m{0}.example.com'.format(i) for i in range(members)]
+    server.load('member', [{'host_name': n} for n in names])
+    # Every zone and network is served by a pair of members
+    server.load('zone_auth', [{'fqdn': 'z{0}.example.com'.format(i),
+                               'grid_primary': [{'name': names[i]}],
+                               'grid_secondaries': [
+                                   {'name': names[(i + 1) % members]}]}
+                              for i in range(0, members, 2)])
+    server.load('network', [{'network': '10.{0}.0.0/24'.format(i),
+                             'members': [{'name': names[i]},
+                                         {'name': names[(i + 1) % members]}]}
+                            for i in range(0, members, 2)])
+    iblox = infoblox.infoblox(auth=server.auth, track_changes=True)
+    grid = iblox.grid()
+
+    start = time.time()
+    grid.restart(sequential_delay=0)
+    full = time.time() - start + wait(grid)
+
+    iblox.a('www.z0.example.com').add('10.100.0.1')
+    iblox.a('www.z2.example.com').add('10.100.0.2')
+    iblox.host('h.z4.example.com').add('10.4.0.10', '00:50:56:00:00:01')
+    start = time.time()
+    calls = iblox.restart_affected(sequential_delay=0)
+    targeted = time.time() - start + wait(grid)
+
+    print('{0} members, {1} s per member restarted in turn'.format(
+        members, per_member))
+    print('full restart:      {0:6.2f} s  {1} members'.format(full, members))
+    print('restart_affected:  {0:6.2f} s  {1} members in {2} calls'.format(
+        targeted, sum(len(c['members']) for c in calls), len(calls)))
+    print('speedup:           {0:6.1f}x'.format(full / targeted))
+
+    del(iblox)
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Measure the latency of a short-lived script: importing the module,
+instantiating the client and making a first lookup, each run in a fresh
+interpreter against a stand-in WAPI seeded with many host records. The
+regex host search the client used to validate credentials with is replayed
+for comparison.
+
+    PYTHONPATH=. python benchmarks/bench_startup.py [records] [runs]
+"""
+import json
+import os
+import subprocess
+import sys
+from infoblox.test.fake_wapi import FakeWAPI
+
+SCRIPT = """
+import json, sys, time
+start = time.time()
+import infoblox
+auth = json.loads(sys.argv[1])
+iblox = infoblox.infoblox(auth=auth, keepalive=None,
+                          lazy_auth=sys.argv[2] != 'probe')
+if sys.argv[2] == 'legacy':
+    iblox.get('record:host?name~={0}'.format(auth['url']))
+iblox.a('host0.example.com').fetch()
+print(time.time() - start)
+"""
+
+
+def bench(server, mode, runs):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))] +
+        [p for p in [env.get('PYTHONPATH')] if p])
+    times = []
+    for _ in range(runs):
+        out = subprocess.check_output(
+                  [sys.executable, '-c', SCRIPT, json.dumps(server.auth),
+                   mode], env=env)
+        times.append(float(out))
+    return sorted(times)[len(times) // 2] * 1000
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    server = FakeWAPI().start()
+    server.load('record:host', [{'name': 'host{0}.example.com'.format(i),
+                                 'ipv4addrs': [{'ipv4addr': '10.{0}.{1}.{2}'
+                                                .format(i >> 16,
+                                                        (i >> 8) & 255,
+                                                        i & 255)}]}
+                                for i in range(records)])
+    server.load('record:a', [{'name': 'host0.example.com',
+                              'ipv4addr': '10.0.0.0'}])
+    print('{0} host records, median of {1} runs'.format(records, runs))
+    for mode, label in (('legacy', 'regex host probe'),
+                        ('probe', 'grid probe'),
+                        ('lazy', 'lazy_auth=True')):
+        print('{0:18} {1:8.1f} ms'.format(label + ':',
+                                          bench(server, mode, runs)))
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
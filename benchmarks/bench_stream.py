@@ -0,0 +1,65 @@
+"""
+Compare the peak memory of reading a large search result whole with
+json.loads against decoding it incrementally with iter_get. The stand-in
+WAPI runs in a separate process so only the client's allocations are
+traced.
+
+    PYTHONPATH=. python benchmarks/bench_stream.py [records]
+"""
+import json
+import multiprocessing
+import sys
+import time
+import tracemalloc
+import infoblox
+from infoblox.test.fake_wapi import FakeWAPI
+
+
+def serve(records, queue):
+    server = FakeWAPI().start()
+    server.load('record:a', [{'name': 'host{0}.example.com'.format(i),
+                              'ipv4addr': '10.{0}.{1}.{2}'.format(
+                                  i >> 16, (i >> 8) & 255, i & 255),
+                              'comment': 'benchmark record {0}'.format(i)}
+                             for i in range(records)])
+    queue.put(server.auth)
+    while True:
+        time.sleep(60)
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.time()
+    count = func()
+    elapsed = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, peak / 1048576.0, elapsed
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=serve, args=(records, queue))
+    proc.daemon = True
+    proc.start()
+    iblox = infoblox.infoblox(auth=queue.get(), keepalive=None)
+    query = 'record:a?_return_fields=name,ipv4addr,comment'
+
+    def whole():
+        return sum(1 for _ in json.loads(iblox.get(query).text))
+
+    def streamed():
+        return sum(1 for _ in iblox.iter_get(query))
+
+    print('{0} records'.format(records))
+    for label, func in (('json.loads', whole), ('iter_get', streamed)):
+        count, peak, elapsed = measure(func)
+        print('{0:11} {1:8d} objects {2:8.1f} MiB peak {3:6.2f} s'
+              .format(label + ':', count, peak, elapsed))
+    del(iblox)
+    proc.terminate()
+
+
+if __name__ == '__main__':
+    main()
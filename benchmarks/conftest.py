@@ -0,0 +1,73 @@
+"""
+pytest benchmark suite for the handle methods, run against the in-process
+stand-in WAPI. It is skipped unless INFOBLOX_BENCH is set, so it never slows
+down the regular test run:
+
+    INFOBLOX_BENCH=1 python -m pytest -q benchmarks
+
+INFOBLOX_BENCH_OPS sets the calls made per method (default 200) and
+INFOBLOX_BENCH_LATENCY the seconds of latency the server adds to every
+request (default 0). ops/sec and p50/p99 latency per method are printed at
+the end of the run.
+"""
+import os
+import pytest
+import infoblox
+from infoblox.test.fake_wapi import FakeWAPI
+
+RESULTS = []
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.environ.get('INFOBLOX_BENCH'):
+        return
+    skip = pytest.mark.skip(reason='set INFOBLOX_BENCH=1 to run benchmarks')
+    for item in items:
+        if 'benchmarks' in str(item.fspath):
+            item.add_marker(skip)
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not RESULTS:
+        return
+    write = terminalreporter.write_line
+    terminalreporter.section('handle benchmarks')
+    write('{0:28} {1:>7} {2:>10} {3:>9} {4:>9}'.format(
+        'method', 'calls', 'ops/sec', 'p50 ms', 'p99 ms'))
+    for label, stats in RESULTS:
+        write('{0:28} {count:7d} {throughput:10.1f} {p50:9.2f} {p99:9.2f}'
+              .format(label, **stats))
+
+
+@pytest.fixture(scope='session')
+def ops():
+    return int(os.environ.get('INFOBLOX_BENCH_OPS', 200))
+
+
+@pytest.fixture(scope='session')
+def wapi():
+    server = FakeWAPI(
+        latency=float(os.environ.get('INFOBLOX_BENCH_LATENCY', 0))).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(scope='session')
+def iblox(wapi):
+    client = infoblox.infoblox(auth=wapi.auth, keepalive=None)
+    yield client
+    del(client)
+
+
+@pytest.fixture
+def bench(iblox):
+    def run(label, operation, items):
+        """
+        run - Time an operation over items one call at a time and record
+              its ops/sec and latency percentiles for the summary
+        """
+        bulk = iblox.map(operation, items, workers=1)
+        assert bulk.errors == []
+        RESULTS.append((label, bulk.stats()))
+        return bulk.results
+    return run
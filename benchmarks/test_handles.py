@@ -0,0 +1,110 @@
+"""
+Per-method benchmarks of the record handles. See conftest.py for how to run
+them.
+"""
+
+
+def names(kind, n):
+    return ['{0}{1}.bench.example.com'.format(kind, i) for i in range(n)]
+
+
+def ips(octet, n):
+    return ['10.{0}.{1}.{2}'.format(octet, i >> 8, i & 255)
+            for i in range(n)]
+
+
+def test_host(iblox, bench, ops):
+    items = list(zip(names('host', ops), ips(10, ops)))
+    bench('host.add', lambda i: iblox.host(i[0]).add(i[1]), items)
+    bench('host.fetch', lambda i: iblox.host(i[0]).fetch(), items)
+    bench('host.update', lambda i: iblox.host(i[0]).update(ttl=60), items)
+    bench('host.alias.add',
+          lambda i: iblox.host(i[0]).alias().add('alias-' + i[0]), items)
+    bench('host.delete', lambda i: iblox.host(i[0]).delete(), items)
+
+
+def test_a(iblox, bench, ops):
+    items = list(zip(names('a', ops), ips(11, ops)))
+    bench('a.add', lambda i: iblox.a(i[0]).add(i[1]), items)
+    bench('a.fetch', lambda i: iblox.a(i[0]).fetch(), items)
+    bench('a.update', lambda i: iblox.a(i[0]).update(ttl=60), items)
+    bench('a.delete', lambda i: iblox.a(i[0]).delete(), items)
+
+
+def test_cname(iblox, bench, ops):
+    items = names('cname', ops)
+    bench('cname.add',
+          lambda n: iblox.cname(n).add('target.example.com'), items)
+    bench('cname.fetch', lambda n: iblox.cname(n).fetch(), items)
+    bench('cname.update', lambda n: iblox.cname(n).update(ttl=60), items)
+    bench('cname.delete', lambda n: iblox.cname(n).delete(), items)
+
+
+def test_srv(iblox, bench, ops):
+    items = ['_http._tcp.' + n for n in names('srv', ops)]
+    bench('srv.add',
+          lambda n: iblox.srv(n, 80).add('target.example.com'), items)
+    bench('srv.fetch', lambda n: iblox.srv(n, 80).fetch(), items)
+    bench('srv.update', lambda n: iblox.srv(n, 80).update(weight=10), items)
+    bench('srv.delete', lambda n: iblox.srv(n, 80).delete(), items)
+
+
+def test_mx(iblox, wapi, bench, ops):
+    items = names('mx', ops)
+    wapi.load('record:mx', [{'name': n, 'mail_exchanger': 'mail.' + n,
+                             'preference': 10} for n in items])
+    bench('mx.fetch', lambda n: iblox.mx(n).fetch(), items)
+
+
+def test_rpz_cname(iblox, bench, ops):
+    items = ['rpz{0}'.format(i) for i in range(ops)]
+    bench('rpz_cname.add',
+          lambda n: iblox.rpz_cname(n).add('', 'rpz.example.com'), items)
+    bench('rpz_cname.fetch',
+          lambda n: iblox.rpz_cname(n, zone='rpz.example.com').fetch(),
+          items)
+    bench('rpz_cname.delete',
+          lambda n: iblox.rpz_cname(n, zone='rpz.example.com').delete(),
+          items)
+
+
+def test_lease(iblox, wapi, bench, ops):
+    items = ips(12, ops)
+    wapi.load('lease', [{'address': ip, 'network_view': 'default'}
+                        for ip in items])
+    bench('lease.fetch', lambda ip: iblox.lease(ip).fetch(), items)
+
+
+def test_subnet(iblox, wapi, bench, ops):
+    wapi.load('network', [{'network': '10.13.0.0/16',
+                           'network_view': 'default'}])
+    subnet = iblox.subnet('10.13.0.0/16')
+    bench('subnet.next_available_ip',
+          lambda i: subnet.next_available_ip(), range(ops))
+    bench('subnet_from_ip',
+          lambda ip: iblox.subnet_from_ip(ip), ips(13, ops))
+
+
+def test_grid(iblox, bench, ops):
+    bench('grid.restart', lambda i: iblox.grid().restart(), range(ops))
+
+
+def test_listing(iblox, wapi, bench, ops):
+    wapi.load('record:a', [{'name': n, 'ipv4addr': ip} for n, ip in
+                           zip(names('list', ops * 10), ips(14, ops * 10))])
+    bench('iter_a (page_size=100)',
+          lambda i: sum(1 for _ in iblox.iter_a(page_size=100)),
+          range(max(1, ops // 20)))
+
+
+def test_batch(iblox, bench, ops):
+    items = [list(zip(names('batch{0}-'.format(i), 100), ips(15, 100)))
+             for i in range(max(1, ops // 20))]
+
+    def add(chunk):
+        with iblox.batch() as b:
+            for name, ip in chunk:
+                b.a(name).add(ip)
+        return b.errors
+
+    bench('batch of 100 a.add', add, items)
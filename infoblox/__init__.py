@@ -1,2 +1,12 @@
 from .infoblox import *
 from .test import *
+
+
+def __getattr__(name):
+    # aiohttp is slow to import, so the asyncio client is only loaded when
+    # it is first asked for
+    if name == 'AsyncInfoblox':
+        from .aio import AsyncInfoblox
+        return AsyncInfoblox
+    raise AttributeError("module 'infoblox' has no attribute '{0}'"
+                         .format(name))
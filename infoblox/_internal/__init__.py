@@ -7,3 +7,16 @@ from .mx import _mx
 from .srv import _srv
 from .subnet import _subnet
 from .rpz_cname import _rpz_cname
+from .batch import _batch
+from .cache import _ref_cache
+from .netindex import _network_index
+from .bulk import _bulk
+from .metrics import _emit, _metrics, _statsd
+from .retry import _breaker, _retry
+from .ratelimit import _rate_limiter
+from .stream import _iter_stream, _json_stream
+from .records import _fetched, _to_record
+from .csvio import _csv_export, _csv_import
+from .reconcile import _reconcile
+from .restart import _restart_scheduler
+from .affected import _affected, _change_tracker, _restart_calls
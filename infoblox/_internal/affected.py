@@ -0,0 +1,317 @@
+"""
+Targeted service restarts. Successful writes are recorded as the DNS names
+and DHCP addresses they touched; when a restart is asked for, the names are
+mapped to the authoritative zones serving them and the addresses to their
+networks, and only the grid members serving those zones (DNS) and networks
+(DHCP) are restarted, for those services only.
+"""
+import ipaddress
+import json
+import threading
+
+try:
+    from urllib.parse import parse_qsl
+except ImportError:
+    from urlparse import parse_qsl
+
+# Objects whose writes only ever concern the DHCP service
+_DHCP = frozenset(['fixedaddress', 'range', 'network', 'lease'])
+
+
+class _change_tracker(object):
+
+    def __init__(self):
+        """
+        class constructor - Automatically called on class instantiation
+
+        input   void (void)
+        output  void (void)
+        """
+        self.names = set()
+        self.addresses = set()
+        self._lock = threading.Lock()
+
+    def record(self, method, api_function, payload):
+        """
+        record - Note what a successful write touched. Multi-object
+                 requests are broken down into their operations
+
+        input   method (string)         HTTP method
+                api_function (string)   Function called in WAPI
+                payload (string)        JSON payload, if any
+        output  void (void)
+        """
+        obj, _, query = '{0}'.format(api_function).partition('?')
+        if '_function' in dict(parse_qsl(query)):
+            return
+        try:
+            data = json.loads(payload) if payload else {}
+        except (TypeError, ValueError):
+            return
+        if obj == 'request' and isinstance(data, list):
+            for op in data:
+                self._touch(op.get('method', 'GET').upper(),
+                            op.get('object', ''), op.get('data') or {})
+        else:
+            self._touch(method, obj, data)
+
+    def _touch(self, method, obj, data):
+        """
+        _touch - Note the names and DHCP addresses one write touched, from
+                 its payload and the readable part of its _ref
+                 (<id>:name/view). A rename touches both names
+
+        input   method (string)         HTTP method
+                obj (string)            Object type or _ref written
+                data (dict)             Fields written
+        output  void (void)
+        """
+        if method == 'GET' or not isinstance(data, dict):
+            return
+        objtype, _, ref = obj.partition('/')
+        readable = ref.partition(':')[2].split('/')
+        names, addresses = [], []
+        if objtype.startswith('record:') or objtype == 'zone_auth':
+            view = data.get('view') or (
+                readable[-1] if len(readable) > 1 else 'default')
+            for name in (data.get('name'), data.get('fqdn'),
+                         readable[0] if ref and objtype != 'record:host_ipv4addr'
+                         else None):
+                if name:
+                    names.append((name.lower(), view))
+        if objtype in ('record:host', 'record:host_ipv4addr'):
+            addrs = (data.get('ipv4addrs') or []) + \
+                (data.get('ipv4addrs+') or [])
+            if not addrs and 'ipv4addrs-' not in data:
+                addrs = [data]
+            for addr in addrs:
+                if isinstance(addr, dict) and addr.get('ipv4addr') and (
+                        addr.get('mac') or addr.get('configure_for_dhcp')):
+                    addresses.append(addr['ipv4addr'])
+            # Removed addresses are not sent with their MAC, which they may
+            # have had
+            for addr in data.get('ipv4addrs-') or []:
+                if isinstance(addr, dict) and addr.get('ipv4addr'):
+                    addresses.append(addr['ipv4addr'])
+        elif objtype in _DHCP:
+            address = (data.get('ipv4addr') or data.get('address') or
+                       data.get('start_addr') or data.get('network'))
+            if address is None and ref:
+                # fixedaddress/<id>:10.0.0.5/default,
+                # network/<id>:10.0.0.0/24/default
+                address = '/'.join(readable[:2]) if objtype == 'network' \
+                    else readable[0]
+            if address:
+                addresses.append(address)
+        with self._lock:
+            self.names.update(names)
+            self.addresses.update(a for a in addresses
+                                  if not a.startswith('func:'))
+
+    def changes(self):
+        """
+        changes - Copy of the recorded changes
+
+        input   void (void)
+        output  names (set)             (name, view) pairs touched
+                addresses (set)         Addresses and networks touched
+        """
+        with self._lock:
+            return set(self.names), set(self.addresses)
+
+    def drain(self):
+        """
+        drain - Take the recorded changes, leaving the tracker empty
+
+        input   void (void)
+        output  names (set)             (name, view) pairs touched
+                addresses (set)         Addresses and networks touched
+        """
+        with self._lock:
+            names, self.names = self.names, set()
+            addresses, self.addresses = self.addresses, set()
+        return names, addresses
+
+    def restore(self, names, addresses):
+        """
+        restore - Put drained changes back, e.g. after a failed restart
+
+        input   names (set)             (name, view) pairs touched
+                addresses (set)         Addresses and networks touched
+        output  void (void)
+        """
+        with self._lock:
+            self.names.update(names)
+            self.addresses.update(addresses)
+
+
+def _affected(infoblox_, names, addresses):
+    """
+    _affected - Map touched names to the members serving their zones, and
+                touched addresses to the DHCP members of their networks
+
+    input   infoblox_ (object)      Parent class object
+            names (set)             (name, view) pairs touched
+            addresses (set)         Addresses and networks touched
+    output  services (dict)         Services to restart per member
+            scopes (list)           Members serving each zone or network
+                                    touched
+            unresolved (set)        Services with changes no member could
+                                    be found for
+    """
+    services, scopes, unresolved = {}, [], set()
+    if names:
+        zones = {}
+        for zone in infoblox_.iter_objects(
+                'zone_auth', compact=False,
+                _return_fields='fqdn,view,grid_primary,grid_secondaries,'
+                               'ns_group'):
+            zones[(zone['fqdn'].lower(), zone.get('view', 'default'))] = zone
+        groups = {}
+        touched = set()
+        for name, view in names:
+            labels = name.split('.')
+            for i in range(len(labels)):
+                key = ('.'.join(labels[i:]), view)
+                if key in zones:
+                    touched.add(key)
+                    break
+            else:
+                unresolved.add('DNS')
+        for key in sorted(touched):
+            members = _servers(infoblox_, zones[key], groups)
+            if not members:
+                unresolved.add('DNS')
+            scopes.append(members)
+            for member in members:
+                services.setdefault(member, set()).add('DNS')
+    if addresses:
+        networks = []
+        for address in sorted(addresses):
+            members = _dhcp_members(infoblox_, address, networks)
+            if not members:
+                unresolved.add('DHCP')
+            for member in members:
+                services.setdefault(member, set()).add('DHCP')
+        scopes.extend(members for _, members in networks if members)
+    return services, scopes, unresolved
+
+
+def _servers(infoblox_, zone, groups):
+    """
+    _servers - Grid members serving a zone, directly or through its name
+               server group
+
+    input   infoblox_ (object)      Parent class object
+            zone (dict)             zone_auth object
+            groups (dict)           Name server groups looked up so far
+    output  members (set)           Member names
+    """
+    source = zone
+    if zone.get('ns_group'):
+        if zone['ns_group'] not in groups:
+            resp = infoblox_.get('nsgroup?name={0}&_return_fields='
+                                 'grid_primary,grid_secondaries'
+                                 .format(zone['ns_group']))
+            found = json.loads(resp.text) if resp.status_code == 200 else []
+            groups[zone['ns_group']] = found[0] if found else {}
+        source = groups[zone['ns_group']]
+    return set(server['name'] for server in
+               (source.get('grid_primary') or []) +
+               (source.get('grid_secondaries') or []) if server.get('name'))
+
+
+def _dhcp_members(infoblox_, address, networks):
+    """
+    _dhcp_members - DHCP members of the network holding an address. Each
+                    network is looked up once
+
+    input   infoblox_ (object)      Parent class object
+            address (string)        Address, or network in CIDR notation
+            networks (list)         (network, members) pairs found so far
+    output  members (set)           Member names
+    """
+    try:
+        if '/' in address:
+            net = ipaddress.ip_network(u'{0}'.format(address), strict=False)
+            query = 'network?network={0}'.format(net)
+            addr = net.network_address
+        else:
+            addr = ipaddress.ip_address(u'{0}'.format(address))
+            query = 'network?contains_address={0}'.format(addr)
+    except ValueError:
+        return set()
+    for net, members in networks:
+        if addr in net:
+            return members
+    resp = infoblox_.get('{0}&_return_fields=network,members'.format(query))
+    if resp.status_code != 200:
+        return set()
+    found = json.loads(resp.text)
+    if not found:
+        return set()
+    net = ipaddress.ip_network(u'{0}'.format(found[0]['network']))
+    members = set(m['name'] for m in found[0].get('members') or []
+                  if m.get('name'))
+    networks.append((net, members))
+    return members
+
+
+def _restart_calls(services, scopes, unresolved, sequential_delay=10,
+                   restart_option='RESTART_IF_NEEDED'):
+    """
+    _restart_calls - Group members by the services they need restarted, one
+                     restartservices call per group. Groups with members
+                     serving the same zone or network are merged into one
+                     call restarting them sequentially, as separate calls
+                     or a simultaneous restart could take it down entirely.
+                     Changes that could not be mapped to members fall back
+                     to restarting their service on the whole grid
+
+    input   services (dict)         Services to restart per member
+            scopes (list)           Members serving each zone or network
+                                    touched
+            unresolved (set)        Services with unmapped changes
+            sequential_delay (int)  Optional: Seconds between members
+                                    restarted sequentially
+            restart_option (string) Optional: RESTART_IF_NEEDED or
+                                    FORCE_RESTART
+    output  calls (list)            restartservices arguments
+    """
+    if unresolved:
+        needed = unresolved | set(s for m in services.values() for s in m)
+        return [{'service_option': 'ALL' if len(needed) > 1
+                 else list(needed)[0],
+                 'restart_option': restart_option,
+                 'member_order': 'SEQUENTIALLY',
+                 'sequential_delay': sequential_delay}]
+    by_service = {}
+    for member, needed in services.items():
+        option = 'ALL' if len(needed) > 1 else list(needed)[0]
+        by_service.setdefault(option, set()).add(member)
+    option_of = dict((member, option) for option in by_service
+                     for member in by_service[option])
+    # (options, shared) pairs: groups with members serving the same zone
+    # or network are merged and restarted one member at a time
+    groups = [(set([option]), False) for option in by_service]
+    for scope in scopes:
+        restarted = [member for member in scope if member in option_of]
+        if len(restarted) < 2:
+            continue
+        options = set(option_of[member] for member in restarted)
+        joined = [g for g in groups if g[0] & options]
+        groups = [g for g in groups if not g[0] & options]
+        groups.append((set().union(*[g[0] for g in joined]), True))
+    calls = []
+    for options, shared in sorted(groups, key=lambda g: sorted(g[0])):
+        members = set(m for option in options for m in by_service[option])
+        call = {'members': sorted(members),
+                'service_option': list(options)[0] if len(options) == 1
+                else 'ALL',
+                'restart_option': restart_option,
+                'member_order': 'SEQUENTIALLY' if shared
+                                else 'SIMULTANEOUSLY'}
+        if shared:
+            call['sequential_delay'] = sequential_delay
+        calls.append(call)
+    return calls
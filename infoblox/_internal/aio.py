@@ -0,0 +1,606 @@
+"""
+Awaitable counterparts of the record handles, used by AsyncInfoblox. They
+take the same arguments and return the same values as the blocking
+handles. A handle's _ref is looked up on first use and then cached, so
+creating a handle makes no request.
+"""
+import re
+import json
+
+from .records import _fetched
+from .payloads import (_a_update, _cname_update, _host_lookup, _host_update,
+                       _rpz_cname_update, _srv_update)
+from .ref import _return_fields, _search
+
+
+class _record(object):
+    """
+    Shared fetch/_ref/delete logic of the awaitable record handles
+    """
+    objtype = None
+    field = 'name'
+    label = 'record'
+
+    def __init__(self, infoblox_, name, view=None, zone=None, regex=False):
+        """
+        class constructor - Automatically called on class instantiation
+
+        input   infoblox_ (object)      Parent AsyncInfoblox object
+                name (string)           Value of the search field
+                view (string)           Optional: DNS view of the record
+                zone (string)           Optional: Zone of the record
+                regex (bool)            Optional: Look the record up with
+                                        a regular expression search
+        output  void (void)
+        """
+        self.infoblox_ = infoblox_
+        self.name = name
+        self.view = view
+        self.zone = zone
+        self.regex = regex
+        self._ref_ = None
+
+    async def _ref(self):
+        """
+        _ref - Get and cache the _ref of the record
+
+        input   void (void)
+        output  _ref (string)           _ref ID of the record or None
+        """
+        if self._ref_ is None:
+            try:
+                self._ref_ = (await self.fetch(_ref=True))['_ref']
+            except Exception:
+                return None
+        return self._ref_
+
+    def _error(self, action, resp):
+        try:
+            return self.infoblox_.__caller__(
+                'Could not {0} {1} for {2} - Status {3}'
+                .format(action, self.label, self.name, resp.status_code),
+                resp.status_code)
+        except Exception:
+            return resp.status_code
+
+    def _query(self):
+        return _search(self.objtype, self.field, self.name, self.regex,
+                       self.view, self.zone)
+
+    async def fetch(self, **return_fields):
+        """
+        fetch - Retrieve all information from the record
+
+        input   return_fields (dict)    Key value pairs of data to be returned
+        output  resp (parsed json)      Parsed JSON response
+        """
+        query = self._query() + _return_fields(self.infoblox_, self.objtype,
+                                               return_fields)
+        resp = await self.infoblox_.get(query)
+        if resp.status_code != 200:
+            return self._error('retrieve', resp)
+        try:
+            return _fetched(self.infoblox_, self.objtype,
+                            json.loads(resp.text)[0])
+        except (ValueError, IndexError):
+            return None
+
+    async def _add(self, data):
+        resp = await self.infoblox_.post(self.objtype, json.dumps(data))
+        if resp.status_code != 201:
+            return self._error('create', resp)
+        try:
+            self._ref_ = json.loads(resp.text)
+        except ValueError:
+            pass
+        return 0
+
+    async def _update(self, data):
+        if not data:
+            return 0
+        resp = await self.infoblox_.put(await self._ref(), json.dumps(data))
+        if resp.status_code != 200:
+            return self._error('update', resp)
+        return 0
+
+    async def delete(self):
+        """
+        delete - Delete the record
+
+        input   void (void)
+        output  0 (int)                 Success
+        """
+        resp = await self.infoblox_.delete(await self._ref())
+        if resp.status_code != 200:
+            return self._error('delete', resp)
+        self._ref_ = None
+        return 0
+
+
+class _host(_record):
+    objtype = 'record:host'
+    label = 'host record'
+
+    @property
+    def hostname(self):
+        return self.name
+
+    async def delete(self):
+        """
+        delete - Delete a host record within Infoblox
+
+        input   void (void)
+        output  200 (int)               Success, the status code returned
+                                        by the blocking host handle too
+                errno (int)             Error code of API call
+        """
+        ret = await _record.delete(self)
+        return 200 if ret == 0 else ret
+
+    async def add(self, ip, mac=None):
+        """
+        add - Create a host record within Infoblox
+
+        input   ip (string)         IP address to create host record
+                mac (string)        MAC address to attach to host record
+        output  0 (int)             Successful creation
+                errno (int)         Error code of API call
+        """
+        addr = {'ipv4addr': ip}
+        if mac is not None:
+            addr['mac'] = mac
+        return await self._add({'name': self.name, 'ipv4addrs': [addr]})
+
+    async def update(self, ip=None, mac=None, ttl=None, comment=None,
+                     extattrs=None, old_ip=None):
+        """
+        update - Update a Host record with new attributes in a single PUT
+
+        input   ip (string)         Optional: IP address of a host record
+                mac (string)        Optional: MAC address of a host record
+                ttl (int)           Optional: Time to live
+                comment (string)    Optional: Comment
+                extattrs (dict)     Optional: Extensible attributes
+                old_ip (string)     Optional: Address to change
+        output  0 (int)             Success
+        """
+        current = None
+        if _host_lookup(ip, mac, old_ip):
+            try:
+                current = (await self.fetch(ipv4addrs=True))['ipv4addrs']
+            except Exception:
+                current = None
+            if not current:
+                try:
+                    return self.infoblox_.__caller__(
+                        'Could not find the address of host record {0}'
+                        .format(self.name), 404)
+                except Exception:
+                    return 404
+        return await self._update(_host_update(current, ip, mac, ttl,
+                                               comment, extattrs, old_ip))
+
+    def alias(self):
+        """
+         alias - alias object
+
+        input   void (void)
+        output  handle (handle)     Reference to alias object
+        """
+        return _alias(self, self.infoblox_)
+
+
+class _alias(object):
+
+    def __init__(self, host_, infoblox_):
+        self.infoblox_ = infoblox_
+        self.host_ = host_
+
+    async def fetch(self):
+        """
+        fetch - Get a list of aliases for a given hostname
+
+        input   void (void)
+        output  aliases (list)      list of infoblox aliases
+        """
+        resp = await self.infoblox_.get(
+            'record:host?_return_fields%2B=aliases&name={0}'.format(
+                self.host_.name))
+        if resp.status_code != 200:
+            return self.host_._error('retrieve aliases of', resp)
+        try:
+            return json.loads(resp.text)[0]['aliases']
+        except Exception:
+            return []
+
+    async def add(self, new_alias):
+        """
+        add - Create an alias in a given host record
+
+        input   new_alias (string)  new alias to attach to host record
+        output  0 (int)             Success
+        """
+        aliases = await self.fetch()
+        return await self.host_._update({'aliases': aliases + [new_alias]})
+
+    async def delete(self, rm_alias):
+        """
+        delete - Remove an alias from a given host record
+
+        input   rm_alias (string)   alias to remove from a host record
+        output  0 (int)             Success
+        """
+        aliases = await self.fetch()
+        return await self.host_._update(
+            {'aliases': [a for a in aliases if rm_alias not in a]})
+
+
+class _a(_record):
+    objtype = 'record:a'
+    label = 'A record'
+
+    async def add(self, ip, ttl=None):
+        """
+        add - Create A record
+
+        input   ip (string)             IP Address of A Record
+                ttl (int)               Optional: Time to live
+        output  0 (int)                 Success
+        """
+        data = {'name': self.name, 'ipv4addr': ip}
+        if ttl is not None:
+            data['ttl'] = ttl
+        return await self._add(data)
+
+    async def update(self, ip=None, ttl=None, comment=None, extattrs=None):
+        """
+        update - Update an A record with new attributes
+
+        input   ip (string)             Optional: IP Address of A Record
+                ttl (int)               Optional: Time to live
+                comment (string)        Optional: Comment
+                extattrs (dict)         Optional: Extensible attributes
+        output  0 (int)                 Success
+        """
+        return await self._update(_a_update(ip, ttl, comment, extattrs))
+
+
+class _cname(_record):
+    objtype = 'record:cname'
+    label = 'CNAME record'
+
+    async def add(self, canonical, ttl=None):
+        """
+        add - Create CNAME record
+
+        input   canonical (string)      Canonical address for CNAME record
+                ttl (int)               Optional: Time to live
+        output  0 (int)                 Success
+        """
+        data = {'name': self.name, 'canonical': canonical}
+        if ttl is not None:
+            data['ttl'] = ttl
+        return await self._add(data)
+
+    async def update(self, canonical=None, ttl=None, comment=None,
+                     extattrs=None):
+        """
+        update - Update a CNAME record with new attributes
+
+        input   canonical (string)      Optional: Canonical address for
+                                                  CNAME record
+                ttl (int)               Optional: Time to live
+                comment (string)        Optional: Comment
+                extattrs (dict)         Optional: Extensible attributes
+        output  0 (int)                 Success
+        """
+        return await self._update(_cname_update(canonical, ttl, comment,
+                                                extattrs))
+
+
+class _srv(_record):
+    objtype = 'record:srv'
+    label = 'SRV record'
+
+    def __init__(self, infoblox_, name, port, view=None, zone=None,
+                 regex=False):
+        _record.__init__(self, infoblox_, name, view, zone, regex)
+        self.port = port
+
+    def _query(self):
+        return _record._query(self) + '&port={0}'.format(self.port)
+
+    async def add(self, target, weight=0, priority=0):
+        """
+        add - add target to srv record
+
+        input   target (string)     DNS target for srv record
+        output  0 (int)             Target successfully added
+        """
+        return await self._add({'target': target, 'weight': weight,
+                                'name': self.name, 'priority': priority,
+                                'port': self.port})
+
+    async def update(self, target=None, weight=None, priority=None,
+                     ttl=None, comment=None, extattrs=None):
+        """
+        update - Update a SRV record with new attributes
+
+        input   target (string)     Optional: DNS target for srv record
+                weight (int)        Optional: Weight of the record
+                priority (int)      Optional: Priority of the record
+                ttl (int)           Optional: Time to live
+                comment (string)    Optional: Comment
+                extattrs (dict)     Optional: Extensible attributes
+        output  0 (int)             Success
+        """
+        return await self._update(_srv_update(target, weight, priority, ttl,
+                                              comment, extattrs))
+
+
+class _mx(_record):
+    objtype = 'record:mx'
+    field = 'mail_exchanger'
+    label = 'MX record'
+
+    @property
+    def mail_exchanger(self):
+        return self.name
+
+
+class _rpz_cname(_record):
+    objtype = 'record:rpz:cname'
+    label = 'RPZ CNAME record'
+
+    def _query(self):
+        if self.regex:
+            return _search(self.objtype, 'name', self.name, True, self.view,
+                           self.zone)
+        if self.zone is not None:
+            return _search(self.objtype, 'name', self.name + '.' + self.zone,
+                           False, self.view, self.zone)
+        return _search(self.objtype, 'name',
+                       '^{0}\\.'.format(re.escape(self.name)), True,
+                       self.view)
+
+    async def add(self, canonical, rp_zone, comment="", ttl=None, view=None):
+        """
+        add - Create RPZ CNAME record
+
+        input   canonical (string)      Canonical address for CNAME record
+                rp_zone (string)        Response policy zone name
+                comment (string)        Optional: An optional comment
+                ttl (int)               Optional: Time to live
+                view (string)           Optional: The view where the record is
+        output  0 (int)                 Success
+        """
+        kwargs = {
+                  "name": self.name + '.' + rp_zone,
+                  "canonical": canonical,
+                  "rp_zone": rp_zone,
+                  "comment": comment,
+                  "ttl": ttl,
+                  "view": view
+                 }
+        ret = await self._add({key: kwargs[key] for key in kwargs
+                               if kwargs[key]})
+        if ret == 0:
+            self.zone = rp_zone
+        return ret
+
+    async def update(self, name=None, canonical=None,
+                     comment="", ttl=None, view=None):
+        """
+        update - Update RPZ CNAME record
+
+        input   name (string)           Optional: New name in the zone
+                canonical (string)      Optional: Canonical address for CNAME
+                                                  record
+                comment (string)        Optional: An optional comment
+                ttl (int)               Optional: Time to live
+                view (string)           Optional: The view where the record is
+        output  0 (int)                 Success
+        """
+        return await self._update(_rpz_cname_update(self.zone, name,
+                                                    canonical, comment, ttl,
+                                                    view))
+
+
+class _lease(_record):
+    objtype = 'lease'
+    field = 'address'
+    label = 'lease'
+
+    @property
+    def address(self):
+        return self.name
+
+    async def _ref(self):
+        if self._ref_ is None:
+            try:
+                self._ref_ = (await self.fetch(_ref=True))[0]['_ref']
+            except Exception:
+                return None
+        return self._ref_
+
+    async def fetch(self, **return_fields):
+        """
+        fetch - Fetch specified fields of a lease object
+
+        input   return_fields (dict)    Key value pairs of data to be returned
+        output  resp (parsed json)      Parsed JSON response
+        """
+        query = self._query() + _return_fields(self.infoblox_, self.objtype,
+                                               return_fields)
+        resp = await self.infoblox_.get(query)
+        if resp.status_code != 200:
+            return self._error('fetch', resp)
+        return [_fetched(self.infoblox_, self.objtype, obj)
+                for obj in json.loads(resp.text)]
+
+
+class _subnet(_record):
+    objtype = 'network'
+    field = 'network'
+    label = 'subnet'
+
+    def __init__(self, infoblox_, subnet):
+        _record.__init__(self, infoblox_, subnet)
+        self.comment = None
+
+    @property
+    def subnet(self):
+        return self.name
+
+    def __str__(self):
+        return "{0} - {1}".format(self.subnet, self.comment)
+
+    def __repr__(self):
+        return self.__str__()
+
+    async def get(self):
+        """
+        get - Fetch the network object of the subnet
+
+        input   void (void)
+        output  network (parsed json)   Parsed JSON response
+        """
+        resp = await self.infoblox_.get('network?network={0}'
+                                        .format(self.name))
+        if resp.status_code != 200:
+            return self._error('get subnet ID of', resp)
+        data = resp.json()[0]
+        self._ref_ = data['_ref']
+        self.comment = data.get('comment')
+        return data
+
+    async def _ref(self):
+        if self._ref_ is None:
+            d = await self.get()
+            return d if type(d) is int else d['_ref']
+        return self._ref_
+
+    async def next_available_ip(self, offset=2):
+        """
+        next_available_ip - Get the next available IP address in a subnet.
+                            The first results is always the gateway.
+
+        input   offset (int)            Optional arg to provide address
+                                        offset for networking gear/etc not
+                                        accounted in IPAM
+        output  ip_addr (string)        IP address
+                None (null)             No free IP addresses
+        """
+        ips = await self.next_available_ips(1, offset=offset)
+        if not isinstance(ips, list):
+            return ips
+        return ips[0] if ips else None
+
+    async def next_available_ips(self, count, exclude=None, offset=2,
+                                 hostnames=None):
+        """
+        next_available_ips - Get several distinct available IP addresses
+                             in a subnet with a single call
+
+        input   count (int)             Number of addresses to return
+                exclude (list)          Optional: Addresses not to return
+                offset (int)            Optional arg to provide address
+                                        offset for networking gear/etc not
+                                        accounted in IPAM, at least 1
+                hostnames (list)        Optional: Create a host record for
+                                        each name with the returned
+                                        addresses, in one multi-object
+                                        request. One name per address
+        output  ip_addrs (list)         IP addresses
+        """
+        if offset < 1:
+            raise ValueError('offset must be at least 1')
+        if hostnames is not None and len(hostnames) != count:
+            raise ValueError('Expected {0} hostnames, got {1}'
+                             .format(count, len(hostnames)))
+        payload = {'num': count + offset - 1}
+        if exclude:
+            payload['exclude'] = list(exclude)
+        resp = await self.infoblox_.post(
+                   '{0}?_function=next_available_ip'
+                   .format(await self._ref()), json.dumps(payload),
+                   safe=True)
+        if resp.status_code != 200:
+            return self._error('retrieve next available address of', resp)
+        try:
+            ips = json.loads(resp.text)['ips'][offset-1:]
+        except Exception:
+            return []
+        if hostnames is not None and ips:
+            ops = [{'method': 'POST', 'object': 'record:host',
+                    'data': {'name': hostname,
+                             'ipv4addrs': [{'ipv4addr': ip}]}}
+                   for hostname, ip in zip(hostnames, ips)]
+            resp = await self.infoblox_.post('request', json.dumps(ops))
+            if resp.status_code not in (200, 201):
+                return self._error('reserve addresses in', resp)
+        return ips
+
+
+class _grid(object):
+
+    def __init__(self, infoblox_):
+        self.infoblox_ = infoblox_
+        self._ref_ = None
+
+    async def _ref(self):
+        """
+        _ref - Get ID of the current gridmaster
+
+        input   void (void)
+        output  grid_ref (string)       Hash ID of the current Infoblox
+                                        gridmaster
+        """
+        if self._ref_ is None:
+            resp = await self.infoblox_.get('grid')
+            if resp.status_code != 200:
+                try:
+                    return self.infoblox_.__caller__(
+                        'Could not get grid _ref - Status {0}'
+                        .format(resp.status_code), resp.status_code)
+                except Exception:
+                    return resp.status_code
+            self._ref_ = json.loads(resp.text)[0]['_ref']
+        return self._ref_
+
+    async def restart(self, member_order='SEQUENTIALLY', sequential_delay=10,
+                      service_option='ALL',
+                      restart_option='RESTART_IF_NEEDED', members=None):
+        """
+        restart - Restart the Infoblox gridmaster, required to save
+                  changes to host records. The options are those of the
+                  synchronous grid handle
+
+        input   member_order (string)   Optional: SEQUENTIALLY or
+                                        SIMULTANEOUSLY
+                sequential_delay (int)  Optional: Seconds between members
+                service_option (string) Optional: ALL, DNS, DHCP, DHCPV4 or
+                                        DHCPV6
+                restart_option (string) Optional: RESTART_IF_NEEDED or
+                                        FORCE_RESTART
+                members (list)          Optional: Members to restart
+        output  0 (int)                 Success
+        """
+        args = {'member_order': member_order,
+                'service_option': service_option,
+                'restart_option': restart_option}
+        if member_order == 'SEQUENTIALLY':
+            args['sequential_delay'] = sequential_delay
+        if members:
+            args['members'] = list(members)
+        resp = await self.infoblox_.post(
+                   '{0}?_function=restartservices'.format(await self._ref()),
+                   json.dumps(args), safe=restart_option != 'FORCE_RESTART')
+        if resp.status_code != 200:
+            try:
+                return self.infoblox_.__caller__(
+                    'Could not restart Infoblox gridmaster - Status {0}'
+                    .format(resp.status_code), resp.status_code)
+            except Exception:
+                return resp.status_code
+        return 0
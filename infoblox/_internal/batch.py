@@ -0,0 +1,187 @@
+"""
+Batches writes made through the record handles into WAPI multi-object
+requests. Handles created from a batch queue their POST/PUT/DELETE calls
+instead of sending them, and the queue is sent in chunks to the request
+object.
+WAPI documentation can be found here:
+https://ipam.illinois.edu/wapidoc/objects/request.html
+"""
+import json
+
+try:
+    from urllib.parse import parse_qsl
+except ImportError:
+    from urlparse import parse_qsl
+
+from .a import _a
+from .cname import _cname
+from .host import _host
+from .mx import _mx
+from .srv import _srv
+from .rpz_cname import _rpz_cname
+
+
+class _batch(object):
+
+    def __init__(self, infoblox_, chunk_size=500, discard=False,
+                 abort_on_error=True):
+        """
+        class constructor - Automatically called on class instantiation
+
+        input   infoblox_ (object)      Parent class object
+                chunk_size (int)        Optional: Operations sent per
+                                        multi-object request
+                discard (bool)          Optional: Ask the WAPI not to return
+                                        the result of each operation
+                abort_on_error (bool)   Optional: Stop sending further
+                                        chunks once a chunk has failed
+        output  void (void)
+        """
+        self.infoblox_ = infoblox_
+        self.chunk_size = chunk_size
+        self.discard = discard
+        self.abort_on_error = abort_on_error
+        self.pending = []
+        self.results = []
+        self.errors = 0
+        self.status_code = None
+        self.aborted = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+        return False
+
+    def __getattr__(self, name):
+        # Reads and anything else not batched go to the parent client
+        return getattr(self.infoblox_, name)
+
+    def _queue(self, method, api_function, payload=None):
+        """
+        _queue - Queue a write as a multi-object request operation
+
+        input   method (string)         HTTP method
+                api_function (string)   Function to call in WAPI
+                payload (string)        Optional: JSON payload
+        output  resp (object)           Deferred response, filled in when
+                                        the operation has been sent
+        """
+        obj, _, query = api_function.partition('?')
+        op = {'method': method, 'object': obj}
+        if payload:
+            op['data'] = json.loads(payload)
+        if query:
+            op['args'] = dict(parse_qsl(query, keep_blank_values=True))
+        if self.discard:
+            op['discard'] = True
+        resp = _deferred(201 if method == 'POST' and not query else 200)
+        self.pending.append((op, resp))
+        if len(self.pending) >= self.chunk_size:
+            self.flush()
+        return resp
+
+    def post(self, api_function, payload, safe=False):
+        return self._queue('POST', api_function, payload)
+
+    def put(self, api_function, payload):
+        return self._queue('PUT', api_function, payload)
+
+    def delete(self, api_function):
+        return self._queue('DELETE', api_function)
+
+    def flush(self):
+        """
+        flush - Send every queued operation, chunk_size at a time. A chunk
+                is applied atomically by the WAPI, so when it fails every
+                operation in it gets the error as its result
+
+        input   void (void)
+        output  results (list)          Result of every operation sent by
+                                        this batch, in order: the _ref of
+                                        the object written, the WAPI error,
+                                        or None when discarded or not sent
+        """
+        while self.pending:
+            chunk = self.pending[:self.chunk_size]
+            del self.pending[:self.chunk_size]
+            if self.aborted:
+                self._resolve(chunk, [None] * len(chunk))
+                continue
+            resp = self.infoblox_.post(
+                       'request', json.dumps([op for op, _ in chunk]))
+            if resp.status_code not in (200, 201):
+                self.errors += len(chunk)
+                self.status_code = resp.status_code
+                try:
+                    error = json.loads(resp.text)
+                except ValueError:
+                    error = resp.text
+                self._resolve(chunk, [error] * len(chunk), resp.status_code)
+                if self.abort_on_error:
+                    self.aborted = True
+                try:
+                    self.infoblox_.__caller__(
+                        'Multi-object request of {0} operations failed - '
+                        'Status {1}'.format(len(chunk), resp.status_code),
+                        resp.status_code)
+                except Exception:
+                    pass
+                continue
+            if self.discard:
+                self._resolve(chunk, [None] * len(chunk))
+            else:
+                self._resolve(chunk, json.loads(resp.text))
+        return self.results
+
+    def _resolve(self, chunk, results, status_code=None):
+        """
+        _resolve - Record the results of a chunk and fill in the deferred
+                   responses handed out for its operations
+
+        input   chunk (list)            (operation, deferred) pairs
+                results (list)          Result per operation
+                status_code (int)       Optional: Error status of the chunk
+        output  void (void)
+        """
+        for (op, resp), result in zip(chunk, results):
+            resp.result = result
+            resp.text = json.dumps(result)
+            if status_code is not None:
+                resp.status_code = status_code
+            self.results.append(result)
+
+    def host(self, hostname=None, view=None, zone=None, regex=False):
+        return _host(self, hostname, view, zone, regex)
+
+    def a(self, name, view=None, zone=None, regex=False):
+        return _a(self, name, view, zone, regex)
+
+    def cname(self, name, view=None, zone=None, regex=False):
+        return _cname(self, name, view, zone, regex)
+
+    def mx(self, name, view=None, zone=None, regex=False):
+        return _mx(self, name, view, zone, regex)
+
+    def srv(self, name, port, view=None, zone=None, regex=False):
+        return _srv(self, name, port, view, zone, regex)
+
+    def rpz_cname(self, name, view=None, zone=None, regex=False):
+        return _rpz_cname(self, name, view, zone, regex)
+
+
+class _deferred(object):
+    """
+    Response stand-in returned for a queued operation. Its result and text
+    are filled in once the operation has been sent
+    """
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.result = None
+        self.text = 'null'
+
+    def json(self):
+        return json.loads(self.text)
@@ -0,0 +1,118 @@
+"""
+Runs an operation over many items on a bounded pool of threads sharing the
+client and its connection pool. Errors reported by the handles while an item
+is processed are collected for that item instead of being passed to the
+client callback, and per-item latencies are kept for a summary at the end.
+"""
+import threading
+import time
+
+
+class _bulk(object):
+
+    def __init__(self, infoblox_, operation, items, workers=10):
+        """
+        class constructor - Automatically called on class instantiation
+
+        input   infoblox_ (object)      Parent class object
+                operation (funct)       Called with each item, its return
+                                        value is the result of the item
+                items (list)            Items to process
+                workers (int)           Optional: Number of threads
+        output  void (void)
+        """
+        self.infoblox_ = infoblox_
+        self.operation = operation
+        self.items = list(items)
+        self.workers = max(1, min(workers, len(self.items)))
+        self.results = [None] * len(self.items)
+        self.errors = []
+        self.latencies = [0.0] * len(self.items)
+        self.elapsed = 0.0
+        self._next = iter(range(len(self.items)))
+        self._lock = threading.Lock()
+
+    def run(self):
+        """
+        run - Process every item and wait for the workers to finish
+
+        input   void (void)
+        output  bulk (object)           This object, with results, errors
+                                        and latencies filled in
+        """
+        start = time.time()
+        threads = [threading.Thread(target=self._worker)
+                   for _ in range(self.workers)]
+        for t in threads:
+            t.daemon = True
+            t.start()
+        for t in threads:
+            t.join()
+        self.elapsed = time.time() - start
+        self.errors.sort(key=lambda e: e[0])
+        return self
+
+    def _worker(self):
+        """
+        _worker - Take items until none are left, capturing the errors the
+                  handles report through the client while each one runs
+
+        input   void (void)
+        output  void (void)
+        """
+        local = self.infoblox_._local
+        while True:
+            with self._lock:
+                i = next(self._next, None)
+            if i is None:
+                return
+            local.errors = []
+            start = time.time()
+            try:
+                self.results[i] = self.operation(self.items[i])
+            except Exception as e:
+                local.errors.append('{0}: {1}'.format(type(e).__name__, e))
+            finally:
+                self.latencies[i] = time.time() - start
+                errors, local.errors = local.errors, None
+            if errors:
+                with self._lock:
+                    self.errors.extend((i, self.items[i], error)
+                                       for error in errors)
+
+    def stats(self):
+        """
+        stats - Summary of the run
+
+        input   void (void)
+        output  stats (dict)            count, errors (items that failed),
+                                        elapsed (s), throughput (items/s),
+                                        p50 and p99 latency (ms)
+        """
+        latencies = sorted(self.latencies)
+        return {'count': len(self.items),
+                'errors': len(set(e[0] for e in self.errors)),
+                'elapsed': self.elapsed,
+                'throughput': (len(self.items) / self.elapsed
+                               if self.elapsed else 0.0),
+                'p50': _percentile(latencies, 50) * 1000,
+                'p99': _percentile(latencies, 99) * 1000}
+
+    def __str__(self):
+        return ('{count} items, {errors} failed in {elapsed:.2f}s - '
+                '{throughput:.1f} items/s, p50 {p50:.1f} ms, '
+                'p99 {p99:.1f} ms'.format(**self.stats()))
+
+
+def _percentile(values, pct):
+    """
+    _percentile - Nearest-rank percentile of sorted values
+
+    input   values (list)           Sorted values
+            pct (int)               Percentile
+    output  value (float)           Percentile value, 0.0 when empty
+    """
+    if not values:
+        return 0.0
+    rank = max(1, int(-(-len(values) * pct // 100)))
+    return values[rank - 1]
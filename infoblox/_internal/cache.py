@@ -0,0 +1,98 @@
+"""
+Client-wide cache of object _refs, shared by every handle created from the
+same infoblox object. Entries are keyed by (object type, name, view), are
+evicted least recently used first, and expire after a configurable TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class _ref_cache(object):
+
+    def __init__(self, maxsize=4096, ttl=300):
+        """
+        class constructor - Automatically called on class instantiation
+
+        input   maxsize (int)           Maximum number of cached _refs
+                ttl (int)               Seconds a cached _ref stays valid.
+                                        None keeps entries until evicted
+        output  void (void)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        get - Return the cached _ref for a key
+
+        input   key (tuple)             (object type, name, view)
+        output  _ref (string)           Cached _ref, None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or
+                                      entry[1] > time.time()):
+                self._entries.pop(key)
+                self._entries[key] = entry
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, ref):
+        """
+        set - Cache a _ref, evicting the least recently used entries when
+              the cache is full
+
+        input   key (tuple)             (object type, name, view)
+                ref (string)            _ref to cache
+        output  void (void)
+        """
+        expires = None if self.ttl is None else time.time() + self.ttl
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (ref, expires)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """
+        invalidate - Drop the cached _ref for a key
+
+        input   key (tuple)             (object type, name, view)
+        output  void (void)
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        clear - Drop every cached _ref and reset the counters
+
+        input   void (void)
+        output  void (void)
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        stats - Cache counters
+
+        input   void (void)
+        output  stats (dict)            hits, misses and current size
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._entries)}
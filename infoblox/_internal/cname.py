@@ -6,20 +6,32 @@ https://ipam.illinois.edu/wapidoc/objects/record.cname.html
 """
 import json
 
+from .payloads import _cname_update
+from .ref import _lazy_ref, _return_fields, _returned_ref, _search
+from .records import _fetched
+
 
 class _cname(object):
 
-    def __init__(self, infoblox_, name):
+    _ref_ = _lazy_ref()
+
+    def __init__(self, infoblox_, name, view=None, zone=None, regex=False):
         """
         class constructor - Automatically called on class instantiation
 
         input   infoblox_ (object)      Parent class object
                 name (string)           DNS name of CNAME
+                view (string)           Optional: DNS view of the record
+                zone (string)           Optional: Zone of the record
+                regex (bool)            Optional: Look the record up with
+                                        a regular expression search
         output  void (void)
         """
         self.infoblox_ = infoblox_
         self.name = name
-        self._ref_ = self._ref()
+        self.view = view
+        self.zone = zone
+        self.regex = regex
 
     def _ref(self):
         """
@@ -29,10 +41,22 @@ class _cname(object):
         output  host _ref               _ref ID for CNAME record
         """
         try:
-            return self.fetch()['_ref']
+            return self.fetch(_ref=True)['_ref']
         except Exception:
             return None
 
+    def _key(self):
+        """
+        _key - Key of the record in the client-wide _ref cache
+
+        input   void (void)
+        output  key (tuple)             (object type, name, view), None for
+                                        regex lookups
+        """
+        if self.regex:
+            return None
+        return ('record:cname', self.name, self.view)
+
     def fetch(self, **return_fields):
         """
         fetch - Retrieve all information from a specified CNAME record
@@ -40,11 +64,9 @@ class _cname(object):
         input   return_fields (dict)    Key value pairs of data to be returned
         output  resp (parsed json)      Parsed JSON response
         """
-        return_query = ','.join([k for k in return_fields.keys()
-                                 if return_fields[k]])
-        query = "record:cname?name~={0}".format(self.name)
-        if return_query:
-            query += '&_return_fields=' + return_query
+        query = _search('record:cname', 'name', self.name, self.regex,
+                        self.view, self.zone)
+        query += _return_fields(self.infoblox_, 'record:cname', return_fields)
         resp = self.infoblox_.get(query)
         if resp.status_code != 200:
             try:
@@ -54,7 +76,8 @@ class _cname(object):
             except Exception:
                 return resp.status_code
         try:
-            return json.loads(resp.text)[0]
+            return _fetched(self.infoblox_, 'record:cname',
+                            json.loads(resp.text)[0])
 
         except (ValueError, IndexError):
             return None
@@ -82,6 +105,7 @@ class _cname(object):
                     .format(self.name, resp.status_code), resp.status_code)
             except Exception:
                 return resp.status_code
+        self._ref_ = _returned_ref(resp)
         return 0
 
     def delete(self):
@@ -99,21 +123,26 @@ class _cname(object):
                     .format(self.name, resp.status_code), resp.status_code)
             except Exception:
                 return resp.status_code
+        del self._ref_
         return 0
 
-    def update(self, canonical=None, ttl=None):
-        """ update - Update a CNAME record with new attributes
+    def update(self, canonical=None, ttl=None, comment=None,
+               extattrs=None):
+        """ update - Update a CNAME record with new attributes. Every
+                     change is sent in a single PUT
 
         input   canonical (string)      Optional: Canonical address for
                                                   CNAME record
                 ttl (int)               Optional: Time to live
+                comment (string)        Optional: Comment
+                extattrs (dict)         Optional: Extensible attributes,
+                                        merged into the current ones
         output  0 (int)                 Success
         """
-        if canonical is not None:
-            payload = '{{"canonical":"{0}"}}'.format(canonical)
-        if ttl is not None:
-            payload = '{{"ttl":{0}}}'.format(ttl)
-        resp = self.infoblox_.put(self._ref_, payload)
+        data = _cname_update(canonical, ttl, comment, extattrs)
+        if not data:
+            return 0
+        resp = self.infoblox_.put(self._ref_, json.dumps(data))
         if resp.status_code != 200:
             try:
                 return self.infoblox_.__caller__(
@@ -121,4 +150,5 @@ class _cname(object):
                     .format(self.name, resp.status_code), resp.status_code)
             except Exception:
                 return resp.status_code
+        self._ref_ = _returned_ref(resp)
         return 0
@@ -0,0 +1,459 @@
+"""
+Bulk loads and dumps through the grid's CSV import and export, reached over
+the WAPI fileop object. Records are streamed into an Infoblox CSV file on
+disk, uploaded to the appliance and imported by a background task that is
+polled until it finishes; rows the grid rejected are read back from its
+error log. Exports are streamed from the appliance straight to disk.
+WAPI documentation can be found here:
+https://ipam.illinois.edu/wapidoc/objects/fileop.html
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+import uuid
+
+# WAPI object type: (CSV object type, ((CSV column, WAPI field), ...)).
+# Required columns are marked with a *
+CSV_TYPES = {
+    'record:host': ('hostrecord', (
+        ('fqdn*', 'name'), ('view', 'view'), ('addresses', 'ipv4addrs'),
+        ('aliases', 'aliases'), ('ttl', 'ttl'), ('comment', 'comment'))),
+    'record:a': ('arecord', (
+        ('fqdn*', 'name'), ('address*', 'ipv4addr'), ('view', 'view'),
+        ('ttl', 'ttl'), ('comment', 'comment'))),
+    'record:cname': ('cnamerecord', (
+        ('fqdn*', 'name'), ('canonical_name*', 'canonical'),
+        ('view', 'view'), ('ttl', 'ttl'), ('comment', 'comment'))),
+    'record:srv': ('srvrecord', (
+        ('fqdn*', 'name'), ('port*', 'port'), ('priority*', 'priority'),
+        ('target*', 'target'), ('weight*', 'weight'), ('view', 'view'),
+        ('ttl', 'ttl'), ('comment', 'comment'))),
+    'record:mx': ('mxrecord', (
+        ('fqdn*', 'name'), ('mx*', 'mail_exchanger'),
+        ('priority*', 'preference'), ('view', 'view'), ('ttl', 'ttl'),
+        ('comment', 'comment'))),
+    'record:rpz:cname': ('responsepolicycnamerecord', (
+        ('fqdn*', 'name'), ('canonical_name*', 'canonical'),
+        ('parent_zone*', 'rp_zone'), ('view', 'view'), ('ttl', 'ttl'),
+        ('comment', 'comment'))),
+}
+
+# Host addresses carrying a MAC are imported as rows of their own
+HOST_ADDRESS = ('hostaddress', (
+    ('parent*', 'host'), ('address*', 'ipv4addr'), ('mac_address', 'mac'),
+    ('configure_for_dhcp', 'configure_for_dhcp'), ('view', 'view')))
+
+_FINISHED = frozenset(['COMPLETED', 'FAILED', 'STOPPED'])
+
+
+class _csv_import(object):
+
+    def __init__(self, infoblox_, operation='INSERT', on_error='CONTINUE'):
+        """
+        class constructor - Automatically called on class instantiation
+
+        input   infoblox_ (object)      Parent class object
+                operation (string)      Optional: INSERT, UPDATE, REPLACE,
+                                        DELETE or CUSTOM
+                on_error (string)       Optional: CONTINUE past rejected
+                                        rows or STOP at the first one
+        output  void (void)
+        """
+        self.infoblox_ = infoblox_
+        self.operation = operation
+        self.on_error = on_error
+        self.rows = 0
+        self.token = None
+        self.import_id = None
+        self.task = None
+        self.errors = []
+
+    @property
+    def status(self):
+        """
+        status - State of the import task, e.g. RUNNING or COMPLETED
+        """
+        if self.task is None:
+            return None
+        return self.task.get('status')
+
+    def run(self, records, objtype=None, interval=2, timeout=None):
+        """
+        run - Write records to a CSV file, upload and import it, wait for
+              the import task to finish and collect the rows it rejected
+
+        input   records (iterator)      Record dicts or compact records
+                objtype (string)        Optional: WAPI object type of dict
+                                        records, e.g. record:host
+                interval (float)        Optional: Seconds between polls
+                timeout (float)         Optional: Seconds to wait for the
+                                        import task
+        output  0 (int)                 Import finished, see status and
+                                        errors
+        """
+        fileobj = tempfile.TemporaryFile()
+        try:
+            self.write(fileobj, records, objtype)
+            ret = self.upload(fileobj)
+        finally:
+            fileobj.close()
+        if ret != 0:
+            return ret
+        ret = self.start()
+        if ret != 0:
+            return ret
+        ret = self.wait(interval, timeout)
+        if ret != 0:
+            return ret
+        if self.task.get('lines_failed'):
+            ret = self.error_report()
+            if not isinstance(ret, list):
+                return ret
+        return 0
+
+    def write(self, fileobj, records, objtype=None):
+        """
+        write - Stream records into an Infoblox CSV import file
+
+        input   fileobj (file)          Binary file to write to
+                records (iterator)      Record dicts or compact records
+                objtype (string)        Optional: WAPI object type of dict
+                                        records
+        output  rows (int)              Rows written
+        """
+        text = io.TextIOWrapper(fileobj, encoding='utf-8', newline='')
+        writer = _csv_writer(text)
+        for record in records:
+            writer.write(objtype or record.objtype, record)
+        text.flush()
+        text.detach()
+        self.rows = writer.rows
+        return self.rows
+
+    def upload(self, fileobj):
+        """
+        upload - Upload a file to the appliance for importing
+
+        input   fileobj (file)          Binary file to upload
+        output  0 (int)                 File uploaded, its token is kept
+                                        in token
+        """
+        init = self._fileop('uploadinit', {}, 'initialize the CSV upload')
+        if not isinstance(init, dict):
+            return init
+        body = _multipart(fileobj, 'import.csv')
+        resp = self.infoblox_._request('POST', init['url'], data=body,
+                                       headers={'Content-Type':
+                                                body.content_type})
+        if resp.status_code != 200:
+            return self._error('upload the CSV file', resp)
+        self.token = init['token']
+        return 0
+
+    def start(self):
+        """
+        start - Start importing the uploaded file
+
+        input   void (void)
+        output  0 (int)                 Import task started
+        """
+        data = self._fileop('csv_import', {
+            'token': self.token, 'action': 'START',
+            'operation': self.operation, 'on_error': self.on_error},
+            'start the CSV import')
+        if not isinstance(data, dict):
+            return data
+        self.task = data['csv_import_task']
+        self.import_id = self.task['import_id']
+        return 0
+
+    def poll(self):
+        """
+        poll - Refresh the state of the import task
+
+        input   void (void)
+        output  0 (int)                 Task refreshed, see status
+        """
+        resp = self.infoblox_.get('csvimporttask?import_id={0}'
+                                  .format(self.import_id))
+        if resp.status_code != 200:
+            return self._error('poll the CSV import', resp)
+        self.task = json.loads(resp.text)[0]
+        return 0
+
+    def wait(self, interval=2, timeout=None):
+        """
+        wait - Poll the import task until it has finished
+
+        input   interval (float)        Optional: Seconds between polls
+                timeout (float)         Optional: Seconds to wait
+        output  0 (int)                 Task finished
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while self.status not in _FINISHED:
+            if deadline is not None and time.time() >= deadline:
+                try:
+                    return self.infoblox_.__caller__(
+                        'Timed out waiting for CSV import {0} - Status {1}'
+                        .format(self.import_id, self.status), 408)
+                except Exception:
+                    return 408
+            time.sleep(interval)
+            ret = self.poll()
+            if ret != 0:
+                return ret
+        return 0
+
+    def error_report(self):
+        """
+        error_report - Download the error log of the import task. Every
+                       rejected row is reported with its object type, its
+                       fields by CSV column and the error message
+
+        input   void (void)
+        output  errors (list)           Dicts with object, fields and error
+        """
+        data = self._fileop('csv_error_log', {'import_id': self.import_id},
+                            'retrieve the CSV error log')
+        if not isinstance(data, dict):
+            return data
+        buf = io.BytesIO()
+        ret = _download(self.infoblox_, data, buf)
+        if ret != 0:
+            return ret
+        buf.seek(0)
+        text = io.TextIOWrapper(buf, encoding='utf-8', newline='')
+        self.errors = []
+        for csvtype, header, row in _csv_rows(text):
+            self.errors.append({'object': csvtype,
+                                'fields': dict(zip(header, row)),
+                                'error': (row[len(header)]
+                                          if len(row) > len(header) else '')})
+        return self.errors
+
+    def _fileop(self, function, payload, action):
+        return _fileop(self.infoblox_, function, payload, action)
+
+    def _error(self, action, resp):
+        try:
+            return self.infoblox_.__caller__(
+                'Could not {0} - Status {1}'.format(action, resp.status_code),
+                resp.status_code)
+        except Exception:
+            return resp.status_code
+
+
+def _csv_export(infoblox_, objtype, path):
+    """
+    _csv_export - Export every object of a type through the grid's CSV
+                  export, streaming the file to disk as it is downloaded
+
+    input   infoblox_ (object)      Parent class object
+            objtype (string)        WAPI object type, e.g. record:host
+            path (string)           File to write
+    output  0 (int)                 Export downloaded
+    """
+    data = _fileop(infoblox_, 'csv_export', {'_object': objtype},
+                   'export {0}'.format(objtype))
+    if not isinstance(data, dict):
+        return data
+    # Downloaded next to the target and renamed into place once complete,
+    # so a failed download never leaves a partial file behind
+    fd, part = tempfile.mkstemp(prefix='.{0}.'.format(os.path.basename(path)),
+                                dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, 'wb') as fileobj:
+            ret = _download(infoblox_, data, fileobj)
+        if ret == 0:
+            getattr(os, 'replace', os.rename)(part, path)
+        return ret
+    finally:
+        if os.path.exists(part):
+            os.remove(part)
+
+
+def _fileop(infoblox_, function, payload, action):
+    """
+    _fileop - Call a fileop function
+
+    input   infoblox_ (object)      Parent class object
+            function (string)       Function name, e.g. uploadinit
+            payload (dict)          Function arguments
+            action (string)         Description for the error callback
+    output  data (dict)             Parsed JSON response
+    """
+    resp = infoblox_.post('fileop?_function={0}'.format(function),
+                          json.dumps(payload))
+    if resp.status_code != 200:
+        try:
+            return infoblox_.__caller__(
+                'Could not {0} - Status {1}'.format(action, resp.status_code),
+                resp.status_code)
+        except Exception:
+            return resp.status_code
+    return json.loads(resp.text)
+
+
+def _download(infoblox_, data, fileobj):
+    """
+    _download - Stream a file prepared by a fileop function to disk, then
+                let the appliance release it
+
+    input   infoblox_ (object)      Parent class object
+            data (dict)             token and url returned by the function
+            fileobj (file)          Binary file to write to
+    output  0 (int)                 File downloaded
+    """
+    resp = infoblox_._request('GET', data['url'], stream=True)
+    try:
+        if resp.status_code != 200:
+            try:
+                return infoblox_.__caller__(
+                    'Could not download {0} - Status {1}'
+                    .format(data['url'], resp.status_code), resp.status_code)
+            except Exception:
+                return resp.status_code
+        for chunk in resp.iter_content(infoblox_.chunk_size):
+            fileobj.write(chunk)
+    finally:
+        resp.close()
+    ret = _fileop(infoblox_, 'downloadcomplete', {'token': data['token']},
+                  'complete the download')
+    if not isinstance(ret, dict):
+        return ret
+    return 0
+
+
+class _csv_writer(object):
+    """
+    Writes records as Infoblox CSV rows. A header row is written whenever
+    the columns of an object type change, e.g. when a record carries
+    extensible attributes the previous one did not
+    """
+
+    def __init__(self, text):
+        self.writer = csv.writer(text, lineterminator='\n')
+        self.headers = {}
+        self.rows = 0
+
+    def write(self, objtype, record):
+        if objtype not in CSV_TYPES:
+            raise ValueError('No CSV import for {0}'.format(objtype))
+        csvtype, columns = CSV_TYPES[objtype]
+        addresses = []
+        if objtype == 'record:host':
+            for addr in record.get('ipv4addrs') or []:
+                if addr.get('mac'):
+                    addresses.append(addr)
+        self._row(csvtype, columns, _values(record, columns, addresses),
+                  record.get('extattrs'))
+        for addr in addresses:
+            self._row(HOST_ADDRESS[0], HOST_ADDRESS[1], _values(
+                {'host': record.get('name'), 'view': record.get('view'),
+                 'ipv4addr': addr.get('ipv4addr'), 'mac': addr.get('mac'),
+                 'configure_for_dhcp': addr.get('configure_for_dhcp')},
+                HOST_ADDRESS[1]))
+
+    def _row(self, csvtype, columns, values, extattrs=None):
+        header = [column for column, _ in columns]
+        for name in sorted(extattrs or {}):
+            header.append('EA-{0}'.format(name))
+            values.append(_text(extattrs[name].get('value')))
+        if self.headers.get(csvtype) != header:
+            self.writer.writerow(['header-{0}'.format(csvtype)] + header)
+            self.headers[csvtype] = header
+        self.writer.writerow([csvtype] + values)
+        self.rows += 1
+
+
+def _values(record, columns, skip=()):
+    values = []
+    for _, field in columns:
+        value = record.get(field)
+        if field == 'ipv4addrs':
+            value = ','.join(a.get('ipv4addr') for a in value or []
+                             if a not in skip)
+        elif field == 'aliases':
+            value = ','.join(value or [])
+        values.append(_text(value))
+    return values
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    return '{0}'.format(value)
+
+
+def _csv_rows(text):
+    """
+    _csv_rows - Read the data rows of an Infoblox CSV file
+
+    input   text (file)             Text file to read
+    output  rows (generator)        (CSV object type, header, values)
+                                    tuples, header and values without the
+                                    object type column
+    """
+    headers = {}
+    for row in csv.reader(text):
+        if not row:
+            continue
+        if row[0].lower().startswith('header-'):
+            headers[row[0][7:].lower()] = [c.rstrip('*') for c in row[1:]]
+            continue
+        csvtype = row[0].lower()
+        yield csvtype, headers.get(csvtype, []), row[1:]
+
+
+class _multipart(object):
+    """
+    multipart/form-data body streaming a file from disk, so uploads of any
+    size are sent without being read into memory
+    """
+
+    def __init__(self, fileobj, filename, name='file'):
+        boundary = uuid.uuid4().hex
+        self.content_type = ('multipart/form-data; boundary={0}'
+                             .format(boundary))
+        head = ('--{0}\r\nContent-Disposition: form-data; name="{1}"; '
+                'filename="{2}"\r\nContent-Type: application/octet-stream'
+                '\r\n\r\n'.format(boundary, name, filename)).encode('utf-8')
+        tail = '\r\n--{0}--\r\n'.format(boundary).encode('utf-8')
+        fileobj.seek(0, io.SEEK_END)
+        self._length = len(head) + fileobj.tell() + len(tail)
+        self._all = [io.BytesIO(head), fileobj, io.BytesIO(tail)]
+        self.seek(0)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(65536)
+            if not chunk:
+                return
+            yield chunk
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # Only rewinding is supported, so the body can be sent again
+        if offset or whence != io.SEEK_SET:
+            raise io.UnsupportedOperation('multipart bodies only rewind')
+        for part in self._all:
+            part.seek(0)
+        self._parts = list(self._all)
+        return 0
+
+    def read(self, size=-1):
+        ret = b''
+        while self._parts and (size < 0 or len(ret) < size):
+            chunk = self._parts[0].read(size - len(ret) if size >= 0 else -1)
+            if not chunk:
+                self._parts.pop(0)
+                continue
+            ret += chunk
+        return ret
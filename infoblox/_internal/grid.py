@@ -5,6 +5,10 @@ https://ipam.illinois.edu/wapidoc/objects/grid.html
 """
 import json
 
+# Counters of grid:servicerestart:status
+STATUS_FIELDS = ('failures', 'finished', 'pending', 'processing',
+                 'restarting', 'success', 'timeouts')
+
 
 class _grid(object):
 
@@ -37,19 +41,38 @@ class _grid(object):
                 return resp.status_code
         return json.loads(resp.text)[0]['_ref']
 
-    def restart(self):
+    def restart(self, member_order='SEQUENTIALLY', sequential_delay=10,
+                service_option='ALL', restart_option='RESTART_IF_NEEDED',
+                members=None):
         """
         grid_restart - Restart the Infoblox gridmaster, required to save
                        changes to host records
 
-        input   void (void)
+        input   member_order (string)   Optional: SEQUENTIALLY or
+                                        SIMULTANEOUSLY
+                sequential_delay (int)  Optional: Seconds between members
+                                        restarted sequentially
+                service_option (string) Optional: ALL, DNS, DHCP, DHCPV4 or
+                                        DHCPV6
+                restart_option (string) Optional: RESTART_IF_NEEDED or
+                                        FORCE_RESTART
+                members (list)          Optional: Names of the members to
+                                        restart, every member by default
         output  0 (int)                 Success
                 1 (int)                 Failure
         """
-        resp = self.infoblox_.post('{0}?_function=restartservices&member_order=SEQUENTIALLY'
-                                   '&sequential_delay=10&service_option=ALL'
-                                   '&restart_option=RESTART_IF_NEEDED'
-                                   .format(self._ref_), '')
+        args = {'member_order': member_order,
+                'service_option': service_option,
+                'restart_option': restart_option}
+        if member_order == 'SEQUENTIALLY':
+            args['sequential_delay'] = sequential_delay
+        if members:
+            args['members'] = list(members)
+        # Restarting only if needed is idempotent and may be retried; a
+        # forced restart sent twice would restart the services twice
+        resp = self.infoblox_.post('{0}?_function=restartservices'
+                                   .format(self._ref_), json.dumps(args),
+                                   safe=restart_option != 'FORCE_RESTART')
         if resp.status_code != 200:
             try:
                 return self.infoblox_.__caller__(
@@ -58,3 +81,41 @@ class _grid(object):
             except Exception:
                 return resp.status_code
         return 0
+
+    def restart_status(self):
+        """
+        restart_status - Progress of the service restarts on the grid
+
+        input   void (void)
+        output  status (dict)           Member counts by restart state:
+                                        pending, processing, restarting,
+                                        finished, success, failures and
+                                        timeouts
+        """
+        resp = self.infoblox_.get('grid:servicerestart:status?_return_fields='
+                                  '{0}'.format(','.join(STATUS_FIELDS)))
+        if resp.status_code != 200:
+            try:
+                return self.infoblox_.__caller__(
+                    'Could not get the restart status - Status {0}'
+                    .format(resp.status_code), resp.status_code)
+            except Exception:
+                return resp.status_code
+        try:
+            status = json.loads(resp.text)[0]
+        except (ValueError, IndexError):
+            return None
+        status.pop('_ref', None)
+        return status
+
+
+def _restarting(status):
+    """
+    _restarting - Whether members are still waiting for or going through a
+                  restart
+
+    input   status (dict)           Result of _grid.restart_status()
+    output  restarting (bool)       The restart has not finished
+    """
+    return any(status.get(field) for field in
+               ('pending', 'processing', 'restarting'))
@@ -4,24 +4,36 @@ host records.
 WAPI documentation can be found here:
 https://ipam.illinois.edu/wapidoc/objects/record.host.html
 """
-import re
 import json
 
+from .payloads import _host_lookup, _host_update
+from .ref import _lazy_ref, _return_fields, _returned_ref, _search
+from .records import _fetched
+
 
 class _host(object):
 
-    def __init__(self, infoblox_, hostname):
+    _ref_ = _lazy_ref()
+
+    def __init__(self, infoblox_, hostname, view=None, zone=None,
+                 regex=False):
         """
         class constructor - Automatically called on class instantiation
 
         input   hostname (string)   Hostname to specify Infoblox host record
                 infoblox_ (object)  Parent class object
+                view (string)       Optional: DNS view of the record
+                zone (string)       Optional: Zone of the record
+                regex (bool)        Optional: Look the record up with a
+                                    regular expression search
         output  void (void)
         """
         self.infoblox_ = infoblox_
+        self.view = view
+        self.zone = zone
+        self.regex = regex
         if hostname is not None:
             self.hostname = hostname
-            self._ref_ = self._ref()
 
     def _ref(self):
         """
@@ -31,10 +43,22 @@ class _host(object):
         output  host _ref           _ref ID for a host record
         """
         try:
-            return self.fetch()['_ref']
+            return self.fetch(_ref=True)['_ref']
         except Exception:
             return None
 
+    def _key(self):
+        """
+        _key - Key of the record in the client-wide _ref cache
+
+        input   void (void)
+        output  key (tuple)             (object type, name, view), None for
+                                        regex lookups
+        """
+        if self.regex:
+            return None
+        return ('record:host', self.hostname, self.view)
+
     def fetch(self, **return_fields):
         """
         fetch - Retrieve all information from a specified host record
@@ -42,11 +66,9 @@ class _host(object):
         input   return_fields (dict)    Key value pairs of data to be returned
         output  resp (parsed json)  Parsed JSON response
         """
-        return_query = ','.join([k for k in return_fields.keys()
-                                 if return_fields[k]])
-        query = "record:host?name~={0}".format(self.hostname)
-        if return_query:
-            query += '&_return_fields=' + return_query
+        query = _search('record:host', 'name', self.hostname, self.regex,
+                        self.view, self.zone)
+        query += _return_fields(self.infoblox_, 'record:host', return_fields)
         resp = self.infoblox_.get(query)
         if resp.status_code != 200:
             try:
@@ -58,7 +80,8 @@ class _host(object):
             except Exception:
                 return resp.status_code
         try:
-            return json.loads(resp.text)[0]
+            return _fetched(self.infoblox_, 'record:host',
+                            json.loads(resp.text)[0])
 
         except(ValueError, IndexError):
             return None
@@ -89,6 +112,7 @@ class _host(object):
                                                  resp.status_code)
             except Exception:
                 return resp.status_code
+        self._ref_ = _returned_ref(resp)
         return 0
 
     def delete(self):
@@ -100,6 +124,9 @@ class _host(object):
                 errno (int)         Error code of API call
         """
         resp = self.infoblox_.delete(self._ref_)
+        # Only a record that is gone loses its cached _ref
+        if resp.status_code == 200:
+            del self._ref_
         if resp.status_code != 201:
             try:
                 return self.infoblox_.__caller__('Error creating host record '
@@ -111,42 +138,45 @@ class _host(object):
                 return resp.status_code
         return 0
 
-    def update(self, ip=None, mac=None, ttl=None):
+    def update(self, ip=None, mac=None, ttl=None, comment=None,
+               extattrs=None, old_ip=None):
         """
-        update - Update a Host record with new attributes
+        update - Update a Host record with new attributes. Every change is
+                 sent in a single PUT
 
-        input   ip (string)         Optional: IP address of a host record
-                ttl (int)           Optional: MAC address of a host record
+        input   ip (string)         Optional: IP address of a host record.
+                                    Replaces old_ip if given, otherwise
+                                    the first address of the record
+                mac (string)        Optional: MAC address of a host record.
+                                    Left as it is when not given
+                ttl (int)           Optional: Time to live
+                comment (string)    Optional: Comment
+                extattrs (dict)     Optional: Extensible attributes, merged
+                                    into the current ones
+                old_ip (string)     Optional: Address to change, leaving
+                                    the other addresses alone. Without
+                                    it, or when the address moves and
+                                    keeps its MAC, the record is read
+                                    first
         output  0 (int)             Success
         """
-        if ttl is not None:
-            payload = '{{"ttl": {0}}}'.format(ttl)
-            resp = self.infoblox_.put(self._ref_, payload)
-            if resp.status_code != 200:
-                try:
-                    return self.infoblox_.__caller__('Error updating host '
-                                                     'record {0}'
-                                                     '- Status: {1}'
-                                                     .format(self.hostname,
-                                                             resp.status_code),
-                                                     resp.status_code)
-                except Exception:
-                    return resp.status_code
-        if ip is not None and mac is None:
+        current = None
+        if _host_lookup(ip, mac, old_ip):
             try:
-                mac = self.fetch()['ipv4addrs'][0]['mac']
+                current = self.fetch(ipv4addrs=True)['ipv4addrs']
             except Exception:
-                pass
-            if re.match('(?:[0-9a-fA-F]:?){12}', mac):
-                payload = '{{"ipv4addrs":[{{"ipv4addr":"{0}","mac":"{1}"}}]}}'.format(ip, mac)
-            else:
-                payload = '{{"ipv4addrs":[{{"ipv4addr":"{0}"}}]}}'.format(ip)
-        if mac is not None and ip is None:
-            payload = '{{"ipv4addrs":[{{"ipv4addr":"{0}","mac":"{1}"}}]}}'\
-                    .format(self.fetch()['ipv4addrs'][0]['ipv4addr'], mac)
-        if mac is not None and ip is not None:
-            payload = '{{"ipv4addrs":[{{"ipv4addr":"{0}","mac":"{1}"}}]}}'.format(ip, mac)
-        resp = self.infoblox_.put(self._ref_, payload)
+                current = None
+            if not current:
+                try:
+                    return self.infoblox_.__caller__(
+                        'Could not find the address of host record {0}'
+                        .format(self.hostname), 404)
+                except Exception:
+                    return 404
+        data = _host_update(current, ip, mac, ttl, comment, extattrs, old_ip)
+        if not data:
+            return 0
+        resp = self.infoblox_.put(self._ref_, json.dumps(data))
         if resp.status_code != 200:
             try:
                 return self.infoblox_.__caller__('Error updating host record '
@@ -156,6 +186,7 @@ class _host(object):
                                                  resp.status_code)
             except Exception:
                 return resp.status_code
+        self._ref_ = _returned_ref(resp)
         return 0
 
     def alias(self):
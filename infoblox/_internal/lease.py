@@ -6,20 +6,27 @@ https://ipam.illinois.edu/wapidoc/objects/lease.html
 """
 import json
 
+from .ref import _lazy_ref, _return_fields, _search
+from .records import _fetched
+
 
 class _lease(object):
 
-    def __init__(self, infoblox_, address):
+    _ref_ = _lazy_ref()
+
+    def __init__(self, infoblox_, address, regex=False):
         """
         class constructor - Automatically called on class instantiation
 
         input   infoblox_ (object)      Parent class object
                 address (string)        IP address of lease
+                regex (bool)            Optional: Look the lease up with a
+                                        regular expression search
         output  void (void)
         """
         self.infoblox_ = infoblox_
         self.address = address
-        self._ref_ = self._ref()
+        self.regex = regex
 
     def _ref(self):
         """
@@ -29,10 +36,22 @@ class _lease(object):
         output  host _ref               _ref ID for CNAME record
         """
         try:
-            return self.fetch('')['_ref']
+            return self.fetch(_ref=True)[0]['_ref']
         except Exception:
             return None
 
+    def _key(self):
+        """
+        _key - Key of the record in the client-wide _ref cache
+
+        input   void (void)
+        output  key (tuple)             (object type, name, view), None for
+                                        regex lookups
+        """
+        if self.regex:
+            return None
+        return ('lease', self.address, None)
+
     def fetch(self, **return_fields):
         """
         fetch - Fetch specified fields of a lease object
@@ -40,11 +59,8 @@ class _lease(object):
         input   return_fields (dict)    Key value pairs of data to be returned
         output  resp (parsed json)      Parsed JSON response
         """
-        return_query = ','.join([k for k in return_fields.keys()
-                                 if return_fields[k]])
-        query = "lease?address~={0}".format(self.address)
-        if return_query:
-            query += '&_return_fields=' + return_query
+        query = _search('lease', 'address', self.address, self.regex)
+        query += _return_fields(self.infoblox_, 'lease', return_fields)
         resp = self.infoblox_.get(query)
         if resp.status_code != 200:
             try:
@@ -53,4 +69,5 @@ class _lease(object):
                     .format(self.address, resp.status_code), resp.status_code)
             except Exception:
                 return resp.status_code
-        return json.loads(resp.text)
+        return [_fetched(self.infoblox_, 'lease', obj)
+                for obj in json.loads(resp.text)]
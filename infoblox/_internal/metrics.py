@@ -0,0 +1,228 @@
+"""
+Per-request instrumentation. Hooks registered on a client are called after
+every WAPI request with a dict describing it:
+
+    method      HTTP method
+    object      WAPI object type, e.g. record:host, or the function called
+    status      HTTP status code, 0 when no response was received
+    sent        Request body size in bytes
+    received    Response body size in bytes
+    latency     Seconds from sending the request to receiving the response
+
+_metrics aggregates the calls into counters and latency histograms and
+renders them in the Prometheus text format; _statsd sends each call as
+statsd lines over UDP.
+"""
+import socket
+import threading
+import time
+
+# Upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _object(api_function):
+    """
+    _object - WAPI object type a request is made against
+
+    input   api_function (string)   Function called in WAPI
+    output  object (string)         Object type without _ref or arguments
+    """
+    api_function = '{0}'.format(api_function)
+    if api_function.startswith(('http://', 'https://')):
+        # File transfers, e.g. /http_direct_file_io/<token>/import_file
+        api_function = api_function.partition('://')[2].partition('/')[2]
+    return api_function.partition('?')[0].partition('/')[0] or 'schema'
+
+
+def _emit(hooks, method, api_function, status, sent, received, start):
+    """
+    _emit - Call every hook with the description of a finished request.
+            A failing hook never fails the request
+
+    input   hooks (list)            Hooks to call
+            method (string)         HTTP method
+            api_function (string)   Function called in WAPI
+            status (int)            HTTP status code, 0 if none
+            sent (int)              Request body bytes
+            received (int)          Response body bytes
+            start (float)           time.time() when the request was sent
+    output  void (void)
+    """
+    call = {'method': method, 'object': _object(api_function),
+            'status': status, 'sent': sent, 'received': received,
+            'latency': time.time() - start}
+    for hook in hooks:
+        try:
+            hook(call)
+        except Exception:
+            pass
+
+
+class _metrics(object):
+
+    def __init__(self, buckets=BUCKETS):
+        """
+        class constructor - Automatically called on class instantiation
+
+        input   buckets (tuple)         Optional: Upper bounds, in seconds,
+                                        of the latency histogram buckets
+        output  void (void)
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.requests = {}
+        self.latency = {}
+        self.bytes = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, call):
+        """
+        __call__ - Record a request. Used as a client hook
+
+        input   call (dict)             Request description
+        output  void (void)
+        """
+        key = (call['method'], call['object'])
+        bucket = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if call['latency'] <= bound:
+                bucket = i
+                break
+        with self._lock:
+            status = key + (call['status'],)
+            self.requests[status] = self.requests.get(status, 0) + 1
+            hist = self.latency.get(key)
+            if hist is None:
+                hist = self.latency[key] = [[0] * (len(self.buckets) + 1),
+                                            0.0, 0]
+            hist[0][bucket] += 1
+            hist[1] += call['latency']
+            hist[2] += 1
+            sent, received = self.bytes.get(key, (0, 0))
+            self.bytes[key] = (sent + call['sent'],
+                               received + call['received'])
+
+    def clear(self):
+        """
+        clear - Reset every counter and histogram
+
+        input   void (void)
+        output  void (void)
+        """
+        with self._lock:
+            self.requests.clear()
+            self.latency.clear()
+            self.bytes.clear()
+
+    def stats(self):
+        """
+        stats - Totals per method and object type
+
+        input   void (void)
+        output  stats (dict)            (method, object) -> count, errors
+                                        (status >= 400 or none), mean
+                                        latency in seconds, bytes sent and
+                                        received
+        """
+        ret = {}
+        with self._lock:
+            for (method, obj), (_, total, count) in self.latency.items():
+                errors = sum(n for (m, o, s), n in self.requests.items()
+                             if (m, o) == (method, obj) and
+                             (s == 0 or s >= 400))
+                sent, received = self.bytes[(method, obj)]
+                ret[(method, obj)] = {'count': count, 'errors': errors,
+                                      'latency': total / count,
+                                      'sent': sent, 'received': received}
+        return ret
+
+    def prometheus(self, prefix='infoblox_wapi'):
+        """
+        prometheus - Render the metrics in the Prometheus text exposition
+                     format
+
+        input   prefix (string)         Optional: Metric name prefix
+        output  text (string)           Metrics page
+        """
+        lines = []
+        with self._lock:
+            lines.append('# HELP {0}_requests_total WAPI requests by method, '
+                         'object type and status'.format(prefix))
+            lines.append('# TYPE {0}_requests_total counter'.format(prefix))
+            for (method, obj, status), n in sorted(self.requests.items()):
+                lines.append('{0}_requests_total{{{1},status="{2}"}} {3}'
+                             .format(prefix, _labels(method, obj), status, n))
+            lines.append('# HELP {0}_request_seconds WAPI request latency'
+                         .format(prefix))
+            lines.append('# TYPE {0}_request_seconds histogram'
+                         .format(prefix))
+            for (method, obj), (counts, total, count) in \
+                    sorted(self.latency.items()):
+                labels = _labels(method, obj)
+                cumulative = 0
+                for bound, n in zip(self.buckets + ('+Inf',), counts):
+                    cumulative += n
+                    lines.append('{0}_request_seconds_bucket{{{1},le="{2}"}} '
+                                 '{3}'.format(prefix, labels, bound,
+                                              cumulative))
+                lines.append('{0}_request_seconds_sum{{{1}}} {2}'
+                             .format(prefix, labels, repr(total)))
+                lines.append('{0}_request_seconds_count{{{1}}} {2}'
+                             .format(prefix, labels, count))
+            for i, direction in enumerate(('sent', 'received')):
+                lines.append('# TYPE {0}_bytes_{1}_total counter'
+                             .format(prefix, direction))
+                for (method, obj), sizes in sorted(self.bytes.items()):
+                    lines.append('{0}_bytes_{1}_total{{{2}}} {3}'
+                                 .format(prefix, direction,
+                                         _labels(method, obj), sizes[i]))
+        return '\n'.join(lines) + '\n'
+
+
+class _statsd(object):
+
+    def __init__(self, host='127.0.0.1', port=8125, prefix='infoblox.wapi'):
+        """
+        class constructor - Automatically called on class instantiation
+
+        input   host (string)           Optional: statsd host
+                port (int)              Optional: statsd UDP port
+                prefix (string)         Optional: Metric name prefix
+        output  void (void)
+        """
+        self.address = (host, port)
+        self.prefix = prefix
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def __call__(self, call):
+        """
+        __call__ - Send a request as statsd lines. Used as a client hook
+
+        input   call (dict)             Request description
+        output  void (void)
+        """
+        self.sock.sendto('\n'.join(self.lines(call)).encode('utf-8'),
+                         self.address)
+
+    def lines(self, call):
+        """
+        lines - statsd lines describing a request: a counter per status,
+                a timer and the bytes transferred
+
+        input   call (dict)             Request description
+        output  lines (list)            statsd line protocol strings
+        """
+        name = '{0}.{1}.{2}'.format(
+                   self.prefix, call['method'].lower(),
+                   call['object'].replace(':', '_').replace('.', '_'))
+        return ['{0}.status.{1}:1|c'.format(name, call['status']),
+                '{0}.latency:{1:.3f}|ms'.format(name, call['latency'] * 1000),
+                '{0}.sent:{1}|c'.format(name, call['sent']),
+                '{0}.received:{1}|c'.format(name, call['received'])]
+
+    def close(self):
+        self.sock.close()
+
+
+def _labels(method, obj):
+    return 'method="{0}",object="{1}"'.format(method, obj)
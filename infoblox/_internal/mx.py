@@ -6,20 +6,32 @@ https://ipam.illinois.edu/wapidoc/objects/record.a.html
 """
 import json
 
+from .ref import _lazy_ref, _return_fields, _search
+from .records import _fetched
+
 
 class _mx(object):
 
-    def __init__(self, infoblox_, mail_exchanger):
+    _ref_ = _lazy_ref()
+
+    def __init__(self, infoblox_, mail_exchanger, view=None, zone=None,
+                 regex=False):
         """
         class constructor - Automatically called on class instantiation
 
         input   infoblox_ (object)      Parent class object
-                address (string)        IP address of lease
+                mail_exchanger (string) Mail exchanger of the record
+                view (string)           Optional: DNS view of the record
+                zone (string)           Optional: Zone of the record
+                regex (bool)            Optional: Look the record up with
+                                        a regular expression search
         output  void (void)
         """
         self.infoblox_ = infoblox_
         self.mail_exchanger = mail_exchanger
-        self._ref_ = self._ref()
+        self.view = view
+        self.zone = zone
+        self.regex = regex
 
     def _ref(self):
         """
@@ -29,10 +41,22 @@ class _mx(object):
         output  host _ref               _ref ID for CNAME record
         """
         try:
-            return self.fetch()['_ref']
+            return self.fetch(_ref=True)['_ref']
         except Exception:
             return None
 
+    def _key(self):
+        """
+        _key - Key of the record in the client-wide _ref cache
+
+        input   void (void)
+        output  key (tuple)             (object type, name, view), None for
+                                        regex lookups
+        """
+        if self.regex:
+            return None
+        return ('record:mx', self.mail_exchanger, self.view)
+
     def fetch(self, **return_fields):
         """
         fetch - Retrieve all information from a specified host record
@@ -40,11 +64,9 @@ class _mx(object):
         input   return_fields (dict)    Key value pairs of data to be returned
         output  resp (parsed json)  Parsed JSON response
         """
-        return_query = ','.join([k for k in return_fields.keys()
-                                 if return_fields[k]])
-        query = "record:mx?mail_exchanger~={0}".format(self.mail_exchanger)
-        if return_query:
-            query += '&_return_fields=' + return_query
+        query = _search('record:mx', 'mail_exchanger', self.mail_exchanger,
+                        self.regex, self.view, self.zone)
+        query += _return_fields(self.infoblox_, 'record:mx', return_fields)
         resp = self.infoblox_.get(query)
         if resp.status_code != 200:
             try:
@@ -56,7 +78,8 @@ class _mx(object):
             except Exception:
                 return resp.status_code
         try:
-            return json.loads(resp.text)[0]
+            return _fetched(self.infoblox_, 'record:mx',
+                            json.loads(resp.text)[0])
 
         except(ValueError, IndexError):
             return None
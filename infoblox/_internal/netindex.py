@@ -0,0 +1,150 @@
+"""
+A local index of DHCP network objects answering longest-prefix-match
+lookups in memory. The networks are downloaded once with a paged search,
+so mapping addresses to networks needs no WAPI call per address.
+WAPI documentation can be found here:
+https://ipam.illinois.edu/wapidoc/objects/network.html
+"""
+import ipaddress
+
+
+class _network_index(object):
+
+    def __init__(self, infoblox_, network_view=None, page_size=None):
+        """
+        class constructor - Automatically called on class instantiation
+
+        input   infoblox_ (object)      Parent class object
+                network_view (string)   Optional: Network view to index
+                page_size (int)         Optional: Networks per page when
+                                        downloading
+        output  void (void)
+        """
+        self.infoblox_ = infoblox_
+        self.network_view = network_view
+        self.page_size = page_size
+        # (tables, lengths), replaced as a whole on every change
+        self._index = ({}, {})
+
+    def __len__(self):
+        return sum(len(t) for t in self._index[0].values())
+
+    def refresh(self):
+        """
+        refresh - Download every network and rebuild the index. The new
+                  index replaces the old one in a single assignment, so
+                  lookups running meanwhile keep using the old one
+
+        input   void (void)
+        output  count (int)             Number of networks indexed
+        """
+        tables = {}
+        for record in self.infoblox_.iter_networks(
+                self.network_view, self.page_size,
+                _return_fields='network,comment,network_view'):
+            _insert(tables, record)
+        self._index = (tables, _lengths(tables))
+        return len(self)
+
+    def update(self, network):
+        """
+        update - Refresh a single network from the WAPI, adding, replacing
+                 or removing it from the index
+
+        input   network (string)        Network in CIDR notation
+        output  record (dict)           Current network object, None if it
+                                        no longer exists
+        """
+        query = 'network?network={0}&_return_fields=network,comment,' \
+                'network_view'.format(network)
+        if self.network_view is not None:
+            query += '&network_view={0}'.format(self.network_view)
+        resp = self.infoblox_.get(query)
+        if resp.status_code != 200:
+            try:
+                return self.infoblox_.__caller__(
+                    'Could not refresh network {0} - Status {1}'
+                    .format(network, resp.status_code), resp.status_code)
+            except Exception:
+                return resp.status_code
+        records = resp.json()
+        tables = dict((k, dict(v)) for k, v in self._index[0].items())
+        net = ipaddress.ip_network(u'{0}'.format(network))
+        tables.get((net.version, net.prefixlen), {}).pop(
+            int(net.network_address), None)
+        for record in records:
+            _insert(tables, record)
+        self._index = (tables, _lengths(tables))
+        return records[0] if records else None
+
+    def lookup(self, ip):
+        """
+        lookup - Find the most specific network containing an address
+
+        input   ip (string)             IP address
+        output  record (dict)           Network object, None if no indexed
+                                        network contains the address
+        """
+        addr = ipaddress.ip_address(u'{0}'.format(ip))
+        tables, lengths = self._index
+        value = int(addr)
+        for length, shift in lengths.get(addr.version, []):
+            record = tables[(addr.version, length)].get(
+                         value >> shift << shift)
+            if record is not None:
+                return record
+        return None
+
+    def lookup_many(self, ips):
+        """
+        lookup_many - Find the most specific network for every address of
+                      a large list. Addresses are resolved one prefix
+                      length at a time, longest first, and dropped from
+                      the working set as soon as they are resolved
+
+        input   ips (list)              IP addresses
+        output  records (list)          Network object (or None) for each
+                                        address, in input order
+        """
+        tables, lengths = self._index
+        ret = [None] * len(ips)
+        pending = {}
+        for i, ip in enumerate(ips):
+            addr = ipaddress.ip_address(u'{0}'.format(ip))
+            pending.setdefault(addr.version, []).append((i, int(addr)))
+        for version, todo in pending.items():
+            for length, shift in lengths.get(version, []):
+                if not todo:
+                    break
+                table = tables[(version, length)]
+                left = []
+                for i, value in todo:
+                    record = table.get(value >> shift << shift)
+                    if record is None:
+                        left.append((i, value))
+                    else:
+                        ret[i] = record
+                todo = left
+        return ret
+
+
+def _insert(tables, record):
+    net = ipaddress.ip_network(u'{0}'.format(record['network']))
+    tables.setdefault((net.version, net.prefixlen), {})[
+        int(net.network_address)] = record
+
+
+def _lengths(tables):
+    """
+    _lengths - Prefix lengths present in the index, longest first, with
+               the shift that masks an address down to that length
+
+    input   tables (dict)           (version, prefix length) -> networks
+    output  lengths (dict)          version -> [(length, shift), ...]
+    """
+    ret = {}
+    for version, length in sorted(tables, reverse=True):
+        if tables[(version, length)]:
+            bits = 32 if version == 4 else 128
+            ret.setdefault(version, []).append((length, bits - length))
+    return ret
@@ -0,0 +1,128 @@
+"""
+Payloads of the record updates, built the same way for the blocking and the
+awaitable handles. Every change an update asks for is merged into a single
+PUT; list and dict fields are changed with the WAPI +/- modifiers so the
+record does not have to be read first to carry the rest over.
+"""
+
+
+def _changes(extattrs=None, **fields):
+    """
+    _changes - Merge every field an update sets into one PUT payload.
+               Fields left at None are not sent, so nothing has to be read
+               first to carry them over; extattrs are merged into the
+               object's own with the extattrs+ modifier instead of
+               replacing them
+
+    input   extattrs (dict)         Optional: Extensible attribute values
+                                    by name
+            fields (dict)           Field values, None for unchanged
+    output  data (dict)             PUT payload
+    """
+    data = dict((k, v) for k, v in fields.items() if v is not None)
+    if extattrs:
+        data['extattrs+'] = dict(
+            (k, v if isinstance(v, dict) else {'value': v})
+            for k, v in extattrs.items())
+    return data
+
+
+def _host_addresses(ip=None, mac=None, old_ip=None):
+    """
+    _host_addresses - Address changes of a host record update: old_ip is
+                      swapped for ip, or re-added with the new mac, using
+                      the ipv4addrs-/ipv4addrs+ modifiers so the host's
+                      other addresses are left alone
+
+    input   ip (string)             Optional: New address
+            mac (string)            Optional: MAC address of the new address
+            old_ip (string)         Optional: Address replaced
+    output  data (dict)             ipv4addrs fields of the PUT payload,
+                                    empty when no address changes
+    """
+    if old_ip is None or (ip is None and mac is None):
+        return {}
+    addr = {'ipv4addr': ip or old_ip}
+    if mac is not None:
+        addr['mac'] = mac
+    return {'ipv4addrs-': [{'ipv4addr': old_ip}], 'ipv4addrs+': [addr]}
+
+
+def _host_lookup(ip=None, mac=None, old_ip=None):
+    """
+    _host_lookup - Whether a host update needs the record's current
+                   addresses before it can be written: to find the address
+                   to change when old_ip is not given, and to carry the
+                   MAC of a moved address over when mac is not
+
+    input   ip (string)             Optional: New address
+            mac (string)            Optional: New MAC address
+            old_ip (string)         Optional: Address replaced
+    output  lookup (bool)           The current addresses must be read
+    """
+    if ip is not None and mac is None:
+        return True
+    return old_ip is None and mac is not None
+
+
+def _host_update(current=None, ip=None, mac=None, ttl=None, comment=None,
+                 extattrs=None, old_ip=None):
+    """
+    _host_update - PUT payload of a host record update. The address
+                   changed is old_ip, or the record's first one; it keeps
+                   its MAC and DHCP setting unless they are changed too
+
+    input   current (list)          Optional: Current addresses of the
+                                    record, when _host_lookup() asked for
+                                    them
+            ip, mac, ttl, comment, extattrs, old_ip
+                                    Arguments of the update
+    output  data (dict)             PUT payload
+    """
+    entry = {}
+    if current:
+        if old_ip is None:
+            old_ip = current[0]['ipv4addr']
+        entry = next((a for a in current if a.get('ipv4addr') == old_ip), {})
+        if mac is None:
+            mac = entry.get('mac')
+    data = _changes(extattrs, ttl=ttl, comment=comment)
+    data.update(_host_addresses(ip, mac, old_ip))
+    if entry.get('configure_for_dhcp') and 'ipv4addrs+' in data:
+        data['ipv4addrs+'][0]['configure_for_dhcp'] = True
+    return data
+
+
+def _a_update(ip=None, ttl=None, comment=None, extattrs=None):
+    return _changes(extattrs, ipv4addr=ip, ttl=ttl, comment=comment)
+
+
+def _cname_update(canonical=None, ttl=None, comment=None, extattrs=None):
+    return _changes(extattrs, canonical=canonical, ttl=ttl, comment=comment)
+
+
+def _srv_update(target=None, weight=None, priority=None, ttl=None,
+                comment=None, extattrs=None):
+    return _changes(extattrs, target=target, weight=weight,
+                    priority=priority, ttl=ttl, comment=comment)
+
+
+def _rpz_cname_update(zone, name=None, canonical=None, comment="", ttl=None,
+                      view=None):
+    """
+    _rpz_cname_update - PUT payload of an RPZ CNAME record update. A new
+                        name is qualified with the record's zone; empty
+                        values are not sent
+
+    input   zone (string)           Response policy zone of the record
+            name, canonical, comment, ttl, view
+                                    Arguments of the update
+    output  data (dict)             PUT payload
+    """
+    fields = {"name": (name + '.' + zone
+                       if name is not None and zone is not None else None),
+              "canonical": canonical,
+              "comment": comment,
+              "ttl": ttl,
+              "view": view}
+    return dict((key, value) for key, value in fields.items() if value)
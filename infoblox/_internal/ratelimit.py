@@ -0,0 +1,187 @@
+"""
+Client-side token buckets capping the rate of WAPI requests, with one bucket
+for reads (GET) and one for writes (everything else). Callers reserve a
+token and wait for as long as the bucket tells them, so concurrent callers
+are spaced out evenly instead of all retrying at once. A bucket can live in
+a file shared by every process on the host, locked with fcntl.
+"""
+import errno
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# tokens, time of the last refill
+_STATE = struct.Struct('<dd')
+
+
+class _bucket(object):
+
+    def __init__(self, rate, burst=None):
+        """
+        class constructor - Automatically called on class instantiation
+
+        input   rate (float)            Tokens added per second
+                burst (float)           Optional: Bucket size, defaults to
+                                        one second worth of tokens
+        output  void (void)
+        """
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, self.rate))
+        self.tokens = self.burst
+        self.stamp = time.time()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1, blocking=True):
+        """
+        reserve - Take tokens, going into debt when the bucket is empty
+
+        input   tokens (float)          Optional: Tokens to take
+                blocking (bool)         Optional: Unused, the bucket is
+                                        never held for long
+        output  wait (float)            Seconds to wait before sending
+        """
+        with self._lock:
+            self.tokens, self.stamp, wait = _take(
+                self.tokens, self.stamp, self.rate, self.burst, tokens)
+        return wait
+
+
+class _file_bucket(object):
+
+    def __init__(self, path, rate, burst=None):
+        """
+        class constructor - Automatically called on class instantiation
+
+        input   path (string)           File holding the bucket state. Every
+                                        process using the same file shares
+                                        the bucket
+                rate (float)            Tokens added per second
+                burst (float)           Optional: Bucket size
+        output  void (void)
+        """
+        if fcntl is None:
+            raise ImportError('A shared rate limit file requires fcntl')
+        self.path = path
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, self.rate))
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1, blocking=True):
+        """
+        reserve - Take tokens from the shared bucket, holding an exclusive
+                  lock on the file while its state is updated
+
+        input   tokens (float)          Optional: Tokens to take
+                blocking (bool)         Optional: Wait for another process
+                                        holding the file lock. Otherwise
+                                        None is returned at once, so event
+                                        loops can yield and try again
+        output  wait (float)            Seconds to wait before sending
+        """
+        if not self._lock.acquire(blocking):
+            return None
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX if blocking
+                                else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except (IOError, OSError) as e:
+                    if blocking or e.errno not in (errno.EAGAIN,
+                                                   errno.EACCES):
+                        raise
+                    return None
+                data = os.read(fd, _STATE.size)
+                if len(data) == _STATE.size:
+                    level, stamp = _STATE.unpack(data)
+                else:
+                    level, stamp = self.burst, time.time()
+                level, stamp, wait = _take(level, stamp, self.rate,
+                                           self.burst, tokens)
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.write(fd, _STATE.pack(level, stamp))
+            finally:
+                os.close(fd)
+        finally:
+            self._lock.release()
+        return wait
+
+
+class _rate_limiter(object):
+
+    def __init__(self, reads=None, writes=None, burst=None, path=None):
+        """
+        class constructor - Automatically called on class instantiation
+
+        input   reads (float)           Optional: GET requests per second
+                writes (float)          Optional: Other requests per second
+                burst (float)           Optional: Requests allowed at once
+                                        after an idle period
+                path (string)           Optional: Share the buckets with
+                                        other processes through
+                                        <path>.read and <path>.write
+        output  void (void)
+        """
+        self.buckets = {}
+        for kind, rate in (('read', reads), ('write', writes)):
+            if not rate:
+                continue
+            if path is None:
+                self.buckets[kind] = _bucket(rate, burst)
+            else:
+                self.buckets[kind] = _file_bucket(
+                    '{0}.{1}'.format(path, kind), rate, burst)
+
+    def reserve(self, method, blocking=True):
+        """
+        reserve - Reserve a request of a method
+
+        input   method (string)         HTTP method
+                blocking (bool)         Optional: Wait for a shared bucket
+                                        locked by another process
+        output  wait (float)            Seconds to wait before sending, or
+                                        None when not blocking and the
+                                        bucket is busy
+        """
+        bucket = self.buckets.get('read' if method == 'GET' else 'write')
+        if bucket is None:
+            return 0.0
+        return bucket.reserve(blocking=blocking)
+
+    def acquire(self, method):
+        """
+        acquire - Block until a request of a method may be sent
+
+        input   method (string)         HTTP method
+        output  wait (float)            Seconds waited
+        """
+        wait = self.reserve(method)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+def _take(level, stamp, rate, burst, tokens):
+    """
+    _take - Refill a bucket for the time elapsed and take tokens from it
+
+    input   level (float)           Tokens in the bucket, negative when
+                                    reservations are queued
+            stamp (float)           Time of the last refill
+            rate (float)            Tokens added per second
+            burst (float)           Bucket size
+            tokens (float)          Tokens to take
+    output  level (float)           New token level
+            stamp (float)           New refill time
+            wait (float)            Seconds until the tokens are available
+    """
+    now = time.time()
+    level = min(burst, level + (now - stamp) * rate) - tokens
+    wait = -level / rate if level < 0 else 0.0
+    return level, now, wait
@@ -0,0 +1,228 @@
+"""
+Desired-state reconciliation. The records wanted in a zone or view are
+compared with what the grid holds, read with one paged listing per record
+type, and only the records that must be added, changed or removed are
+written, optionally in multi-object requests.
+"""
+import json
+
+# Fields identifying a record: records agreeing on them are the same record,
+# and any other difference is applied as an update
+KEYS = {
+    'record:host': ('name',),
+    'record:a': ('name', 'ipv4addr'),
+    'record:cname': ('name',),
+    'record:srv': ('name', 'port', 'target'),
+    'record:mx': ('name', 'mail_exchanger'),
+}
+
+# Read-only fields never sent back to the WAPI
+_READONLY = frozenset(['_ref', 'zone', 'host'])
+
+
+class _reconcile(object):
+
+    def __init__(self, infoblox_, desired, zone=None, view=None, delete=True,
+                 page_size=None):
+        """
+        class constructor - Automatically called on class instantiation
+
+        input   infoblox_ (object)      Parent class object
+                desired (dict)          Records wanted per object type, e.g.
+                                        {'record:a': [{'name': ...,
+                                        'ipv4addr': ...}, ...]}. Dicts or
+                                        compact records
+                zone (string)           Optional: Zone to reconcile
+                view (string)           Optional: DNS view to reconcile
+                delete (bool)           Optional: Delete records of the
+                                        given types that are not desired.
+                                        Needs a zone or a view
+                page_size (int)         Optional: Objects per page read
+        output  void (void)
+        """
+        for objtype in desired:
+            if objtype not in KEYS:
+                raise ValueError('Cannot reconcile {0}'.format(objtype))
+        if delete and zone is None and view is None:
+            # Without a scope every record of the types in the grid would be
+            # compared, and all those not desired deleted
+            raise ValueError('Reconciling with delete=True needs a zone or '
+                             'a view')
+        self.infoblox_ = infoblox_
+        self.desired = desired
+        self.zone = zone
+        self.view = view
+        self.delete = delete
+        self.page_size = page_size or infoblox_.page_size
+        self.adds = []
+        self.updates = []
+        self.deletes = []
+        self.unchanged = 0
+        self.reads = 0
+        self.errors = []
+
+    def plan(self):
+        """
+        plan - Read the current records and work out the changes needed
+
+        input   void (void)
+        output  self (object)           The reconciliation, with adds,
+                                        updates and deletes filled in
+        """
+        for objtype in sorted(self.desired):
+            self._diff(objtype, self.desired[objtype])
+        return self
+
+    def _diff(self, objtype, records):
+        """
+        _diff - Compare the desired records of a type with the current ones,
+                both indexed by their identifying fields
+
+        input   objtype (string)        WAPI object type
+                records (iterator)      Desired records
+        output  void (void)
+        """
+        wanted = {}
+        fields = set(KEYS[objtype]) | set(['view'])
+        for record in records:
+            if hasattr(record, 'to_dict'):
+                record = record.to_dict()
+            record = _clean(record)
+            if self.view is not None:
+                record.setdefault('view', self.view)
+            wanted[_key(objtype, record)] = record
+            fields.update(record)
+        current = {}
+        count = 0
+        for obj in self.infoblox_.iter_objects(
+                objtype, self.page_size, compact=False, zone=self.zone,
+                view=self.view, _return_fields=','.join(sorted(fields))):
+            count += 1
+            current[_key(objtype, obj)] = obj
+        self.reads += max(1, -(-count // self.page_size))
+        fixed = set(KEYS[objtype]) | set(['view'])
+        for key, record in sorted(wanted.items()):
+            obj = current.pop(key, None)
+            if obj is None:
+                self.adds.append((objtype, record))
+                continue
+            changed = dict((k, v) for k, v in record.items()
+                           if k not in fixed and not _same(k, v, obj.get(k)))
+            if changed:
+                self.updates.append((objtype, obj['_ref'], changed))
+            else:
+                self.unchanged += 1
+        if self.delete:
+            for key, obj in sorted(current.items()):
+                self.deletes.append((objtype, obj['_ref']))
+
+    @property
+    def changes(self):
+        return len(self.adds) + len(self.updates) + len(self.deletes)
+
+    def report(self, chunk_size=500):
+        """
+        report - Dry-run summary of the reconciliation
+
+        input   chunk_size (int)        Optional: Operations per
+                                        multi-object request when applied
+                                        in a batch
+        output  report (dict)           Counts of adds, updates, deletes and
+                                        unchanged records, the paged reads
+                                        made, and the WAPI calls applying
+                                        the changes will take batched and
+                                        one by one
+        """
+        return {'add': len(self.adds), 'update': len(self.updates),
+                'delete': len(self.deletes), 'unchanged': self.unchanged,
+                'reads': self.reads,
+                'calls': {'batched': -(-self.changes // chunk_size),
+                          'unbatched': self.changes}}
+
+    def __str__(self):
+        report = self.report()
+        return ('{add} to add, {update} to update, {delete} to delete, '
+                '{unchanged} unchanged - {reads} reads, {0} write calls '
+                'batched ({1} unbatched)'.format(
+                    report['calls']['batched'], report['calls']['unbatched'],
+                    **report))
+
+    def apply(self, batch=True, chunk_size=500):
+        """
+        apply - Write the changes: deletes first, so names and addresses
+                they free can be reused, then updates, then adds
+
+        input   batch (bool)            Optional: Send the changes in
+                                        multi-object requests
+                chunk_size (int)        Optional: Operations per request
+        output  0 (int)                 Every change applied, otherwise the
+                                        status of the last failure. The
+                                        failures are kept in errors
+        """
+        target = self.infoblox_
+        if batch:
+            target = self.infoblox_.batch(chunk_size, abort_on_error=False)
+        sent = []
+        for objtype, ref in self.deletes:
+            sent.append((('delete', objtype, ref), target.delete(ref)))
+        for objtype, ref, data in self.updates:
+            sent.append((('update', objtype, ref),
+                         target.put(ref, json.dumps(data))))
+        for objtype, data in self.adds:
+            sent.append((('add', objtype, data),
+                         target.post(objtype, json.dumps(data))))
+        if batch:
+            target.flush()
+        if (self.deletes or self.updates) and \
+                self.infoblox_.ref_cache is not None:
+            self.infoblox_.ref_cache.clear()
+        ret = 0
+        self.errors = []
+        for change, resp in sent:
+            if resp.status_code in (200, 201):
+                continue
+            self.errors.append((change, resp.status_code, resp.text))
+            ret = resp.status_code
+            if not batch:
+                try:
+                    self.infoblox_.__caller__(
+                        'Could not {0} {1} {2} - Status {3}'
+                        .format(change[0], change[1], change[2],
+                                resp.status_code), resp.status_code)
+                except Exception:
+                    pass
+        return ret
+
+
+def _key(objtype, record):
+    return (record.get('view') or 'default',) + tuple(
+        '{0}'.format(record.get(field)).lower() for field in KEYS[objtype])
+
+
+def _clean(record):
+    record = dict((k, v) for k, v in record.items() if k not in _READONLY)
+    if 'ipv4addrs' in record:
+        record['ipv4addrs'] = [
+            dict((k, v) for k, v in addr.items() if k not in _READONLY)
+            for addr in record['ipv4addrs']]
+    return record
+
+
+def _same(field, want, have):
+    """
+    _same - Whether a current value already matches the desired one. Host
+            addresses match when the same addresses are held and every
+            field given for them agrees
+
+    input   field (string)          Field name
+            want (object)           Desired value
+            have (object)           Current value
+    output  same (bool)             No update is needed
+    """
+    if field != 'ipv4addrs':
+        return want == have
+    held = dict((addr.get('ipv4addr'), addr) for addr in have or [])
+    if set(addr.get('ipv4addr') for addr in want) != set(held):
+        return False
+    return all(held[addr['ipv4addr']].get(k) == v
+               for addr in want for k, v in addr.items())
@@ -0,0 +1,297 @@
+"""
+Compact, typed representations of the WAPI objects this package handles,
+for holding large inventories in memory. Each type declares its fields as
+__slots__, so instances carry no per-object dict or key strings, IPv4
+addresses are stored as packed integers, and values repeated across many
+objects (views, zones) are interned.
+
+The objects read like the dicts the WAPI returns: record['name'],
+record.get('ttl') and to_dict() give the WAPI representation back, while
+attributes (record.name, record.ipv4addr) give direct access. Fields not
+declared by a type are kept in its extra dict.
+"""
+import socket
+import struct
+
+try:
+    from sys import intern
+except ImportError:
+    pass
+
+# Fields whose values repeat across many objects
+_INTERNED = frozenset(['view', 'zone', 'network_view', 'rp_zone'])
+
+
+def _pack(ip):
+    """
+    _pack - Store an IPv4 address as an integer. Anything else (IPv6,
+            function calls such as func:nextavailableip) is kept as is
+
+    input   ip (string)             Address
+    output  ip (int)                Packed address, or the original value
+    """
+    try:
+        return struct.unpack('!I', socket.inet_aton(ip))[0]
+    except (socket.error, TypeError, OSError):
+        return ip
+
+
+def _unpack(ip):
+    if isinstance(ip, int):
+        return socket.inet_ntoa(struct.pack('!I', ip))
+    return ip
+
+
+class _ip_field(object):
+    """
+    Descriptor exposing a packed IPv4 address slot as a dotted quad
+    """
+
+    def __init__(self, slot):
+        self.slot = slot
+
+    def __get__(self, record, owner):
+        if record is None:
+            return self
+        return _unpack(getattr(record, self.slot))
+
+    def __set__(self, record, ip):
+        setattr(record, self.slot, _pack(ip))
+
+
+class _network_field(object):
+    """
+    Descriptor exposing a packed (address, prefix length) slot as CIDR
+    """
+
+    def __init__(self, slot):
+        self.slot = slot
+
+    def __get__(self, record, owner):
+        if record is None:
+            return self
+        value = getattr(record, self.slot)
+        if isinstance(value, tuple):
+            return '{0}/{1}'.format(_unpack(value[0]), value[1])
+        return value
+
+    def __set__(self, record, network):
+        if network is not None and '/' in network and ':' not in network:
+            addr, _, length = network.partition('/')
+            packed = _pack(addr)
+            if isinstance(packed, int):
+                network = (packed, int(length))
+        setattr(record, self.slot, network)
+
+
+class _compact(object):
+    """
+    Base of the compact record types. Subclasses list their plain fields in
+    _fields, their IPv4 address fields in _ips and their CIDR fields in
+    _networks, and declare the matching __slots__
+    """
+    __slots__ = ('_ref', 'extra')
+    objtype = None
+    _fields = ()
+    _ips = ()
+    _networks = ()
+
+    def __init__(self, obj):
+        """
+        class constructor - Automatically called on class instantiation
+
+        input   obj (dict)              Object as returned by the WAPI
+        output  void (void)
+        """
+        known = self._known()
+        self._ref = obj.get('_ref')
+        for field in self._fields + self._ips + self._networks:
+            value = obj.get(field)
+            if field in _INTERNED and isinstance(value, str):
+                value = intern(value)
+            setattr(self, field, value)
+        extra = dict((k, v) for k, v in obj.items() if k not in known)
+        self.extra = extra or None
+
+    @classmethod
+    def _known(cls):
+        return frozenset(('_ref',) + cls._fields + cls._ips + cls._networks)
+
+    def to_dict(self):
+        """
+        to_dict - WAPI representation of the object
+
+        input   void (void)
+        output  obj (dict)              Object as returned by the WAPI
+        """
+        ret = {}
+        if self._ref is not None:
+            ret['_ref'] = self._ref
+        for field in self._fields + self._ips + self._networks:
+            value = self._export(field)
+            if value is not None:
+                ret[field] = value
+        if self.extra:
+            ret.update(self.extra)
+        return ret
+
+    def _export(self, field):
+        return getattr(self, field)
+
+    def __getitem__(self, key):
+        if key == '_ref' or key in self._fields or key in self._ips or \
+                key in self._networks:
+            value = self._export(key) if key != '_ref' else self._ref
+            if value is None:
+                raise KeyError(key)
+            return value
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __eq__(self, other):
+        if isinstance(other, _compact):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(type(self).__name__, self.to_dict())
+
+
+def _slots(fields=(), ips=(), networks=()):
+    return (tuple(fields) + tuple('_' + f for f in ips) +
+            tuple('_' + f for f in networks))
+
+
+class _host_ipv4addr(_compact):
+    objtype = 'record:host_ipv4addr'
+    _fields = ('host', 'mac', 'configure_for_dhcp')
+    _ips = ('ipv4addr',)
+    __slots__ = _slots(_fields, _ips)
+    ipv4addr = _ip_field('_ipv4addr')
+
+
+class _host_record(_compact):
+    objtype = 'record:host'
+    _fields = ('name', 'view', 'zone', 'ttl', 'comment', 'aliases',
+               'extattrs', 'ipv4addrs')
+    __slots__ = _slots(_fields)
+
+    def __init__(self, obj):
+        _compact.__init__(self, obj)
+        if self.ipv4addrs is not None:
+            addrs = []
+            for addr in self.ipv4addrs:
+                addr = _host_ipv4addr(addr)
+                if addr.host == self.name:
+                    # Share the name string with the parent record
+                    addr.host = self.name
+                addrs.append(addr)
+            self.ipv4addrs = tuple(addrs)
+
+    def _export(self, field):
+        if field == 'ipv4addrs' and self.ipv4addrs is not None:
+            return [addr.to_dict() for addr in self.ipv4addrs]
+        return getattr(self, field)
+
+
+class _a_record(_compact):
+    objtype = 'record:a'
+    _fields = ('name', 'view', 'zone', 'ttl', 'comment', 'extattrs')
+    _ips = ('ipv4addr',)
+    __slots__ = _slots(_fields, _ips)
+    ipv4addr = _ip_field('_ipv4addr')
+
+
+class _cname_record(_compact):
+    objtype = 'record:cname'
+    _fields = ('name', 'canonical', 'view', 'zone', 'ttl', 'comment',
+               'extattrs')
+    __slots__ = _slots(_fields)
+
+
+class _srv_record(_compact):
+    objtype = 'record:srv'
+    _fields = ('name', 'port', 'priority', 'target', 'weight', 'view',
+               'zone', 'ttl', 'comment', 'extattrs')
+    __slots__ = _slots(_fields)
+
+
+class _mx_record(_compact):
+    objtype = 'record:mx'
+    _fields = ('name', 'mail_exchanger', 'preference', 'view', 'zone', 'ttl',
+               'comment', 'extattrs')
+    __slots__ = _slots(_fields)
+
+
+class _rpz_cname_record(_compact):
+    objtype = 'record:rpz:cname'
+    _fields = ('name', 'canonical', 'rp_zone', 'view', 'zone', 'ttl',
+               'comment', 'extattrs')
+    __slots__ = _slots(_fields)
+
+
+class _network_record(_compact):
+    objtype = 'network'
+    _fields = ('network_view', 'comment', 'extattrs')
+    _networks = ('network',)
+    __slots__ = _slots(_fields, (), _networks)
+    network = _network_field('_network')
+
+
+class _lease_record(_compact):
+    objtype = 'lease'
+    _fields = ('network_view', 'hardware', 'client_hostname', 'binding_state',
+               'starts', 'ends')
+    _ips = ('address',)
+    __slots__ = _slots(_fields, _ips)
+    address = _ip_field('_address')
+
+
+RECORDS = dict((cls.objtype, cls) for cls in (
+    _host_record, _a_record, _cname_record, _srv_record, _mx_record,
+    _rpz_cname_record, _network_record, _lease_record))
+
+
+def _to_record(objtype, obj):
+    """
+    _to_record - Compact representation of a WAPI object
+
+    input   objtype (string)        WAPI object type
+            obj (dict)              Object as returned by the WAPI
+    output  record (object)         Compact record, or obj unchanged when
+                                    the type has no compact form
+    """
+    cls = RECORDS.get(objtype)
+    if cls is None or not isinstance(obj, dict):
+        return obj
+    return cls(obj)
+
+
+def _fetched(infoblox_, objtype, obj):
+    """
+    _fetched - Object returned by a handle's fetch(): compact when the
+               client was created with compact=True, the dict otherwise
+
+    input   infoblox_ (object)      Parent class object
+            objtype (string)        WAPI object type
+            obj (dict)              Object as returned by the WAPI
+    output  record (object)         Compact record or dict
+    """
+    if getattr(infoblox_, 'compact', False):
+        return _to_record(objtype, obj)
+    return obj
@@ -0,0 +1,134 @@
+"""
+Lookup helpers shared by the record handles. Looking up a _ref costs a
+search request, so handles only do it the first time _ref_ is used, and
+they search for exact names unless asked for a regular expression.
+"""
+import json
+
+from past.builtins import basestring
+
+
+class _lazy_ref(object):
+    """
+    Descriptor for the _ref_ attribute of a handle. Reading _ref_ calls the
+    handle's _ref() method the first time and caches the result when an
+    object was found. Assigning a _ref (e.g. the one returned when add()
+    creates the object) caches it directly, and assigning None or deleting
+    _ref_ forgets it so the next read looks it up again.
+
+    When the parent client has a ref_cache, it is consulted before _ref()
+    and kept in step with the handle, under the key returned by the
+    handle's _key() method. Handles without a stable key (regex lookups)
+    return None from _key() and bypass the shared cache.
+    """
+
+    def __get__(self, handle, owner):
+        if handle is None:
+            return self
+        try:
+            return handle.__dict__['_ref_']
+        except KeyError:
+            pass
+        cache, key = _shared(handle)
+        ref = cache.get(key) if key is not None else None
+        if ref is None:
+            ref = handle._ref()
+            if isinstance(ref, basestring) and key is not None:
+                cache.set(key, ref)
+        if isinstance(ref, basestring):
+            handle.__dict__['_ref_'] = ref
+        return ref
+
+    def __set__(self, handle, ref):
+        cache, key = _shared(handle)
+        if ref is None:
+            handle.__dict__.pop('_ref_', None)
+            if key is not None:
+                cache.invalidate(key)
+        else:
+            handle.__dict__['_ref_'] = ref
+            if key is not None:
+                cache.set(key, ref)
+
+    def __delete__(self, handle):
+        self.__set__(handle, None)
+
+
+def _shared(handle):
+    """
+    _shared - Find the client-wide _ref cache and the key of a handle
+
+    input   handle (object)         Record handle
+    output  cache (object)          _ref_cache of the client or None
+            key (tuple)             Cache key of the handle or None
+    """
+    cache = getattr(handle.infoblox_, 'ref_cache', None)
+    if cache is None:
+        return None, None
+    return cache, handle._key()
+
+
+def _returned_ref(resp):
+    """
+    _returned_ref - Read the _ref the WAPI returns in response to the POST
+                    that created an object or the PUT that updated it
+
+    input   resp (struct)           WAPI HTTP response
+    output  _ref (string)           _ref of the new object or None
+    """
+    try:
+        ref = json.loads(resp.text)
+    except (ValueError, TypeError):
+        return None
+    return ref if isinstance(ref, basestring) else None
+
+
+def _search(objtype, field, value, regex=False, view=None, zone=None):
+    """
+    _search - Build the query used to look up a single object. An exact
+              match (field=value) lets the grid use its index and cannot
+              return a different object whose name merely contains value;
+              field~=value searches with a regular expression instead
+
+    input   objtype (string)        WAPI object type
+            field (string)          Field to search on
+            value (string)          Value to search for
+            regex (bool)            Optional: Treat value as a regular
+                                    expression
+            view (string)           Optional: DNS view to search in
+            zone (string)           Optional: Zone to search in
+    output  query (string)          Search query
+    """
+    query = '{0}?{1}{2}={3}'.format(objtype, field, '~' if regex else '',
+                                    value)
+    if view is not None:
+        query += '&view={0}'.format(view)
+    if zone is not None:
+        query += '&zone={0}'.format(zone)
+    return query
+
+
+def _return_fields(infoblox_, objtype, return_fields):
+    """
+    _return_fields - Build the _return_fields part of a fetch query. Fields
+                     set in return_fields are asked for; _ref=True alone
+                     asks for nothing but the _ref, which is all a _ref
+                     lookup needs. Otherwise the client's default
+                     projection for the object type applies, if any, and
+                     the WAPI default fields if not
+
+    input   infoblox_ (object)      Parent class object
+            objtype (string)        WAPI object type
+            return_fields (dict)    Key value pairs of fields to return
+    output  query (string)          Query string suffix, may be empty
+    """
+    fields = [k for k in return_fields if return_fields[k] and k != '_ref']
+    if not fields:
+        if return_fields.get('_ref'):
+            return '&_return_fields='
+        fields = (getattr(infoblox_, 'return_fields', None) or {}).get(
+                     objtype)
+        if not fields:
+            return ''
+    return '&_return_fields=' + ','.join(fields)
+
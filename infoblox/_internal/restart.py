@@ -0,0 +1,191 @@
+"""
+Coalesces the service restarts requested by many threads or jobs into one.
+A request opens a debounce window that every further request extends, up to
+a maximum delay after the first one; when the window closes a single
+restart is sent and its progress is polled in the background. Callers get a
+ticket they can wait on for the outcome.
+"""
+import threading
+import time
+
+from .grid import _grid, _restarting
+
+
+class _restart_ticket(object):
+    """
+    Outcome of a coalesced restart, shared by every request it covers
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.first = None
+        self.sent = None
+        self.finished = None
+        self.status_code = None
+        self.status = None
+        self._event = threading.Event()
+
+    @property
+    def done(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """
+        wait - Block until the restart has been sent and has finished
+
+        input   timeout (float)         Optional: Seconds to wait
+        output  status_code (int)       0 when the restart succeeded, the
+                                        error status otherwise, or None if
+                                        the timeout expired first
+        """
+        self._event.wait(timeout)
+        return self.status_code
+
+    def _finish(self, status_code, status=None):
+        self.status_code = status_code
+        self.status = status
+        self.finished = time.time()
+        self._event.set()
+
+
+class _restart_scheduler(object):
+
+    def __init__(self, infoblox_, debounce=5, max_delay=60,
+                 member_order='SEQUENTIALLY', sequential_delay=10,
+                 service_option='ALL', restart_option='RESTART_IF_NEEDED',
+                 poll_interval=5, timeout=600):
+        """
+        class constructor - Automatically called on class instantiation
+
+        input   infoblox_ (object)      Parent class object
+                debounce (float)        Optional: Seconds without a new
+                                        request before the restart is sent
+                max_delay (float)       Optional: Seconds after the first
+                                        request by which the restart is
+                                        sent, however many follow
+                member_order (string)   Optional: SEQUENTIALLY or
+                                        SIMULTANEOUSLY
+                sequential_delay (int)  Optional: Seconds between members
+                                        restarted sequentially
+                service_option (string) Optional: ALL, DNS, DHCP, DHCPV4 or
+                                        DHCPV6
+                restart_option (string) Optional: RESTART_IF_NEEDED or
+                                        FORCE_RESTART
+                poll_interval (float)   Optional: Seconds between restart
+                                        status polls
+                timeout (float)         Optional: Seconds to poll before
+                                        giving up on the restart
+        output  void (void)
+        """
+        self.infoblox_ = infoblox_
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.options = {'member_order': member_order,
+                        'sequential_delay': sequential_delay,
+                        'service_option': service_option,
+                        'restart_option': restart_option}
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.requests = 0
+        self.restarts = 0
+        self._cond = threading.Condition()
+        self._pending = None
+        self._due = None
+        self._thread = None
+
+    def request(self):
+        """
+        request - Ask for a restart. Requests made before the restart is
+                  sent share it
+
+        input   void (void)
+        output  ticket (handle)         Reference to the coalesced restart
+        """
+        with self._cond:
+            now = time.time()
+            self.requests += 1
+            if self._pending is None:
+                self._pending = _restart_ticket()
+                self._pending.first = now
+            ticket = self._pending
+            ticket.requests += 1
+            self._due = min(now + self.debounce, ticket.first + self.max_delay)
+            self._cond.notify()
+            self._start()
+        return ticket
+
+    def flush(self):
+        """
+        flush - Send the pending restart now instead of at the end of the
+                debounce window
+
+        input   void (void)
+        output  ticket (handle)         Reference to the pending restart, or
+                                        None when none is pending
+        """
+        with self._cond:
+            if self._pending is not None:
+                self._due = time.time()
+                self._cond.notify()
+            return self._pending
+
+    def _start(self):
+        # The worker only runs while restarts are pending, so it never keeps
+        # an idle client alive
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._pending is None:
+                    self._thread = None
+                    return
+                while time.time() < self._due:
+                    self._cond.wait(self._due - time.time())
+                ticket, self._pending = self._pending, None
+            try:
+                self._restart(ticket)
+            except Exception as e:
+                ticket._finish(-1)
+                try:
+                    self.infoblox_.__caller__(
+                        'Restart failed - {0}'.format(e), -1)
+                except Exception:
+                    pass
+
+    def _restart(self, ticket):
+        """
+        _restart - Send a coalesced restart and poll it until it finishes
+
+        input   ticket (handle)         Restart to send
+        output  void (void)
+        """
+        grid = _grid(self.infoblox_)
+        ticket.sent = time.time()
+        self.restarts += 1
+        ret = grid.restart(**self.options)
+        if ret != 0:
+            # The error callback may have replaced the status code
+            return ticket._finish(ret if isinstance(ret, int) else 1)
+        deadline = ticket.sent + self.timeout
+        while True:
+            status = grid.restart_status()
+            if not isinstance(status, dict):
+                return ticket._finish(status if isinstance(status, int)
+                                      else 1)
+            if not _restarting(status):
+                break
+            if time.time() >= deadline:
+                try:
+                    self.infoblox_.__caller__(
+                        'Timed out waiting for the restart to finish - '
+                        'Status 408', 408)
+                except Exception:
+                    pass
+                return ticket._finish(408, status)
+            time.sleep(self.poll_interval)
+        failed = status.get('failures', 0) + status.get('timeouts', 0)
+        ticket._finish(1 if failed else 0, status)
@@ -0,0 +1,219 @@
+"""
+Retry policy and circuit breaker for the WAPI transport. Requests that fail
+with a busy or unavailable status, or with a connection error, are retried
+with exponential backoff and full jitter, honoring Retry-After. Only
+idempotent methods are retried unless a POST is marked safe; a PUT adding
+to or removing from a field with the +/- modifiers is not. The breaker
+opens after consecutive failures and fails requests fast until the grid
+has had time to recover.
+"""
+import json
+import random
+import threading
+import time
+from email.utils import mktime_tz, parsedate_tz
+
+import requests
+from past.builtins import basestring
+
+
+class _retry(object):
+
+    def __init__(self, attempts=3, backoff=0.5, max_backoff=30,
+                 statuses=(429, 502, 503, 504),
+                 methods=('GET', 'PUT', 'DELETE')):
+        """
+        class constructor - Automatically called on class instantiation
+
+        input   attempts (int)          Retries made after the first try
+                backoff (float)         Base delay in seconds, doubled on
+                                        every retry
+                max_backoff (float)     Longest delay, Retry-After included
+                statuses (tuple)        Status codes worth retrying
+                methods (tuple)         Methods that are always safe to
+                                        repeat
+        output  void (void)
+        """
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(methods)
+        self.random = random.Random()
+
+    def retryable(self, method, attempt, safe=False, resp=None,
+                  payload=None):
+        """
+        retryable - Whether a failed try should be repeated
+
+        input   method (string)         HTTP method
+                attempt (int)           Retries made so far
+                safe (bool)             Optional: A POST may be repeated
+                resp (struct)           Optional: Response received, None
+                                        after a connection error
+                payload (string)        Optional: JSON body sent
+        output  retry (bool)            The request should be sent again
+        """
+        if attempt >= self.attempts:
+            return False
+        if method not in self.methods and not safe:
+            return False
+        if method == 'PUT' and _modifies(payload):
+            return False
+        return resp is None or resp.status_code in self.statuses
+
+    def delay(self, attempt, resp=None):
+        """
+        delay - Seconds to wait before the next try: the Retry-After the
+                WAPI asked for, or a random delay up to backoff * 2^attempt
+
+        input   attempt (int)           Retries made so far
+                resp (struct)           Optional: Response received
+        output  delay (float)           Seconds to wait
+        """
+        after = _retry_after(resp)
+        if after is not None:
+            return min(after, self.max_backoff)
+        return self.random.uniform(
+                   0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+class _breaker(object):
+
+    def __init__(self, threshold=5, reset=30, statuses=(429, 502, 503, 504)):
+        """
+        class constructor - Automatically called on class instantiation
+
+        input   threshold (int)         Consecutive failures opening the
+                                        circuit
+                reset (float)           Seconds the circuit stays open
+                                        before a single trial request is
+                                        let through
+                statuses (tuple)        Status codes counted as failures,
+                                        along with connection errors
+        output  void (void)
+        """
+        self.threshold = threshold
+        self.reset = reset
+        self.statuses = frozenset(statuses)
+        self.failures = 0
+        self.opened = None
+        self.trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """
+        state - closed, open or half-open
+        """
+        if self.opened is None:
+            return 'closed'
+        if self.trial or time.time() - self.opened >= self.reset:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """
+        allow - Whether a request may be sent. Once the reset delay has
+                passed, one trial request is allowed at a time
+
+        input   void (void)
+        output  allow (bool)            The request may be sent
+        """
+        with self._lock:
+            if self.opened is None:
+                return True
+            if self.trial or time.time() - self.opened < self.reset:
+                return False
+            self.trial = True
+            return True
+
+    def success(self):
+        """
+        success - Record a request the grid answered, closing the circuit
+
+        input   void (void)
+        output  void (void)
+        """
+        with self._lock:
+            self.failures = 0
+            self.opened = None
+            self.trial = False
+
+    def failure(self):
+        """
+        failure - Record a failed request, opening the circuit once the
+                  threshold is reached or when a trial request fails
+
+        input   void (void)
+        output  void (void)
+        """
+        with self._lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                self.opened = time.time()
+            self.trial = False
+
+    def response(self, url):
+        """
+        response - Response returned instead of sending a request while
+                   the circuit is open
+
+        input   url (string)            URL the request was for
+        output  resp (struct)           503 response with Retry-After set
+                                        to the time left open
+        """
+        resp = requests.models.Response()
+        resp.status_code = 503
+        resp.url = url
+        resp.reason = 'Service Unavailable'
+        opened = self.opened or time.time()
+        resp.headers['Retry-After'] = str(
+            max(0, int(round(opened + self.reset - time.time()))))
+        resp.headers['Content-Type'] = 'application/json'
+        resp._content = json.dumps({
+            'Error': 'CircuitOpen: Too many failed requests, not sending',
+            'code': 'CircuitOpen',
+            'text': 'Too many failed requests, not sending'}).encode('utf-8')
+        resp._content_consumed = True
+        return resp
+
+
+def _modifies(payload):
+    """
+    _modifies - Whether a PUT body uses the +/- modifiers (ipv4addrs+,
+                extattrs-, ...). Sent twice, it would add or remove twice
+
+    input   payload (string)        JSON body, if any
+    output  modifies (bool)         A modifier key is present
+    """
+    if not isinstance(payload, basestring):
+        return False
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        return False
+    return isinstance(data, dict) and any(
+        key.endswith(('+', '-')) for key in data)
+
+
+def _retry_after(resp):
+    """
+    _retry_after - Seconds asked for by a Retry-After header, given either
+                   as a number of seconds or as an HTTP date
+
+    input   resp (struct)           Response or None
+    output  seconds (float)         Delay, None if absent or unparsable
+    """
+    if resp is None:
+        return None
+    value = resp.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        date = parsedate_tz(value)
+        if date is None:
+            return None
+        return max(0.0, mktime_tz(date) - time.time())
@@ -4,23 +4,36 @@ RPZ CNAME entries
 WAPI documentation can be found here:
 https://ipam.illinois.edu/wapidoc/objects/record.rpz.cname.html
 """
+import re
 import json
 
+from .payloads import _rpz_cname_update
+from .ref import _lazy_ref, _return_fields, _returned_ref, _search
+from .records import _fetched
+
 
 class _rpz_cname(object):
 
-    def __init__(self, infoblox_, name):
+    _ref_ = _lazy_ref()
+
+    def __init__(self, infoblox_, name, view=None, zone=None, regex=False):
         """
         class constructor - Automatically called on class instantiation
 
         input   infoblox_ (object)      Parent class object
                 name (string)           DNS name of CNAME
+                view (string)           Optional: DNS view of the record
+                zone (string)           Optional: Response policy zone of
+                                        the record
+                regex (bool)            Optional: Look the record up with
+                                        a regular expression search
         output  void (void)
         """
         self.infoblox_ = infoblox_
         self.name = name
-        self._ref_ = self._ref()
-        self.zone = None
+        self.view = view
+        self.zone = zone
+        self.regex = regex
 
     def _ref(self):
         """
@@ -30,10 +43,23 @@ class _rpz_cname(object):
         output  host _ref               _ref ID for CNAME record
         """
         try:
-            return self.fetch()['_ref']
+            return self.fetch(_ref=True)['_ref']
         except Exception:
             return None
 
+    def _key(self):
+        """
+        _key - Key of the record in the client-wide _ref cache
+
+        input   void (void)
+        output  key (tuple)             (object type, name, view), None for
+                                        regex lookups or an unknown zone
+        """
+        if self.regex or self.zone is None:
+            return None
+        return ('record:rpz:cname', self.name + '.' + self.zone,
+                self.view)
+
     def fetch(self, **return_fields):
         """
         fetch - Retrieve all information from a specified RPZ CNAME record
@@ -41,11 +67,21 @@ class _rpz_cname(object):
         input   return_fields (dict)    Key value pairs of data to be returned
         output  resp (parsed json)      Parsed JSON response
         """
-        return_query = ','.join([k for k in return_fields.keys()
-                                 if return_fields[k]])
-        query = "record:rpz:cname?name~={0}".format(self.name)
-        if return_query:
-            query += '&_return_fields=' + return_query
+        if self.regex:
+            query = _search('record:rpz:cname', 'name', self.name, True,
+                            self.view, self.zone)
+        elif self.zone is not None:
+            query = _search('record:rpz:cname', 'name',
+                            self.name + '.' + self.zone, False, self.view,
+                            self.zone)
+        else:
+            # The record is named <name>.<rp_zone>, so without the zone
+            # only an anchored prefix search can find it
+            query = _search('record:rpz:cname', 'name',
+                            '^{0}\\.'.format(re.escape(self.name)), True,
+                            self.view)
+        query += _return_fields(self.infoblox_, 'record:rpz:cname',
+                                return_fields)
         resp = self.infoblox_.get(query)
         if resp.status_code != 200:
             try:
@@ -55,7 +91,8 @@ class _rpz_cname(object):
             except Exception:
                 return resp.status_code
         try:
-            return json.loads(resp.text)[0]
+            return _fetched(self.infoblox_, 'record:rpz:cname',
+                            json.loads(resp.text)[0])
 
         except (ValueError, IndexError):
             return None
@@ -94,7 +131,7 @@ class _rpz_cname(object):
 
         # If we added successfully, set the zone
         self.zone = rp_zone
-        self._ref_ = self._ref()
+        self._ref_ = _returned_ref(resp)
 
         return 0
 
@@ -113,6 +150,7 @@ class _rpz_cname(object):
                     .format(self.name, resp.status_code), resp.status_code)
             except Exception:
                 return resp.status_code
+        del self._ref_
         return 0
 
     def update(self, name=None, canonical=None,
@@ -129,17 +167,8 @@ class _rpz_cname(object):
         output  0 (int)                 Success
         """
 
-        kwargs = {
-                  "name": (name + '.' + self.zone
-                           if name is not None and self.zone is not None
-                           else None),
-                  "canonical": canonical,
-                  "comment": comment,
-                  "ttl": ttl,
-                  "view": view
-                 }
-        d = {key: kwargs[key] for key in kwargs if kwargs[key]}
-        payload = json.dumps(d)
+        payload = json.dumps(_rpz_cname_update(self.zone, name, canonical,
+                                               comment, ttl, view))
 
         resp = self.infoblox_.put(self._ref_, payload)
 
@@ -150,4 +179,9 @@ class _rpz_cname(object):
                     .format(self.name, resp.status_code), resp.status_code)
             except Exception:
                 return resp.status_code
+        # Renaming the record changes its _ref and cache key
+        if name is not None:
+            del self._ref_
+        else:
+            self._ref_ = _returned_ref(resp)
         return 0
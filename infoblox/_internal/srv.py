@@ -6,21 +6,34 @@ https://ipam.illinois.edu/wapidoc/objects/record.srv.html
 """
 import json
 
+from .payloads import _srv_update
+from .ref import _lazy_ref, _return_fields, _returned_ref, _search
+from .records import _fetched
+
 
 class _srv(object):
 
-    def __init__(self, infoblox_, name, port):
+    _ref_ = _lazy_ref()
+
+    def __init__(self, infoblox_, name, port, view=None, zone=None,
+                 regex=False):
         """
         class constructor - Automatically called on class instantiation
 
         input   infoblox_ (object)      Parent class object
                 name (string)           DNS name of CNAME
+                view (string)           Optional: DNS view of the record
+                zone (string)           Optional: Zone of the record
+                regex (bool)            Optional: Look the record up with
+                                        a regular expression search
         output  void (void)
         """
         self.infoblox_ = infoblox_
         self.name = name
         self.port = port
-        self._ref_ = self._ref()
+        self.view = view
+        self.zone = zone
+        self.regex = regex
 
     def _ref(self):
         """
@@ -30,10 +43,22 @@ class _srv(object):
         output  host _ref               _ref ID for CNAME record
         """
         try:
-            return self.fetch()['_ref']
+            return self.fetch(_ref=True)['_ref']
         except Exception:
             return None
 
+    def _key(self):
+        """
+        _key - Key of the record in the client-wide _ref cache
+
+        input   void (void)
+        output  key (tuple)             (object type, name, view, port),
+                                        None for regex lookups
+        """
+        if self.regex:
+            return None
+        return ('record:srv', self.name, self.view, self.port)
+
     def fetch(self, **return_fields):
         """
         fetch - Retrieve all information from a specified SRV record
@@ -41,11 +66,10 @@ class _srv(object):
         input   return_fields (dict)    Key value pairs of data to be returned
         output  resp (parsed json)      Parsed JSON response
         """
-        return_query = ','.join([k for k in return_fields.keys()
-                                 if return_fields[k]])
-        query = "record:srv?name~={0}".format(self.name)
-        if return_query:
-            query += '&_return_fields=' + return_query
+        query = _search('record:srv', 'name', self.name, self.regex,
+                        self.view, self.zone)
+        query += '&port={0}'.format(self.port)
+        query += _return_fields(self.infoblox_, 'record:srv', return_fields)
         resp = self.infoblox_.get(query)
         if resp.status_code != 200:
             try:
@@ -55,7 +79,8 @@ class _srv(object):
             except Exception:
                 return resp.status_code
         try:
-            return json.loads(resp.text)[0]
+            return _fetched(self.infoblox_, 'record:srv',
+                            json.loads(resp.text)[0])
 
         except (ValueError, IndexError):
             return None
@@ -80,6 +105,7 @@ class _srv(object):
                                                  resp.status_code)
             except Exception:
                 return resp.status_code
+        self._ref_ = _returned_ref(resp)
         return 0
 
     def delete(self):
@@ -100,26 +126,29 @@ class _srv(object):
                                                  resp.status_code)
             except Exception:
                 return resp.status_code
+        del self._ref_
         return 0
 
-    def update(self, target=None, weight=None, priority=None):
+    def update(self, target=None, weight=None, priority=None, ttl=None,
+               comment=None, extattrs=None):
         """
-        add - add target to srv record
+        update - Update a SRV record with new attributes. Every change is
+                 sent in a single PUT, without reading the record first
 
-        input   target (string)     DNS target for srv record
-        output  0 (int)             Target successfully added
+        input   target (string)     Optional: DNS target for srv record
+                weight (int)        Optional: Weight of the record
+                priority (int)      Optional: Priority of the record
+                ttl (int)           Optional: Time to live
+                comment (string)    Optional: Comment
+                extattrs (dict)     Optional: Extensible attributes, merged
+                                    into the current ones
+        output  0 (int)             Success
         """
-        rec = self.fetch()
-        if target is None:
-            target = rec['target']
-        if weight is None:
-            weight = rec['weight']
-        if priority is None:
-            priority = rec['priority']
-        payload = '{{"target": "{0}", "weight": {1}, "name": "{2}", "priority": {3}'\
-                  ',"port": {4}}}'\
-                  .format(target, weight, self.name, priority, self.port)
-        resp = self.infoblox_.put(self._ref_, payload)
+        data = _srv_update(target, weight, priority, ttl, comment,
+                           extattrs)
+        if not data:
+            return 0
+        resp = self.infoblox_.put(self._ref_, json.dumps(data))
         if resp.status_code != 200:
             try:
                 return self.infoblox_.__caller__('Error updating srv record '
@@ -129,4 +158,5 @@ class _srv(object):
                                                  resp.status_code)
             except Exception:
                 return resp.status_code
+        self._ref_ = _returned_ref(resp)
         return 0
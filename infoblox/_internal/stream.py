@@ -0,0 +1,167 @@
+"""
+Incremental decoding of WAPI JSON responses. The body is fed to the parser
+chunk by chunk as it arrives from the socket, and every object of the
+result array is handed out as soon as it is complete, so only one object
+and the unparsed tail of the last chunk are held in memory at a time.
+
+Both a plain array ([{...}, ...]) and the paged form
+({"result": [{...}, ...], "next_page_id": "..."}) are understood; the
+members other than result are collected in the parser's fields.
+"""
+import codecs
+import json
+import re
+
+_WS = re.compile(r'[ \t\n\r]*')
+_decode = json.JSONDecoder().raw_decode
+
+
+class _json_stream(object):
+
+    def __init__(self):
+        """
+        class constructor - Automatically called on class instantiation
+
+        input   void (void)
+        output  void (void)
+        """
+        self.fields = {}
+        self._buf = ''
+        self._state = 'start'
+        self._key = None
+        self._in_object = False
+
+    def feed(self, text):
+        """
+        feed - Parse the next chunk of the body
+
+        input   text (string)           Decoded chunk
+        output  objects (list)          Objects of the result array
+                                        completed by this chunk
+        """
+        self._buf += text
+        return self._parse(False)
+
+    def close(self):
+        """
+        close - Parse what is left once the body has been read
+
+        input   void (void)
+        output  objects (list)          Remaining objects
+        """
+        ret = self._parse(True)
+        if self._state != 'done':
+            raise ValueError('Truncated JSON response')
+        return ret
+
+    def _parse(self, final):
+        """
+        _parse - Advance through the buffer as far as complete values allow
+
+        input   final (bool)            No more data will be fed
+        output  objects (list)          Objects of the result array parsed
+        """
+        buf, pos, ret = self._buf, 0, []
+        while True:
+            pos = _WS.match(buf, pos).end()
+            if pos >= len(buf):
+                break
+            state, ch = self._state, buf[pos]
+            if state == 'start':
+                if ch == '[':
+                    self._state = 'first'
+                elif ch == '{':
+                    self._state = 'first_key'
+                else:
+                    raise ValueError('Expected a JSON array or object')
+                pos += 1
+            elif state in ('first', 'next'):
+                if ch == ']':
+                    self._state = 'after' if self._in_object else 'done'
+                    pos += 1
+                elif state == 'next':
+                    if ch != ',':
+                        raise ValueError('Expected , or ] in JSON array')
+                    self._state = 'item'
+                    pos += 1
+                else:
+                    self._state = 'item'
+            elif state in ('item', 'key', 'value'):
+                try:
+                    value, end = _decode(buf, pos)
+                except ValueError:
+                    if final:
+                        raise
+                    break
+                if not final and not isinstance(value, (dict, list, str)):
+                    # A number or literal is only complete once the
+                    # delimiter after it has arrived
+                    nxt = _WS.match(buf, end).end()
+                    if nxt >= len(buf) or buf[nxt] not in ',]}':
+                        break
+                pos = end
+                if state == 'item':
+                    ret.append(value)
+                    self._state = 'next'
+                    if buf.startswith(',', pos):
+                        # Straight on to the next item
+                        self._state = 'item'
+                        pos += 1
+                elif state == 'key':
+                    self._key = value
+                    self._state = 'colon'
+                else:
+                    self.fields[self._key] = value
+                    self._state = 'after'
+            elif state == 'first_key':
+                if ch == '}':
+                    self._state = 'done'
+                    pos += 1
+                else:
+                    self._state = 'key'
+            elif state == 'colon':
+                if ch != ':':
+                    raise ValueError('Expected : in JSON object')
+                pos += 1
+                self._state = 'value'
+                if self._key == 'result':
+                    self._state = 'result'
+            elif state == 'result':
+                if ch != '[':
+                    # Not an array, keep it as a plain field
+                    self._state = 'value'
+                    continue
+                self._in_object = True
+                self._state = 'first'
+                pos += 1
+            elif state == 'after':
+                if ch == ',':
+                    self._state = 'key'
+                elif ch == '}':
+                    self._state = 'done'
+                else:
+                    raise ValueError('Expected , or } in JSON object')
+                pos += 1
+            else:
+                raise ValueError('Extra data after JSON value')
+        self._buf = buf[pos:]
+        return ret
+
+
+def _iter_stream(chunks, parser):
+    """
+    _iter_stream - Decode UTF-8 chunks and yield every object of the result
+                   array as soon as it has been parsed
+
+    input   chunks (iterator)       Raw body chunks (bytes)
+            parser (object)         _json_stream to feed
+    output  objects (generator)     Parsed JSON objects
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in chunks:
+        for obj in parser.feed(decoder.decode(chunk)):
+            yield obj
+    for obj in parser.feed(decoder.decode(b'', True)):
+        yield obj
+    for obj in parser.close():
+        yield obj
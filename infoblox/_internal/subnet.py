@@ -10,12 +10,14 @@ import re
 
 class _subnet(object):
 
-    def __init__(self, infoblox_, subnet):
+    def __init__(self, infoblox_, subnet, data=None):
         """
         class constructor - Automatically called on class instantiation
 
         input   infoblox_ (object)      Parent class object
                 subnet (string)         Specified subnet
+                data (dict)             Optional: Network object already
+                                        retrieved, saves fetching it again
         output  void (void)
         """
         self.infoblox_ = infoblox_
@@ -24,13 +26,14 @@ class _subnet(object):
         else:
             self.subnet = subnet
 
-        data = self.get()
+        if data is None:
+            data = self.get()
         if type(data) is int:
             self.infoblox_.__caller__(
                 "Infoblox error code {0}".format(str(data)))
             raise Exception("Infoblox error code {0}".format(str(data)))
         self._ref_ = data['_ref']
-        self.comment = data['comment']
+        self.comment = data.get('comment')
 
     def __str__(self):
         return "{0} - {1}".format(self.subnet, self.comment)
@@ -70,10 +73,42 @@ class _subnet(object):
         output  ip_addr (string)        IP address
                 None (null)             No free IP addresses
         """
-        payload = '{{"num":{0}}}'.format(offset)
+        ips = self.next_available_ips(1, offset=offset)
+        if not isinstance(ips, list):
+            return ips
+        return ips[0] if ips else None
+
+    def next_available_ips(self, count, exclude=None, offset=2,
+                           hostnames=None):
+        """
+        next_available_ips - Get several distinct available IP addresses
+                             in a subnet with a single call. The first
+                             offset - 1 free addresses (the gateway, by
+                             default) are skipped
+
+        input   count (int)             Number of addresses to return
+                exclude (list)          Optional: Addresses not to return
+                offset (int)            Optional arg to provide address
+                                        offset for networking gear/etc not
+                                        accounted in IPAM, at least 1
+                hostnames (list)        Optional: Create a host record for
+                                        each name with the returned
+                                        addresses, in one multi-object
+                                        request. One name per address
+        output  ip_addrs (list)         IP addresses, fewer than count when
+                                        the subnet is running out
+        """
+        if offset < 1:
+            raise ValueError('offset must be at least 1')
+        if hostnames is not None and len(hostnames) != count:
+            raise ValueError('Expected {0} hostnames, got {1}'
+                             .format(count, len(hostnames)))
+        payload = {'num': count + offset - 1}
+        if exclude:
+            payload['exclude'] = list(exclude)
         resp = self.infoblox_.post(
                     '{0}?_function=next_available_ip'
-                    .format(self._ref_), payload)
+                    .format(self._ref_), json.dumps(payload), safe=True)
         if resp.status_code != 200:
             try:
                 return self.infoblox_.__caller__(
@@ -82,9 +117,16 @@ class _subnet(object):
             except Exception:
                 return resp.status_code
         try:
-            return json.loads(resp.text)['ips'][offset-1]
+            ips = json.loads(resp.text)['ips'][offset-1:]
         except Exception:
-            return None
+            return []
+        if hostnames is not None:
+            with self.infoblox_.batch(chunk_size=len(ips) or 1) as b:
+                for hostname, ip in zip(hostnames, ips):
+                    b.host(hostname).add(ip)
+            if b.errors:
+                return b.status_code
+        return ips
 
     def prompt(self):
         """
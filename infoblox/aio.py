@@ -0,0 +1,553 @@
+"""
+python-infoblox - asyncio client for the Infoblox WAPI
+
+AsyncInfoblox mirrors the infoblox class with awaitable transport methods
+and handles. It requires aiohttp (pip install aiohttp).
+
+    async with AsyncInfoblox(auth={...}, limit=200) as iblox:
+        await asyncio.gather(*[iblox.host(name).add(ip)
+                               for name, ip in records])
+"""
+
+import base64
+import asyncio
+import getpass
+import json
+import ssl
+import time
+from builtins import input, bytes
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    from infoblox import _internal
+    from infoblox._internal import aio as _handles
+except ImportError:
+    import _internal
+    from _internal import aio as _handles
+
+
+class AsyncInfoblox(object):
+
+    def __caller__(self, error, errno):
+        """
+        __caller__ - Wrapper for error callback function
+
+        input   error (string)      Error description to provide to callback
+                errno (int)         Status code of API call
+        output  callback (funct)    Calls callback function and passes
+                                    error string
+                errno (int)         Status code of API call (if no callback
+                                    is specified)
+        """
+        if self.callback is not None:
+            return self.callback(error)
+        return int(errno)
+
+    def __init__(self, callback=None, auth={}, vers='v2.6.1', limit=100,
+                 pool_maxsize=100, page_size=1000, retries=3, backoff=0.5,
+                 breaker_threshold=0, breaker_reset=30, read_rate=None,
+                 write_rate=None, rate_burst=None, rate_file=None,
+                 return_fields=None, compact=False, verify=False):
+        """
+        class constructor - Automatically called on class instantiation.
+                            No request is made until the first call or
+                            login()
+
+        input   callback (funct)    An optional callback can be passed at
+                                    instantiation for error and logging
+                                    purposes
+                limit (int)         Optional: Maximum number of requests
+                                    in flight at once
+                pool_maxsize (int)  Optional: Maximum number of pooled
+                                    keep-alive connections
+                page_size (int)     Optional: Default number of objects
+                                    fetched per page by iter_objects
+                retries (int)       Optional: Retries of busy/unavailable
+                                    responses and connection errors, as
+                                    with the infoblox class
+                backoff (float)     Optional: Base retry delay in seconds
+                breaker_threshold (int) Optional: Consecutive failures after
+                                    which requests fail fast. 0 disables
+                                    the circuit breaker
+                breaker_reset (float) Optional: Seconds before a trial
+                                    request once the breaker opened
+                read_rate (float)   Optional: Maximum GET requests per
+                                    second
+                write_rate (float)  Optional: Maximum other requests per
+                                    second
+                rate_burst (float)  Optional: Requests allowed at once
+                rate_file (string)  Optional: Share the rate limits with
+                                    other processes through this path
+                return_fields (dict) Optional: Default fields returned per
+                                    object type by fetch() and iter_objects
+                compact (bool)      Optional: Return compact slotted
+                                    records instead of dicts, as with the
+                                    infoblox class
+                verify (bool/str)   Optional: Verify the appliance TLS
+                                    certificate, or path to a CA bundle
+                                    to verify it with
+        output  void (void)
+        """
+        if aiohttp is None:
+            raise ImportError('AsyncInfoblox requires aiohttp')
+        self.callback = callback
+        self.vers = vers
+        self.page_size = page_size
+        self.limit = limit
+        self.pool_maxsize = pool_maxsize
+        self._auth = auth
+        self.url = None
+        self.creds = None
+        self.session = None
+        self._semaphore = None
+        self._login_lock = None
+        self.hooks = []
+        self.return_fields = dict(return_fields or {})
+        self.compact = compact
+        self.verify = verify
+        self.retry = None
+        if retries:
+            self.retry = _internal._retry(retries, backoff)
+        self.breaker = None
+        if breaker_threshold:
+            self.breaker = _internal._breaker(breaker_threshold,
+                                              breaker_reset)
+        self.limiter = None
+        if read_rate or write_rate:
+            self.limiter = _internal._rate_limiter(read_rate, write_rate,
+                                                   rate_burst, rate_file)
+
+    async def __aenter__(self):
+        await self.login()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def login(self):
+        """
+        login - Open the pooled session and authenticate to the Infoblox
+                WAPI. The ibapauth session cookie returned is used for
+                every later request
+
+        input   void (void)
+        output  void (void)
+        """
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_maxsize,
+                                               ssl=_ssl(self.verify)),
+                cookie_jar=aiohttp.CookieJar(unsafe=True))
+            self._semaphore = asyncio.Semaphore(self.limit)
+            self._login_lock = asyncio.Lock()
+        while self.creds is None:
+            auth = self._auth
+            url = auth.get('url') or input('Infoblox URL: ')
+            user = auth.get('user') or input('Infoblox Username: ')
+            passwd = auth.get('passwd') or getpass.getpass()
+            creds = (base64.b64encode(
+                        bytes('{0}:{1}'.format(user, passwd), "utf-8"))
+                     .decode("utf-8"))
+            self.url = url
+            resp = await self._send('GET', 'grid?_return_fields=', creds)
+            if resp.status_code == 200:
+                self.creds = creds
+            else:
+                print('\nInvalid credentials\n')
+
+    async def close(self):
+        """
+        close - Invalidate the session cookie on the Infoblox side and
+                close the pooled connections
+
+        input   void (void)
+        output  void (void)
+        """
+        if self.session is None:
+            return
+        try:
+            if self._cookie() is not None:
+                await self.post('logout', '')
+        finally:
+            await self.session.close()
+            self.session = None
+
+    def _url(self, api_function):
+        url = self.url
+        if '://' not in url:
+            url = 'https://{0}'.format(url)
+        return '{0}/wapi/{1}/{2}'.format(url, self.vers, api_function)
+
+    def _cookie(self):
+        for cookie in self.session.cookie_jar:
+            if cookie.key == 'ibapauth':
+                return cookie.value
+        return None
+
+    async def _send(self, method, api_function, creds=None, **kwargs):
+        """
+        _send - Send a single request, bounded by the concurrency limit
+
+        input   method (string)         HTTP method
+                api_function (string)   Function to call in WAPI
+                creds (string)          Optional: Basic credentials to send
+                kwargs (dict)           Extra arguments for aiohttp
+        output  resp (object)           WAPI HTTP response
+        """
+        headers = dict(kwargs.pop('headers', {}))
+        if creds is not None:
+            headers['Authorization'] = 'Basic {0}'.format(creds)
+        hooks = self.hooks
+        async with self._semaphore:
+            start = time.time()
+            async with self.session.request(method, self._url(api_function),
+                                            headers=headers,
+                                            **kwargs) as resp:
+                ret = _response(resp.status, await resp.text(),
+                                 resp.headers)
+        if hooks:
+            _internal._emit(hooks, method, api_function, ret.status_code,
+                            len(kwargs.get('data') or ''),
+                            len(ret.text.encode('utf-8')), start)
+        return ret
+
+    async def _request(self, method, api_function, safe=False, **kwargs):
+        """
+        _request - Send a request to the Infoblox WAPI, retrying busy or
+                   unavailable responses and connection errors, and failing
+                   fast with a 503 while the circuit breaker is open
+
+        input   method (string)         HTTP method
+                api_function (string)   Function to call in WAPI
+                safe (bool)             Optional: A POST may be repeated
+                kwargs (dict)           Extra arguments for aiohttp
+        output  resp (object)           WAPI HTTP response
+        """
+        if self.creds is None:
+            await self.login()
+        retry, breaker, limiter = self.retry, self.breaker, self.limiter
+        attempt = 0
+        while True:
+            if breaker is not None and not breaker.allow():
+                return breaker.response(self._url(api_function))
+            if limiter is not None:
+                # A shared bucket file locked by another process is polled
+                # rather than waited on, which would stall the event loop
+                wait = limiter.reserve(method, blocking=False)
+                while wait is None:
+                    await asyncio.sleep(0.001)
+                    wait = limiter.reserve(method, blocking=False)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            try:
+                resp = await self._login_send(method, api_function, kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if breaker is not None:
+                    breaker.failure()
+                if retry is None or not retry.retryable(
+                        method, attempt, safe, None, kwargs.get('data')):
+                    raise
+                await asyncio.sleep(retry.delay(attempt))
+                attempt += 1
+                continue
+            except Exception:
+                if breaker is not None:
+                    breaker.failure()
+                raise
+            if breaker is not None:
+                if resp.status_code in breaker.statuses:
+                    breaker.failure()
+                else:
+                    breaker.success()
+            if retry is None or not retry.retryable(
+                    method, attempt, safe, resp, kwargs.get('data')):
+                return resp
+            await asyncio.sleep(retry.delay(attempt, resp))
+            attempt += 1
+
+    async def _login_send(self, method, api_function, kwargs):
+        """
+        _login_send - Send a request, logging back in once if the session
+                      cookie has expired
+
+        input   method (string)         HTTP method
+                api_function (string)   Function to call in WAPI
+                kwargs (dict)           Extra arguments for aiohttp
+        output  resp (object)           WAPI HTTP response
+        """
+        cookie = self._cookie()
+        resp = await self._send(method, api_function,
+                                None if cookie else self.creds,
+                                **dict(kwargs))
+        if resp.status_code == 401 and cookie is not None:
+            async with self._login_lock:
+                if self._cookie() == cookie:
+                    self.session.cookie_jar.clear()
+            cookie = self._cookie()
+            resp = await self._send(method, api_function,
+                                    None if cookie else self.creds,
+                                    **dict(kwargs))
+        return resp
+
+    async def get(self, query):
+        """
+        get - Send GET request to Infoblox WAPI
+
+        input   query (string)  Directory location of API call - path after
+                                /api/ in URL
+        output  resp (struct)   API HTTP response, including status code
+        """
+        return await self._request('GET', query,
+                                   headers={'Accept': 'application/json'})
+
+    async def post(self, api_function, payload, safe=False):
+        """
+        post - Send POST request to Infoblox WAPI
+
+        input   api_function (string)   Function to call in WAPI
+                payload (string)        Payload for the POST request
+                safe (bool)             Optional: The call may be retried
+        output  resp (struct)           WAPI HTTP response, including
+                                        status code
+        """
+        return await self._request('POST', api_function, safe,
+                                   data=payload)
+
+    async def put(self, api_function, payload):
+        """
+        put - Send PUT request to Infoblox WAPI
+
+        input   api_function (string)   Function to call in WAPI
+                payload (string)        Payload for the PUT request
+        output  resp (struct)           WAPI HTTP response, including
+                                        status code
+        """
+        return await self._request('PUT', api_function, data=payload)
+
+    async def delete(self, api_function):
+        """
+        delete - Send DELETE request to Infoblox WAPI
+
+        input   api_function (string)   Function to call in WAPI
+        output  resp (struct)           WAPI HTTP response, including
+                                        status code
+        """
+        return await self._request('DELETE', api_function)
+
+    def add_hook(self, hook):
+        """
+        add_hook - Register a function called after every WAPI request, as
+                   with the infoblox class
+
+        input   hook (funct)            Function taking the request dict
+        output  hook (funct)            The hook, for remove_hook
+        """
+        self.hooks = self.hooks + [hook]
+        return hook
+
+    def remove_hook(self, hook):
+        """
+        remove_hook - Unregister a hook
+
+        input   hook (funct)            Hook passed to add_hook
+        output  void (void)
+        """
+        self.hooks = [h for h in self.hooks if h is not hook]
+
+    def metrics(self, buckets=_internal.metrics.BUCKETS):
+        """
+        metrics - Aggregate every request into counters and latency
+                  histograms per method and object type
+
+        input   buckets (tuple)         Optional: Histogram bucket bounds
+        output  metrics (object)        Registered aggregator
+        """
+        return self.add_hook(_internal._metrics(buckets))
+
+    async def iter_objects(self, objtype, page_size=None, compact=None,
+                           **filters):
+        """
+        iter_objects - Asynchronously iterate over every object of a type
+                       matching the given filters, one page at a time
+
+        input   objtype (string)        WAPI object type, e.g. record:host
+                page_size (int)         Optional: Objects per page
+                compact (bool)          Optional: Yield compact records
+                                        instead of dicts
+                filters (dict)          Optional: Search arguments
+        output  objects (async gen)     Parsed JSON objects
+        """
+        if page_size is None:
+            page_size = self.page_size
+        if compact is None:
+            compact = self.compact
+        fields = self.return_fields.get(objtype)
+        if fields and not any(k.startswith('_return_fields') for k in filters):
+            filters['_return_fields'] = ','.join(fields)
+        args = ['{0}={1}'.format(k, v) for k, v in sorted(filters.items())
+                if v is not None]
+        args += ['_paging=1', '_return_as_object=1',
+                 '_max_results={0}'.format(page_size)]
+        query = '{0}?{1}'.format(objtype, '&'.join(args))
+        while query is not None:
+            resp = await self.get(query)
+            if resp.status_code != 200:
+                try:
+                    self.__caller__('Could not page through {0} - Status {1}'
+                                    .format(objtype, resp.status_code),
+                                    resp.status_code)
+                except Exception:
+                    pass
+                return
+            page = resp.json()
+            query = None
+            if page.get('next_page_id'):
+                query = '{0}?_page_id={1}'.format(objtype,
+                                                  page['next_page_id'])
+            for obj in page.get('result', []):
+                if compact:
+                    obj = _internal._to_record(objtype, obj)
+                yield obj
+
+    def host(self, hostname=None, view=None, zone=None, regex=False):
+        """
+        host - host object
+
+        input   hostname (string)   DNS name for host record
+        output  handle (handle)     Reference to host object
+        """
+        return _handles._host(self, hostname, view, zone, regex)
+
+    def grid(self):
+        """
+        grid - grid object
+
+        input   void (void)
+        output  handle (handle)     Reference to grid object
+        """
+        return _handles._grid(self)
+
+    def subnet(self, subnet):
+        """
+        subnet - subnet object
+
+        input   subnet (string)     Specified subnet
+        output  handle (handle)     Reference to subnet object
+        """
+        return _handles._subnet(self, subnet)
+
+    def lease(self, address, regex=False):
+        """
+        lease - lease object
+
+        input   address (string)    IP address of lease
+        output  handle (handle)     Reference to lease object
+        """
+        return _handles._lease(self, address, regex=regex)
+
+    def a(self, name, view=None, zone=None, regex=False):
+        """
+        a - A record object
+
+        input   name (string)       DNS name of an A record
+        output  handle (handle)     Reference to A record object
+        """
+        return _handles._a(self, name, view, zone, regex)
+
+    def cname(self, name, view=None, zone=None, regex=False):
+        """
+        cname - CNAME record object
+
+        input   name (string)       Domain name of CNAME
+        output  handle (handle)     Reference to CNAME object
+        """
+        return _handles._cname(self, name, view, zone, regex)
+
+    def mx(self, name, view=None, zone=None, regex=False):
+        """
+        mx - MX record (Mail Exchanger) object
+
+        input   name (string)       Domain name of MX record
+        output  handle (handle)     Reference to record:mx object
+        """
+        return _handles._mx(self, name, view, zone, regex)
+
+    def srv(self, name, port, view=None, zone=None, regex=False):
+        """
+        srv - SRV record object
+
+        input   name (string)       Domain name of SRV
+                port (int)          Port number of service
+        output  handle (handle)     Reference to SRV record object
+        """
+        return _handles._srv(self, name, port, view, zone, regex)
+
+    def rpz_cname(self, name, view=None, zone=None, regex=False):
+        """
+        rpz_cname - A record:rpz:cname object
+
+        input   name (string)       Domain name of the record
+        output  handle (handle)     Reference to record:rpz:cname object
+        """
+        return _handles._rpz_cname(self, name, view, zone, regex)
+
+    async def subnet_from_ip(self, ip):
+        """
+        Takes an IP address as a string and returns the subnet the IP belongs
+        to
+
+        input   ip (string)         IP address to get the subnet of
+        output  subnet (Subnet)     Returns a subnet object
+        """
+        resp = await self.get("network?contains_address={0}".format(ip))
+        if resp.status_code != 200:
+            try:
+                return self.__caller__(
+                    'Could not retrieve subnet _ref for {0} - Status {1}'
+                    .format(ip, resp.status_code), resp.status_code)
+            except Exception:
+                return resp.status_code
+        try:
+            s = resp.json()[0]
+        except (ValueError, IndexError):
+            return None
+        subnet = self.subnet(s['network'])
+        subnet._ref_ = s['_ref']
+        subnet.comment = s.get('comment')
+        return subnet
+
+
+class _response(object):
+    """
+    Fully read WAPI response, shaped like the requests response the
+    handles expect
+    """
+
+    def __init__(self, status_code, text, headers):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def _ssl(verify):
+    """
+    _ssl - TLS setting of the connector, following the verify argument of
+           the infoblox class
+
+    input   verify (bool/str)       Verify the certificate, or CA bundle to
+                                    verify it with
+    output  ssl (bool/object)       False, or an SSLContext verifying the
+                                    certificate
+    """
+    if not verify:
+        return False
+    if verify is True:
+        return ssl.create_default_context()
+    return ssl.create_default_context(cafile=verify)
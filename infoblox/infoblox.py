@@ -20,9 +20,14 @@ SOFTWARE.
 """
 
 import requests
+import requests.adapters
+from requests.packages.urllib3.exceptions import InsecureRequestWarning
 import base64
 import getpass
+import threading
+import time
 import warnings
+import weakref
 # For input purposes
 from builtins import input, bytes
 
@@ -48,26 +53,135 @@ class infoblox(object):
         output  callback (funct)    Calls callback function and passes
                                     error string
                 errno (int)         Status code of API call (if no callback
-                                    is specified)
+                                    is specified, or while the calling
+                                    thread runs an item of map)
         """
+        errors = getattr(getattr(self, '_local', None), 'errors', None)
+        if errors is not None:
+            errors.append(error)
+            return int(errno)
         if self.callback is not None:
             return self.callback(error)
         return int(errno)
 
-    def __init__(self, callback=None, auth={}, vers='v2.6.1'):
+    def __init__(self, callback=None, auth={}, vers='v2.6.1',
+                 pool_connections=10, pool_maxsize=10, keepalive=240,
+                 page_size=1000, cache_size=4096, cache_ttl=300,
+                 verify=False, lazy_auth=False, retries=3, backoff=0.5,
+                 breaker_threshold=0, breaker_reset=30, read_rate=None,
+                 write_rate=None, rate_burst=None, rate_file=None,
+                 return_fields=None, chunk_size=65536, compact=False,
+                 track_changes=False):
         """
         class constructor - Automatically called on class instantiation
 
         input   callback (funct)    An optional callback can be passed at
                                     instantiation for error and logging
                                     purposes
+                pool_connections (int)  Optional: Number of per-host
+                                        connection pools to keep cached
+                pool_maxsize (int)  Optional: Maximum number of keep-alive
+                                    connections kept open per host
+                keepalive (int)     Optional: Seconds of inactivity after
+                                    which the ibapauth session cookie is
+                                    refreshed in the background. None
+                                    disables the refresh
+                page_size (int)     Optional: Default number of objects
+                                    fetched per page by the iter_* methods
+                cache_size (int)    Optional: Number of _refs kept in the
+                                    cache shared by all handles. 0
+                                    disables the cache
+                cache_ttl (int)     Optional: Seconds a cached _ref stays
+                                    valid
+                verify (bool/str)   Optional: Verify the appliance TLS
+                                    certificate, or path to a CA bundle
+                                    to verify it with
+                lazy_auth (bool)    Optional: Skip checking the credentials
+                                    at instantiation and log in with the
+                                    first request instead. Bad credentials
+                                    then surface as a 401 from that request
+                retries (int)       Optional: Times a request failing with
+                                    429/502/503/504 or a connection error
+                                    is retried. POSTs are only retried
+                                    when marked safe. 0 disables retries
+                backoff (float)     Optional: Base retry delay in seconds,
+                                    doubled on every retry and randomized.
+                                    A Retry-After header takes precedence
+                breaker_threshold (int) Optional: Consecutive failures after
+                                    which requests fail fast with a 503
+                                    instead of being sent. 0 disables the
+                                    circuit breaker
+                breaker_reset (float) Optional: Seconds before a trial
+                                    request is sent once the breaker opened
+                read_rate (float)   Optional: Maximum GET requests per
+                                    second. Callers over the rate wait
+                write_rate (float)  Optional: Maximum POST/PUT/DELETE
+                                    requests per second
+                rate_burst (float)  Optional: Requests allowed at once
+                                    after an idle period
+                rate_file (string)  Optional: Share the rate limits with
+                                    every process on the host using the
+                                    same path
+                return_fields (dict) Optional: Default fields returned per
+                                    object type by fetch() and iter_*, e.g.
+                                    {'record:host': ['name', 'ipv4addrs']}.
+                                    Fields asked for explicitly take
+                                    precedence
+                chunk_size (int)    Optional: Bytes read from the socket at
+                                    a time when a listing is decoded
+                                    incrementally
+                compact (bool)      Optional: Return host, A, CNAME, SRV,
+                                    MX, RPZ CNAME, network and lease
+                                    objects from fetch() and iter_* as
+                                    compact slotted records instead of
+                                    dicts
+                track_changes (bool) Optional: Record the zones and
+                                    networks successful writes touch, so
+                                    restart_affected() can restart only
+                                    the members serving them
         output  void (void)
         """
         self.callback = callback
         self.vers = vers
-        l_ret = self.auth(auth)
+        self.page_size = page_size
+        self.chunk_size = chunk_size
+        self.compact = compact
+        self.netindex = None
+        self.scheduler = None
+        self.tracker = None
+        if track_changes:
+            self.tracker = _internal._change_tracker()
+        self.ref_cache = None
+        if cache_size:
+            self.ref_cache = _internal._ref_cache(cache_size, cache_ttl)
+        self.session = self._session(pool_connections, pool_maxsize, verify)
+        self._auth_lock = threading.Lock()
+        self._scheduler_lock = threading.Lock()
+        self._local = threading.local()
+        self.hooks = []
+        self.return_fields = dict(return_fields or {})
+        self.retry = None
+        if retries:
+            self.retry = _internal._retry(retries, backoff)
+        self.breaker = None
+        if breaker_threshold:
+            self.breaker = _internal._breaker(breaker_threshold,
+                                              breaker_reset)
+        self.limiter = None
+        if read_rate or write_rate:
+            self.limiter = _internal._rate_limiter(read_rate, write_rate,
+                                                   rate_burst, rate_file)
+        self._last_used = time.time()
+        l_ret = self.auth(auth, not lazy_auth)
         self.url = l_ret[0]
         self.creds = l_ret[1]
+        self._stop = threading.Event()
+        if keepalive:
+            t = threading.Thread(target=_keepalive,
+                                 args=(weakref.ref(self), keepalive,
+                                       self._stop))
+            t.daemon = True
+            t.start()
 
     def __del__(self):
         """
@@ -76,13 +190,208 @@ class infoblox(object):
         input   void (void)
         output  void (void)
         """
-        self.post('logout', '')
+        if getattr(self, 'session', None) is None:
+            return
+        if getattr(self, '_stop', None) is not None:
+            self._stop.set()
+        try:
+            if 'ibapauth' in self.session.cookies:
+                self.post('logout', '')
+        except requests.exceptions.RequestException:
+            pass
+        finally:
+            self.session.cookies.clear()
+            self.session.close()
 
-    def auth(self, auth):
+    def _session(self, pool_connections, pool_maxsize, verify=False):
         """
-        auth - Authenticate to the Infoblox WAPI
+        _session - Build the keep-alive connection pool shared by every
+                   handle created from this client. The session is safe to
+                   share between threads; when certificate verification is
+                   off, the InsecureRequestWarning urllib3 raises on every
+                   request is silenced once per process, see
+                   _ignore_insecure()
 
-        input   void (void)
+        input   pool_connections (int)  Number of per-host pools to cache
+                pool_maxsize (int)      Connections kept open per host
+                verify (bool/str)       Verify the TLS certificate, or CA
+                                        bundle to verify it with
+        output  session (struct)        requests.Session object
+        """
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+                      pool_connections=pool_connections,
+                      pool_maxsize=pool_maxsize)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.verify = verify
+        if not verify:
+            _ignore_insecure()
+        return session
+
+    def _url(self, api_function, url=None):
+        """
+        _url - Build the full WAPI URL for an API call. A URL containing a
+               scheme (e.g. http://127.0.0.1:8080) is used as is, otherwise
+               https is assumed. Full http(s) URLs handed out by the
+               appliance, such as fileop transfer URLs, are returned
+               unchanged; queries merely containing a URL are not
+
+        input   api_function (string)   Function to call in WAPI
+                url (string)            Optional: Host to use instead of
+                                        the authenticated one
+        output  url (string)            Full WAPI URL
+        """
+        if '{0}'.format(api_function).startswith(('http://', 'https://')):
+            return api_function
+        if url is None:
+            url = self.url
+        if '://' not in url:
+            url = 'https://{0}'.format(url)
+        return '{0}/wapi/{1}/{2}'.format(url, self.vers, api_function)
+
+    def _request(self, method, api_function, safe=False, **kwargs):
+        """
+        _request - Send a request to the Infoblox WAPI over the pooled
+                   session. Busy or unavailable responses and connection
+                   errors are retried according to the retry policy, and
+                   while the circuit breaker is open the request is not
+                   sent at all and a 503 response is returned instead.
+                   Every try first waits for the rate limiter, if any.
+                   Successful writes are recorded by the change tracker
+
+        input   method (string)         HTTP method
+                api_function (string)   Function to call in WAPI
+                safe (bool)             Optional: A POST may be repeated
+                kwargs (dict)           Extra arguments for requests
+        output  resp (struct)           WAPI HTTP response, including
+                                        status code
+        """
+        headers = kwargs.pop('headers', {})
+        retry, breaker, limiter = self.retry, self.breaker, self.limiter
+        attempt = 0
+        while True:
+            if breaker is not None and not breaker.allow():
+                return breaker.response(self._url(api_function))
+            if limiter is not None:
+                limiter.acquire(method)
+            try:
+                resp = self._login_send(method, api_function, headers, kwargs)
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout):
+                if breaker is not None:
+                    breaker.failure()
+                if retry is None or not retry.retryable(
+                        method, attempt, safe, None, kwargs.get('data')):
+                    raise
+                time.sleep(retry.delay(attempt))
+                _rewind(kwargs)
+                attempt += 1
+                continue
+            except Exception:
+                if breaker is not None:
+                    breaker.failure()
+                raise
+            if breaker is not None:
+                if resp.status_code in breaker.statuses:
+                    breaker.failure()
+                else:
+                    breaker.success()
+            if retry is None or not retry.retryable(
+                    method, attempt, safe, resp, kwargs.get('data')):
+                if self.tracker is not None and method != 'GET' and \
+                        resp.status_code in (200, 201):
+                    self.tracker.record(method, api_function,
+                                        kwargs.get('data'))
+                return resp
+            resp.close()
+            time.sleep(retry.delay(attempt, resp))
+            _rewind(kwargs)
+            attempt += 1
+
+    def _login_send(self, method, api_function, headers, kwargs):
+        """
+        _login_send - Send a request, logging back in once if the session
+                      cookie has expired
+
+        input   method (string)         HTTP method
+                api_function (string)   Function to call in WAPI
+                headers (dict)          Extra request headers
+                kwargs (dict)           Extra arguments for requests
+        output  resp (struct)           WAPI HTTP response
+        """
+        cookie = self.session.cookies.get('ibapauth')
+        resp = self._send(method, api_function, headers, cookie, kwargs)
+        if resp.status_code == 401 and cookie is not None:
+            # The session cookie expired or was invalidated, log back in
+            with self._auth_lock:
+                if self.session.cookies.get('ibapauth') == cookie:
+                    self.session.cookies.clear()
+            _rewind(kwargs)
+            resp = self._send(method, api_function, headers,
+                              self.session.cookies.get('ibapauth'), kwargs)
+        return resp
+
+    def _send(self, method, api_function, headers, cookie, kwargs):
+        """
+        _send - Send a single request, authenticating with the ibapauth
+                session cookie when one is held and with Basic credentials
+                otherwise. A Basic authenticated request makes the WAPI
+                issue a new session cookie
+
+        input   method (string)         HTTP method
+                api_function (string)   Function to call in WAPI
+                headers (dict)          Extra request headers
+                cookie (string)         Current ibapauth cookie or None
+                kwargs (dict)           Extra arguments for requests
+        output  resp (struct)           WAPI HTTP response
+        """
+        if cookie is None:
+            headers = dict(headers)
+            headers['Authorization'] = 'Basic {0}'.format(self.creds)
+        self._last_used = start = time.time()
+        hooks = self.hooks
+        if not hooks:
+            return self.session.request(method, self._url(api_function),
+                                        headers=headers, **kwargs)
+        sent = len(kwargs.get('data') or '')
+        try:
+            resp = self.session.request(method, self._url(api_function),
+                                        headers=headers, **kwargs)
+        except requests.exceptions.RequestException:
+            _internal._emit(hooks, method, api_function, 0, sent, 0, start)
+            raise
+        _internal._emit(hooks, method, api_function, resp.status_code, sent,
+                        int(resp.headers.get('Content-Length') or 0), start)
+        return resp
+
+    def _refresh(self, interval):
+        """
+        _refresh - Keep the ibapauth session cookie from timing out by
+                   sending a cheap request when the client has been idle
+
+        input   interval (int)          Idle seconds before refreshing
+        output  void (void)
+        """
+        if time.time() - self._last_used < interval:
+            return
+        if 'ibapauth' not in self.session.cookies:
+            return
+        self.get('grid?_return_fields=')
+
+    def auth(self, auth, probe=True):
+        """
+        auth - Authenticate to the Infoblox WAPI. A successful login leaves
+               the ibapauth session cookie in the pooled session, and later
+               requests authenticate with it instead of the credentials.
+               The credentials are checked with a request for the grid
+               object that returns no fields, which costs the appliance
+               next to nothing
+
+        input   auth (dict)     url, user and passwd. Missing values are
+                                prompted for
+                probe (bool)    Optional: Check the credentials now. When
+                                False, the first request made logs in
         output  ret (list)  elements
                                 0 - Infoblox WAPI URL
                                 1 - Base64 encoded Infoblox username
@@ -104,58 +413,47 @@ class infoblox(object):
             creds = (base64.b64encode(
                         bytes('{0}:{1}'.format(user, passwd), "utf-8"))
                      .decode("utf-8"))
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                resp = requests.get('https://{0}/wapi/{1}/record:host?name~={0}'
-                                    .format(url, self.vers),
+            if not probe:
+                return [url, creds]
+            resp = self.session.get(self._url('grid?_return_fields=', url),
                                     headers={'Authorization': 'Basic {0}'
                                                               .format(creds),
-                                             'Accept': 'application/xml'},
-                                    verify=False)
-                if resp.status_code == 200:
-                    ret = []
-                    ret.append(url)
-                    ret.append(creds)
-                    return ret
-                else:
-                    print('\nInvalid credentials\n')
+                                             'Accept': 'application/json'})
+            if resp.status_code == 200:
+                ret = []
+                ret.append(url)
+                ret.append(creds)
+                return ret
+            else:
+                print('\nInvalid credentials\n')
 
-    def get(self, query):
+    def get(self, query, stream=False):
         """
         get - Send GET request to Infoblox WAPI
 
         input   query (string)  Directory location of API call - path after
                                 /api/ in URL
+                stream (bool)   Optional: Leave the body unread, to be
+                                consumed incrementally
         output  resp (struct)   API HTTP response, including status code
         """
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            return requests.get('https://{0}/wapi/{1}/{2}'
-                                .format(self.url, self.vers, query),
-                                headers={'Authorization': 'Basic {0}'
-                                                          .format(self.creds),
-                                         'Accept': 'application/json'},
-                                verify=False)
+        return self._request('GET', query,
+                             headers={'Accept': 'application/json'},
+                             stream=stream)
 
-    def post(self, api_function, payload):
+    def post(self, api_function, payload, safe=False):
         """
         post - Send POST request to Infoblox WAPI
 
         input   api_function (string)   Function to call in WAPI
                 payload (string)        Payload for the POST request
+                safe (bool)             Optional: The call has no side
+                                        effect if repeated, so it may be
+                                        retried like GET/PUT/DELETE
         output  resp (struct)           WAPI HTTP response, including
                                         status code
         """
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            return requests.post('https://{0}/wapi/{1}/{2}'
-                                 .format(self.url, self.vers, api_function),
-                                 data=payload,
-                                 headers={
-                                          'Authorization': 'Basic {0}'
-                                                           .format(self.creds)
-                                         },
-                                 verify=False)
+        return self._request('POST', api_function, safe, data=payload)
 
     def put(self, api_function, payload):
         """
@@ -166,14 +464,7 @@ class infoblox(object):
         output  resp (struct)           WAPI HTTP response, including
                                         status code
         """
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            return requests.put('https://{0}/wapi/{1}/{2}'
-                                .format(self.url, self.vers, api_function),
-                                data=payload,
-                                headers={'Authorization': 'Basic {0}'
-                                                          .format(self.creds)},
-                                verify=False)
+        return self._request('PUT', api_function, data=payload)
 
     def delete(self, api_function):
         """
@@ -183,24 +474,178 @@ class infoblox(object):
         output  resp (struct)           WAPI HTTP response, including
                                         status code
         """
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            return requests.delete('https://{0}/wapi/{1}/{2}'
-                                   .format(self.url, self.vers, api_function),
-                                   headers={
-                                            'Authorization': 'Basic {0}'
-                                                             .format(self.creds)
-                                           },
-                                   verify=False)
+        return self._request('DELETE', api_function)
 
-    def host(self, hostname=None):
+    def iter_objects(self, objtype, page_size=None, compact=None, **filters):
+        """
+        iter_objects - Lazily iterate over every object of a type matching
+                       the given filters. Results are requested from the
+                       WAPI one page at a time, and each page is decoded
+                       one object at a time as it arrives, so memory use
+                       stays bounded whatever the page size
+
+        input   objtype (string)        WAPI object type, e.g. record:host
+                page_size (int)         Optional: Objects per page,
+                                        defaults to the client page_size
+                compact (bool)          Optional: Yield compact records
+                                        instead of dicts, defaults to the
+                                        client setting
+                filters (dict)          Optional: Search arguments, passed
+                                        as field=value. _return_fields can
+                                        be given the same way, otherwise the
+                                        client default for objtype applies
+        output  objects (generator)     Parsed JSON objects
+        """
+        if page_size is None:
+            page_size = self.page_size
+        if compact is None:
+            compact = self.compact
+        fields = self.return_fields.get(objtype)
+        if fields and not any(k.startswith('_return_fields') for k in filters):
+            filters['_return_fields'] = ','.join(fields)
+        args = ['{0}={1}'.format(k, v) for k, v in sorted(filters.items())
+                if v is not None]
+        args += ['_paging=1', '_return_as_object=1',
+                 '_max_results={0}'.format(page_size)]
+        query = '{0}?{1}'.format(objtype, '&'.join(args))
+        while query is not None:
+            page = _internal._json_stream()
+            objects = self._stream(query, page,
+                                   'page through {0}'.format(objtype))
+            if compact:
+                objects = _compact(objtype, objects)
+            for obj in objects:
+                yield obj
+            query = None
+            if page.fields.get('next_page_id'):
+                query = '{0}?_page_id={1}'.format(objtype,
+                                                  page.fields['next_page_id'])
+
+    def iter_get(self, query, compact=None):
+        """
+        iter_get - Send a GET request and iterate over the objects returned,
+                   decoding them one at a time as the response arrives, so
+                   memory use does not grow with the size of the result
+
+        input   query (string)          Search, e.g. record:a?zone=a.com
+                compact (bool)          Optional: Yield compact records
+                                        instead of dicts, defaults to the
+                                        client setting
+        output  objects (generator)     Parsed JSON objects
+        """
+        objtype = query.partition('?')[0]
+        objects = self._stream(query, _internal._json_stream(),
+                               'retrieve {0}'.format(objtype))
+        if compact is None:
+            compact = self.compact
+        if compact:
+            return _compact(objtype, objects)
+        return objects
+
+    def _stream(self, query, parser, action):
+        """
+        _stream - Send a GET request and yield the objects of the JSON
+                  array returned as the body is read from the socket
+
+        input   query (string)          Function to call in WAPI
+                parser (object)         _json_stream fed with the body
+                action (string)         Description for the error callback
+        output  objects (generator)     Parsed JSON objects
+        """
+        resp = self.get(query, stream=True)
+        try:
+            if resp.status_code != 200:
+                try:
+                    self.__caller__('Could not {0} - Status {1}'
+                                    .format(action, resp.status_code),
+                                    resp.status_code)
+                except Exception:
+                    pass
+                return
+            for obj in _internal._iter_stream(
+                    resp.iter_content(self.chunk_size), parser):
+                yield obj
+        finally:
+            resp.close()
+
+    def iter_hosts(self, zone=None, view=None, page_size=None, **filters):
+        """
+        iter_hosts - Lazily iterate over host records
+
+        input   zone (string)           Optional: Zone to list
+                view (string)           Optional: DNS view to list
+                page_size (int)         Optional: Objects per page
+                filters (dict)          Optional: Extra search arguments
+        output  hosts (generator)       Parsed record:host objects
+        """
+        return self.iter_objects('record:host', page_size, zone=zone,
+                                 view=view, **filters)
+
+    def iter_a(self, zone=None, view=None, page_size=None, **filters):
+        """
+        iter_a - Lazily iterate over A records
+
+        input   zone (string)           Optional: Zone to list
+                view (string)           Optional: DNS view to list
+                page_size (int)         Optional: Objects per page
+                filters (dict)          Optional: Extra search arguments
+        output  records (generator)     Parsed record:a objects
+        """
+        return self.iter_objects('record:a', page_size, zone=zone,
+                                 view=view, **filters)
+
+    def iter_cnames(self, zone=None, view=None, page_size=None, **filters):
+        """
+        iter_cnames - Lazily iterate over CNAME records
+
+        input   zone (string)           Optional: Zone to list
+                view (string)           Optional: DNS view to list
+                page_size (int)         Optional: Objects per page
+                filters (dict)          Optional: Extra search arguments
+        output  records (generator)     Parsed record:cname objects
+        """
+        return self.iter_objects('record:cname', page_size, zone=zone,
+                                 view=view, **filters)
+
+    def iter_leases(self, network=None, network_view=None, page_size=None,
+                    **filters):
+        """
+        iter_leases - Lazily iterate over DHCP leases
+
+        input   network (string)        Optional: Network in CIDR notation
+                network_view (string)   Optional: Network view to list
+                page_size (int)         Optional: Objects per page
+                filters (dict)          Optional: Extra search arguments
+        output  leases (generator)      Parsed lease objects
+        """
+        return self.iter_objects('lease', page_size, network=network,
+                                 network_view=network_view, **filters)
+
+    def iter_networks(self, network_view=None, page_size=None, **filters):
+        """
+        iter_networks - Lazily iterate over networks
+
+        input   network_view (string)   Optional: Network view to list
+                page_size (int)         Optional: Objects per page
+                filters (dict)          Optional: Extra search arguments
+        output  networks (generator)    Parsed network objects
+        """
+        return self.iter_objects('network', page_size,
+                                 network_view=network_view, **filters)
+
+    def host(self, hostname=None, view=None, zone=None, regex=False):
         """
         host - host object
 
         input   hostname (string)   DNS name for host record
+                view (string)       Optional: DNS view of the record
+                zone (string)       Optional: Zone of the record
+                regex (bool)        Optional: Look the record up with a
+                                    regular expression search instead of
+                                    an exact name match
         output  handle (handle)     Reference to host object
         """
-        handle = _internal._host(self, hostname)
+        handle = _internal._host(self, hostname, view, zone, regex)
         return handle
 
     def grid(self):
@@ -223,65 +668,341 @@ class infoblox(object):
         handle = _internal._subnet(self, subnet)
         return handle
 
-    def lease(self, address):
+    def lease(self, address, regex=False):
         """
         lease - lease object
 
         input   address (string)    IP address of lease
+                regex (bool)        Optional: Look the lease up with a
+                                    regular expression search
         output  handle (handle)     Reference to lease object
         """
-        handle = _internal._lease(self, address)
+        handle = _internal._lease(self, address, regex)
         return handle
 
-    def a(self, name):
+    def a(self, name, view=None, zone=None, regex=False):
         """
         a - A record object
 
         input   name (string)       DNS name of an A record
+                view (string)       Optional: DNS view of the record
+                zone (string)       Optional: Zone of the record
+                regex (bool)        Optional: Look the record up with a
+                                    regular expression search instead of
+                                    an exact name match
         output  handle (handle)     Reference to A record object
         """
-        handle = _internal._a(self, name)
+        handle = _internal._a(self, name, view, zone, regex)
         return handle
 
-    def cname(self, name):
+    def cname(self, name, view=None, zone=None, regex=False):
         """
         cname - CNAME record object
 
         input   name (string)       Domain name of CNAME
+                view (string)       Optional: DNS view of the record
+                zone (string)       Optional: Zone of the record
+                regex (bool)        Optional: Look the record up with a
+                                    regular expression search instead of
+                                    an exact name match
         output  handle (handle)     Reference to CNAME object
         """
-        handle = _internal._cname(self, name)
+        handle = _internal._cname(self, name, view, zone, regex)
         return handle
 
-    def mx(self, name):
+    def mx(self, name, view=None, zone=None, regex=False):
         """
         mx - MX record (Mail Exchanger) object
 
         input   name (string)       Domain name of MX record
+                view (string)       Optional: DNS view of the record
+                zone (string)       Optional: Zone of the record
+                regex (bool)        Optional: Look the record up with a
+                                    regular expression search instead of
+                                    an exact name match
         output  handle (handle)     Reference to record:mx object
         """
-        handle = _internal._mx(self, name)
+        handle = _internal._mx(self, name, view, zone, regex)
         return handle
 
-    def srv(self, name, port):
+    def srv(self, name, port, view=None, zone=None, regex=False):
         """
         srv - SRV record object
 
         input   name (string)       Domain name of SRV
                 port (int)          Port number of service
+                view (string)       Optional: DNS view of the record
+                zone (string)       Optional: Zone of the record
+                regex (bool)        Optional: Look the record up with a
+                                    regular expression search instead of
+                                    an exact name match
         output  handle (handle)     Reference to SRV record object
         """
-        handle = _internal._srv(self, name, port)
+        handle = _internal._srv(self, name, port, view, zone, regex)
         return handle
 
-    def rpz_cname(self, name):
+    def rpz_cname(self, name, view=None, zone=None, regex=False):
         """
         rpz_cname - A record:rpz:cname object
 
         input   name (string)       Domain name of the record
+                view (string)       Optional: DNS view of the record
+                zone (string)       Optional: Response policy zone of the
+                                    record
+                regex (bool)        Optional: Look the record up with a
+                                    regular expression search
         output  handle (handle)     Reference to record:rpz:cname object
         """
-        return _internal._rpz_cname(self, name)
+        return _internal._rpz_cname(self, name, view, zone, regex)
+
+    def batch(self, chunk_size=500, discard=False, abort_on_error=True):
+        """
+        batch - batch object. Handles created from it queue their writes,
+                which are sent as WAPI multi-object requests when the batch
+                is flushed or its with block exits
+
+        input   chunk_size (int)        Optional: Operations per request
+                discard (bool)          Optional: Discard per-operation
+                                        results
+                abort_on_error (bool)   Optional: Stop sending chunks after
+                                        a failed one
+        output  handle (handle)         Reference to batch object
+        """
+        return _internal._batch(self, chunk_size, discard, abort_on_error)
+
+    def restart_scheduler(self, debounce=5, max_delay=60,
+                          member_order='SEQUENTIALLY', sequential_delay=10,
+                          service_option='ALL',
+                          restart_option='RESTART_IF_NEEDED',
+                          poll_interval=5, timeout=600):
+        """
+        restart_scheduler - Set up the restart scheduler used by
+                            request_restart(). Restart requests from any
+                            number of threads are coalesced into one
+                            restart, sent once no request has come in for
+                            debounce seconds and at most max_delay seconds
+                            after the first, then polled until it finishes
+
+        input   debounce (float)        Optional: Quiet seconds before the
+                                        restart is sent
+                max_delay (float)       Optional: Longest wait after the
+                                        first request
+                member_order (string)   Optional: SEQUENTIALLY or
+                                        SIMULTANEOUSLY
+                sequential_delay (int)  Optional: Seconds between members
+                service_option (string) Optional: ALL, DNS, DHCP, DHCPV4 or
+                                        DHCPV6
+                restart_option (string) Optional: RESTART_IF_NEEDED or
+                                        FORCE_RESTART
+                poll_interval (float)   Optional: Seconds between status
+                                        polls
+                timeout (float)         Optional: Seconds to poll before
+                                        giving up
+        output  handle (handle)         Reference to the scheduler, also
+                                        kept as scheduler
+        """
+        scheduler = _internal._restart_scheduler(
+            self, debounce, max_delay, member_order, sequential_delay,
+            service_option, restart_option, poll_interval, timeout)
+        with self._scheduler_lock:
+            self.scheduler = scheduler
+        return scheduler
+
+    def request_restart(self):
+        """
+        request_restart - Ask for a grid service restart through the restart
+                          scheduler, setting up one with the defaults if
+                          needed. Returns at once
+
+        input   void (void)
+        output  ticket (handle)         Reference to the coalesced restart;
+                                        wait() blocks until it finished
+        """
+        with self._scheduler_lock:
+            if self.scheduler is None:
+                self.scheduler = _internal._restart_scheduler(self)
+        return self.scheduler.request()
+
+    def affected_members(self):
+        """
+        affected_members - Grid members serving the zones and networks
+                           touched by the writes recorded so far
+
+        input   void (void)
+        output  members (dict)          Services to restart per member,
+                                        e.g. {'ns1.example.com': ['DNS']}
+        """
+        if self.tracker is None:
+            raise ValueError('Change tracking is off, see track_changes')
+        services = _internal._affected(self, *self.tracker.changes())[0]
+        return dict((member, sorted(needed))
+                    for member, needed in services.items())
+
+    def restart_affected(self, sequential_delay=10,
+                         restart_option='RESTART_IF_NEEDED', dry_run=False):
+        """
+        restart_affected - Restart only the members serving the zones and
+                           networks touched since the last restart, and
+                           only the DNS or DHCP service the changes need.
+                           Members are restarted simultaneously, except
+                           those serving the same zone or network, which
+                           go one at a time so it never goes dark
+
+        input   sequential_delay (int)  Optional: Seconds between members
+                                        restarted one at a time
+                restart_option (string) Optional: RESTART_IF_NEEDED or
+                                        FORCE_RESTART
+                dry_run (bool)          Optional: Only return the restarts
+                                        that would be sent
+        output  calls (list)            restartservices arguments sent, or
+                                        an error status. The recorded
+                                        changes are cleared once sent
+        """
+        if self.tracker is None:
+            raise ValueError('Change tracking is off, see track_changes')
+        names, addresses = self.tracker.drain()
+        calls = _internal._restart_calls(
+            *_internal._affected(self, names, addresses),
+            sequential_delay=sequential_delay, restart_option=restart_option)
+        if dry_run:
+            self.tracker.restore(names, addresses)
+            return calls
+        grid = self.grid()
+        for call in calls:
+            ret = grid.restart(**call)
+            if ret != 0:
+                self.tracker.restore(names, addresses)
+                return ret
+        return calls
+
+    def reconcile(self, desired, zone=None, view=None, delete=True,
+                  page_size=None):
+        """
+        reconcile - Plan bringing a zone or view to a desired set of host,
+                    A, CNAME, SRV and MX records. The current records are
+                    read with one paged listing per type and diffed in
+                    memory; nothing is written until apply() is called
+
+        input   desired (dict)          Records wanted per object type, e.g.
+                                        {'record:a': [{'name': ...,
+                                        'ipv4addr': ...}]}
+                zone (string)           Optional: Zone to reconcile
+                view (string)           Optional: DNS view to reconcile
+                delete (bool)           Optional: Delete current records of
+                                        the given types that are not
+                                        desired. Needs a zone or a view,
+                                        ValueError is raised otherwise
+                page_size (int)         Optional: Objects per page read
+        output  handle (handle)         Reference to the planned
+                                        reconciliation
+        """
+        return _internal._reconcile(self, desired, zone, view, delete,
+                                    page_size).plan()
+
+    def csv_import(self, operation='INSERT', on_error='CONTINUE'):
+        """
+        csv_import - CSV import object. Its run() streams records into an
+                     Infoblox CSV file, imports it through fileop and
+                     reports the rows the grid rejected
+
+        input   operation (string)      Optional: INSERT, UPDATE, REPLACE,
+                                        DELETE or CUSTOM
+                on_error (string)       Optional: CONTINUE or STOP
+        output  handle (handle)         Reference to CSV import object
+        """
+        return _internal._csv_import(self, operation, on_error)
+
+    def csv_export(self, objtype, path):
+        """
+        csv_export - Export every object of a type with the grid's CSV
+                     export, streaming the file to disk
+
+        input   objtype (string)        WAPI object type, e.g. record:host
+                path (string)           File to write
+        output  0 (int)                 Export written to path
+        """
+        return _internal._csv_export(self, objtype, path)
+
+    def add_hook(self, hook):
+        """
+        add_hook - Register a function called after every WAPI request with
+                   a dict of method, object, status, sent and received
+                   bytes and latency in seconds. Nothing is measured while
+                   no hook is registered
+
+        input   hook (funct)            Function taking the request dict
+        output  hook (funct)            The hook, for remove_hook
+        """
+        self.hooks = self.hooks + [hook]
+        return hook
+
+    def remove_hook(self, hook):
+        """
+        remove_hook - Unregister a hook
+
+        input   hook (funct)            Hook passed to add_hook
+        output  void (void)
+        """
+        self.hooks = [h for h in self.hooks if h is not hook]
+
+    def metrics(self, buckets=_internal.metrics.BUCKETS):
+        """
+        metrics - Aggregate every request into counters and latency
+                  histograms per method and object type
+
+        input   buckets (tuple)         Optional: Histogram bucket bounds in
+                                        seconds
+        output  metrics (object)        Registered aggregator, see stats()
+                                        and prometheus()
+        """
+        return self.add_hook(_internal._metrics(buckets))
+
+    def statsd(self, host='127.0.0.1', port=8125, prefix='infoblox.wapi'):
+        """
+        statsd - Send every request to a statsd server as a status counter,
+                 a latency timer and byte counters
+
+        input   host (string)           Optional: statsd host
+                port (int)              Optional: statsd UDP port
+                prefix (string)         Optional: Metric name prefix
+        output  statsd (object)         Registered hook
+        """
+        return self.add_hook(_internal._statsd(host, port, prefix))
+
+    def map(self, operation, items, workers=10):
+        """
+        map - Run an operation over many items on a pool of threads sharing
+              this client. Errors the handles report while an item runs are
+              collected with the item instead of going to the callback
+
+        input   operation (funct)       Called with each item, e.g.
+                                        lambda i: iblox.host(i[0]).add(i[1])
+                items (list)            Items to process
+                workers (int)           Optional: Number of threads. Keep it
+                                        at or below pool_maxsize
+        output  bulk (object)           results (in input order), errors as
+                                        (index, item, error) and stats()
+                                        with throughput and p50/p99 latency
+        """
+        return _internal._bulk(self, operation, items, workers).run()
+
+    def network_index(self, network_view=None, page_size=None):
+        """
+        network_index - Download every network into a local longest-prefix
+                        match index. Once built, subnet_from_ip answers
+                        from the index instead of querying the WAPI
+
+        input   network_view (string)   Optional: Network view to index
+                page_size (int)         Optional: Networks per page when
+                                        downloading
+        output  index (handle)          Reference to the network index,
+                                        also kept as netindex. Setting
+                                        netindex to None disables it
+        """
+        index = _internal._network_index(self, network_view, page_size)
+        index.refresh()
+        self.netindex = index
+        return index
 
     def subnet_from_ip(self, ip):
         """
@@ -291,6 +1012,12 @@ class infoblox(object):
         input   ip (string)         IP address to get the subnet of
         output  subnet (Subnet)     Returns a subnet object
         """
+        if self.netindex is not None:
+            record = self.netindex.lookup(ip)
+            if record is None:
+                return None
+            return _internal._subnet(self, record['network'], record)
+
         resp = self.get("network?contains_address={0}".format(ip))
 
         if resp.status_code != 200:
@@ -301,8 +1028,76 @@ class infoblox(object):
             except Exception:
                 return resp.status_code
         try:
-            s = resp.json()[0]['network']
+            s = resp.json()[0]
         except (ValueError, IndexError):
             return None
 
-        return self.subnet(subnet=s)
+        return _internal._subnet(self, s['network'], s)
+
+
+def _compact(objtype, objects):
+    """
+    _compact - Convert parsed objects to compact records as they are yielded
+
+    input   objtype (string)        WAPI object type
+            objects (iterator)      Parsed JSON objects
+    output  records (generator)     Compact records
+    """
+    for obj in objects:
+        yield _internal._to_record(objtype, obj)
+
+
+def _rewind(kwargs):
+    """
+    _rewind - Rewind a streamed request body, e.g. a file upload, before the
+              request is sent again
+
+    input   kwargs (dict)           Extra arguments for requests
+    output  void (void)
+    """
+    data = kwargs.get('data')
+    if hasattr(data, 'seek'):
+        data.seek(0)
+
+
+_insecure_ignored = False
+_insecure_lock = threading.Lock()
+
+
+def _ignore_insecure():
+    """
+    _ignore_insecure - Silence the InsecureRequestWarning of unverified
+                       requests. The filter is added once, by the first
+                       client built with verify=False, instead of every
+                       time one is
+
+    input   void (void)
+    output  void (void)
+    """
+    global _insecure_ignored
+    with _insecure_lock:
+        if not _insecure_ignored:
+            warnings.filterwarnings('ignore', category=InsecureRequestWarning)
+            _insecure_ignored = True
+
+
+def _keepalive(ref, interval, stop):
+    """
+    _keepalive - Background loop refreshing the session cookie of a client.
+                 Only a weak reference is held so the client can still be
+                 garbage collected (and logged out) while the loop runs
+
+    input   ref (weakref)           Weak reference to an infoblox object
+            interval (int)          Seconds between checks
+            stop (Event)            Set when the client is destroyed
+    output  void (void)
+    """
+    while not stop.wait(interval):
+        client = ref()
+        if client is None:
+            return
+        try:
+            client._refresh(interval)
+        except Exception:
+            pass
+        del client
@@ -0,0 +1,898 @@
+"""
+An in-process stand-in for the Infoblox WAPI. It keeps objects in memory and
+answers the subset of WAPI calls this package makes, so the client can be
+exercised and benchmarked without a grid. Latency and errors can be injected
+to model a loaded or unreliable appliance.
+
+    server = FakeWAPI(latency=0.005, error_rate=0.01).start()
+    iblox = infoblox.infoblox(auth=server.auth)
+    ...
+    server.stop()
+"""
+import base64
+import copy
+import csv
+import io
+import ipaddress
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlsplit, parse_qsl, unquote
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlsplit, parse_qsl
+    from urllib import unquote
+
+from .._internal.csvio import _csv_writer
+
+# Fields returned when a search does not specify _return_fields
+DEFAULT_FIELDS = {
+    'record:host': ['ipv4addrs', 'name', 'view'],
+    'record:a': ['ipv4addr', 'name', 'view'],
+    'record:cname': ['canonical', 'name', 'view'],
+    'record:srv': ['name', 'port', 'priority', 'target', 'view', 'weight'],
+    'record:mx': ['mail_exchanger', 'name', 'preference', 'view'],
+    'record:rpz:cname': ['canonical', 'name', 'view'],
+    'network': ['comment', 'network', 'network_view'],
+    'lease': ['address', 'network_view'],
+    'grid': [],
+    'csvimporttask': ['action', 'import_id', 'lines_failed',
+                      'lines_processed', 'lines_warning', 'on_error',
+                      'operation', 'status'],
+}
+
+# CSV object type the grid imports: (WAPI object type, {CSV column: WAPI
+# field}, required columns). Kept apart from the client's own table so
+# uploads are checked against the Infoblox format, not against the writer
+CSV_OBJECTS = {
+    'hostrecord': ('record:host', {
+        'fqdn': 'name', 'view': 'view', 'addresses': 'ipv4addrs',
+        'aliases': 'aliases', 'ttl': 'ttl', 'comment': 'comment'},
+        ['fqdn']),
+    'arecord': ('record:a', {
+        'fqdn': 'name', 'address': 'ipv4addr', 'view': 'view', 'ttl': 'ttl',
+        'comment': 'comment'}, ['fqdn', 'address']),
+    'cnamerecord': ('record:cname', {
+        'fqdn': 'name', 'canonical_name': 'canonical', 'view': 'view',
+        'ttl': 'ttl', 'comment': 'comment'}, ['fqdn', 'canonical_name']),
+    'srvrecord': ('record:srv', {
+        'fqdn': 'name', 'port': 'port', 'priority': 'priority',
+        'target': 'target', 'weight': 'weight', 'view': 'view',
+        'ttl': 'ttl', 'comment': 'comment'},
+        ['fqdn', 'port', 'priority', 'target', 'weight']),
+    'mxrecord': ('record:mx', {
+        'fqdn': 'name', 'mx': 'mail_exchanger', 'priority': 'preference',
+        'view': 'view', 'ttl': 'ttl', 'comment': 'comment'},
+        ['fqdn', 'mx', 'priority']),
+    'responsepolicycnamerecord': ('record:rpz:cname', {
+        'fqdn': 'name', 'canonical_name': 'canonical',
+        'parent_zone': 'rp_zone', 'view': 'view', 'ttl': 'ttl',
+        'comment': 'comment'}, ['fqdn', 'canonical_name', 'parent_zone']),
+    'hostaddress': ('record:host_ipv4addr', {
+        'parent': 'host', 'address': 'ipv4addr', 'mac_address': 'mac',
+        'configure_for_dhcp': 'configure_for_dhcp', 'view': 'view'},
+        ['parent', 'address']),
+}
+CSV_INTEGERS = frozenset(['ttl', 'port', 'priority', 'weight', 'preference'])
+
+# Field used to build the readable part of an object _ref
+REF_FIELDS = {
+    'record:mx': 'mail_exchanger',
+    'network': 'network',
+    'lease': 'address',
+    'zone_auth': 'fqdn',
+    'member': 'host_name',
+}
+
+
+class FakeWAPI(object):
+
+    def __init__(self, user='admin', passwd='infoblox', host='127.0.0.1',
+                 port=0, session_timeout=600, latency=0, error_rate=0,
+                 error_status=503, retry_after=None, seed=None):
+        """
+        class constructor - Automatically called on class instantiation
+
+        input   user (string)           Username accepted by the server
+                passwd (string)         Password accepted by the server
+                host (string)           Address to listen on
+                port (int)              Port to listen on, 0 picks a free one
+                session_timeout (int)   Idle seconds before an ibapauth
+                                        session cookie expires
+                latency (float/tuple)   Seconds added to every request, or
+                                        a (min, max) range to draw from
+                error_rate (float)      Share of requests, 0 to 1, failed
+                                        with error_status before being
+                                        processed
+                error_status (int)      Status of the injected errors
+                retry_after (int)       Retry-After header sent with the
+                                        injected errors, if any
+                seed (int)              Seed for the latency and error draws
+        output  void (void)
+        """
+        self.user = user
+        self.passwd = passwd
+        self.session_timeout = session_timeout
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.injected = 0
+        self.random = random.Random(seed)
+        self.sessions = {}
+        self.logins = 0
+        self.pages = {}
+        self.restarts = []
+        self.restart_time = 0
+        self.restart_times = []
+        self.files = {}
+        self.error_logs = {}
+        self.imports = 0
+        self.lock = threading.Lock()
+        self.objects = {}
+        self.names = {}
+        self.counter = 0
+        self.requests = 0
+        self.connections = 0
+        self.httpd = _server((host, port), _handler)
+        self.httpd.wapi = self
+        self.thread = None
+        self.create('grid', {'name': 'Infoblox'})
+
+    @property
+    def url(self):
+        """
+        url - Base URL of the server, suitable for the auth dict
+        """
+        return 'http://{0}:{1}'.format(*self.httpd.server_address[:2])
+
+    @property
+    def auth(self):
+        """
+        auth - Auth dict accepted by the infoblox class constructor
+        """
+        return {'url': self.url, 'user': self.user, 'passwd': self.passwd}
+
+    def start(self):
+        """
+        start - Serve requests from a daemon thread
+
+        input   void (void)
+        output  self (object)           The running server
+        """
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        stop - Shut the server down and close the listening socket
+
+        input   void (void)
+        output  void (void)
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def inject(self):
+        """
+        inject - Apply the configured latency and decide whether the
+                 current request fails
+
+        input   void (void)
+        output  fail (bool)             The request gets an injected error
+        """
+        with self.lock:
+            delay = self.latency
+            if isinstance(delay, (tuple, list)):
+                delay = self.random.uniform(*delay)
+            fail = (self.error_rate > 0 and
+                    self.random.random() < self.error_rate)
+            if fail:
+                self.injected += 1
+        if delay:
+            time.sleep(delay)
+        return fail
+
+    def create(self, objtype, data):
+        """
+        create - Store a new object
+
+        input   objtype (string)        WAPI object type
+                data (dict)             Object fields
+        output  ref (string)            _ref of the new object
+        """
+        with self.lock:
+            self.counter += 1
+            ident = base64.b64encode('{0}${1}'.format(objtype, self.counter)
+                                     .encode('utf-8')).decode('utf-8')
+        name = data.get(REF_FIELDS.get(objtype, 'name'), '')
+        ref = '{0}/{1}:{2}'.format(objtype, ident, name)
+        record = dict(data)
+        record['_ref'] = ref
+        record.setdefault('view', 'default')
+        if objtype.startswith('record:') and 'name' in record:
+            record.setdefault('zone', record.get('rp_zone') or
+                              record['name'].partition('.')[2])
+        if objtype == 'record:host':
+            for addr in record.get('ipv4addrs', []):
+                addr['host'] = record['name']
+                addr['_ref'] = 'record:host_ipv4addr/{0}:{1}/{2}'.format(
+                    ident, addr['ipv4addr'], record['name'])
+        with self.lock:
+            self.objects.setdefault(objtype, {})[ref] = record
+            self._index(objtype, record)
+        return ref
+
+    def load(self, objtype, records):
+        """
+        load - Bulk load objects, typically to seed a benchmark
+
+        input   objtype (string)        WAPI object type
+                records (list)          List of dicts to store
+        output  refs (list)             _refs of the new objects
+        """
+        return [self.create(objtype, r) for r in records]
+
+    def find(self, objtype, **fields):
+        """
+        find - Return stored objects of a type matching all given fields
+
+        input   objtype (string)        WAPI object type
+                fields (dict)           Field values to match exactly
+        output  records (list)          Matching objects
+        """
+        with self.lock:
+            records = list(self.objects.get(objtype, {}).values())
+        return [r for r in records
+                if all(r.get(k) == v for k, v in fields.items())]
+
+    def lookup(self, ref):
+        """
+        lookup - Return the object type and stored object for a _ref
+
+        input   ref (string)            Object _ref
+        output  objtype (string)        WAPI object type
+                record (dict)           Stored object or None
+        """
+        objtype = ref.split('/')[0]
+        with self.lock:
+            return objtype, self.objects.get(objtype, {}).get(ref)
+
+    def search(self, objtype, params):
+        """
+        search - Run a WAPI style search. name=value matches exactly,
+                 name~=value matches a regular expression
+
+        input   objtype (string)        WAPI object type
+                params (list)           (key, value) query parameters
+        output  records (list)          Matching objects
+        """
+        filters = [(k, v) for k, v in params if not k.startswith('_')]
+        names = [v for k, v in filters if k == 'name']
+        with self.lock:
+            if names:
+                # Exact name searches are answered from the index
+                records = list(self.names.get(objtype, {})
+                               .get(names[0], {}).values())
+            else:
+                records = list(self.objects.get(objtype, {}).values())
+        for key, value in filters:
+            if key == 'contains_address':
+                ip = ipaddress.ip_address(value)
+                records = [r for r in records
+                           if ip in ipaddress.ip_network(r['network'])]
+            elif key.endswith('~'):
+                rex = re.compile(value)
+                key = key[:-1]
+                records = [r for r in records
+                           if rex.search(str(r.get(key, '')))]
+            else:
+                records = [r for r in records if str(r.get(key)) == value]
+        return records
+
+    def project(self, objtype, record, params):
+        """
+        project - Reduce an object to the fields a request asked for
+
+        input   objtype (string)        WAPI object type
+                record (dict)           Stored object
+                params (list)           (key, value) query parameters
+        output  record (dict)           Object restricted to return fields
+        """
+        fields = list(DEFAULT_FIELDS.get(objtype, []))
+        for key, value in params:
+            if key == '_return_fields':
+                fields = [f for f in value.split(',') if f]
+            elif key == '_return_fields+':
+                fields += [f for f in value.split(',') if f]
+        ret = {'_ref': record['_ref']}
+        for field in fields:
+            if field in record:
+                ret[field] = record[field]
+        return ret
+
+    def handle(self, method, path, query, body):
+        """
+        handle - Dispatch a WAPI call
+
+        input   method (string)         HTTP method
+                path (string)           Path after /wapi/<version>/
+                query (list)            (key, value) query parameters
+                body (string)           Request body
+        output  status (int)            HTTP status code
+                data (object)           Object to return as JSON
+        """
+        if method == 'GET':
+            if path == 'grid:servicerestart:status':
+                return 200, [self.restart_status()]
+            if path == '' and '_schema' in dict(query):
+                return 200, {'requested_version': '2.6.1',
+                             'supported_objects': sorted(DEFAULT_FIELDS),
+                             'supported_versions': ['2.6.1']}
+            if '/' in path:
+                objtype, record = self.lookup(path)
+                if record is None:
+                    return 404, _error('AdmConDataNotFoundError',
+                                       'Reference not found')
+                return 200, self.project(objtype, record, query)
+            args = dict(query)
+            if '_page_id' in args:
+                return self.page(args['_page_id'])
+            records = [self.project(path, r, query)
+                       for r in self.search(path, query)]
+            if args.get('_paging') == '1':
+                with self.lock:
+                    page_id = uuid.uuid4().hex
+                    self.pages[page_id] = (int(args['_max_results']),
+                                           records)
+                return self.page(page_id)
+            if args.get('_return_as_object') == '1':
+                return 200, {'result': records}
+            return 200, records
+        if method == 'POST':
+            data = json.loads(body) if body else {}
+            args = dict(query)
+            if '_function' in args:
+                args.update(data)
+                if path == 'fileop':
+                    return self.fileop(args.pop('_function'), args)
+                return self.function(path, args.pop('_function'), args)
+            if path == 'request':
+                return self.multi(data)
+            return 201, self.create(path, data)
+        if method == 'PUT':
+            objtype, record = self.lookup(path)
+            if record is None:
+                return 404, _error('AdmConDataNotFoundError',
+                                   'Reference not found')
+            with self.lock:
+                self._unindex(objtype, record)
+                self.modify(objtype, record, json.loads(body) if body else {})
+                self._index(objtype, record)
+            return 200, path
+        if method == 'DELETE':
+            objtype, record = self.lookup(path)
+            if record is None:
+                return 404, _error('AdmConDataNotFoundError',
+                                   'Reference not found')
+            with self.lock:
+                self._unindex(objtype, record)
+                del self.objects[objtype][path]
+            return 200, path
+        return 400, _error('AdmConProtoError', 'Unsupported method')
+
+    def modify(self, objtype, record, data):
+        """
+        modify - Apply a PUT payload. field+ adds list elements or dict
+                 keys, field- removes them; list elements are matched on
+                 ipv4addr when they have one
+
+        input   objtype (string)        WAPI object type
+                record (dict)           Stored object
+                data (dict)             PUT payload
+        output  void (void)
+        """
+        for key, value in data.items():
+            field = key.rstrip('+-')
+            if field == key:
+                record[key] = value
+            elif isinstance(value, dict):
+                current = dict(record.get(field) or {})
+                for k, v in value.items():
+                    if key.endswith('+'):
+                        current[k] = v
+                    else:
+                        current.pop(k, None)
+                record[field] = current
+            elif key.endswith('+'):
+                record[field] = list(record.get(field) or []) + value
+            else:
+                drop = [_match(v) for v in value]
+                record[field] = [v for v in record.get(field) or []
+                                 if _match(v) not in drop]
+        if objtype == 'record:host':
+            ident = record['_ref'].split('/')[1].split(':')[0]
+            for addr in record.get('ipv4addrs', []):
+                addr['host'] = record['name']
+                addr['_ref'] = 'record:host_ipv4addr/{0}:{1}/{2}'.format(
+                    ident, addr['ipv4addr'], record['name'])
+
+    def _index(self, objtype, record):
+        if 'name' in record:
+            self.names.setdefault(objtype, {}).setdefault(
+                record['name'], {})[record['_ref']] = record
+
+    def _unindex(self, objtype, record):
+        if 'name' in record:
+            self.names[objtype][record['name']].pop(record['_ref'], None)
+
+    def used(self):
+        """
+        used - Addresses taken by host and A records
+
+        input   void (void)
+        output  used (set)              IPv4 addresses in use
+        """
+        used = set()
+        with self.lock:
+            for r in self.objects.get('record:a', {}).values():
+                used.add(r.get('ipv4addr'))
+            for r in self.objects.get('record:host', {}).values():
+                used.update(a.get('ipv4addr')
+                            for a in r.get('ipv4addrs', []))
+        return used
+
+    def function(self, ref, name, args):
+        """
+        function - Call a WAPI object function
+
+        input   ref (string)            _ref of the object
+                name (string)           Function name
+                args (dict)             Function arguments
+        output  status (int)            HTTP status code
+                data (object)           Function result
+        """
+        objtype, record = self.lookup(ref)
+        if record is None:
+            return 404, _error('AdmConDataNotFoundError',
+                               'Reference not found')
+        if name == 'next_available_ip':
+            num = int(args.get('num', 1))
+            skip = self.used() | set(args.get('exclude', []))
+            ips = []
+            for ip in ipaddress.ip_network(record['network']).hosts():
+                if len(ips) == num:
+                    break
+                if str(ip) not in skip:
+                    ips.append(str(ip))
+            return 200, {'ips': ips}
+        if name == 'restartservices':
+            # Members restarted sequentially take restart_time each, members
+            # restarted simultaneously restart_time altogether
+            members = len(args.get('members') or
+                          self.objects.get('member', {})) or 1
+            if args.get('member_order') != 'SEQUENTIALLY':
+                members = 1
+            with self.lock:
+                self.restarts.append(args)
+                self.restart_times.append(
+                    (time.time(), self.restart_time * members))
+            return 200, {}
+        return 400, _error('AdmConProtoError',
+                           'Function {0} is not supported'.format(name))
+
+    def fileop(self, name, args):
+        """
+        fileop - Call a fileop function. CSV imports run in a background
+                 thread and are followed through their csvimporttask
+
+        input   name (string)           Function name
+                args (dict)             Function arguments
+        output  status (int)            HTTP status code
+                data (object)           Function result
+        """
+        if name == 'uploadinit':
+            token = uuid.uuid4().hex
+            with self.lock:
+                self.files[token] = None
+            return 200, {'token': token, 'url': self._file_url(
+                'UPLOAD', token, 'import_file')}
+        if name == 'csv_import':
+            with self.lock:
+                data = self.files.pop(args.get('token'), None)
+            if data is None:
+                return 400, _error('AdmConDataNotFoundError',
+                                   'No file uploaded with this token')
+            if args.get('operation', 'INSERT') != 'INSERT':
+                return 400, _error('AdmConProtoError',
+                                   'Only INSERT imports are supported')
+            with self.lock:
+                self.imports += 1
+                import_id = self.imports
+            ref = self.create('csvimporttask', {
+                'import_id': import_id, 'action': 'START',
+                'operation': 'INSERT', 'status': 'PENDING',
+                'on_error': args.get('on_error', 'CONTINUE'),
+                'lines_processed': 0, 'lines_failed': 0, 'lines_warning': 0})
+            task = self.lookup(ref)[1]
+            t = threading.Thread(target=self.csv_load, args=(task, data))
+            t.daemon = True
+            t.start()
+            return 200, {'csv_import_task': self.project(
+                'csvimporttask', task, [])}
+        if name in ('csv_error_log', 'csv_export'):
+            if name == 'csv_export':
+                data = self.csv_dump(args.get('_object'))
+            else:
+                data = self.error_logs.get(args.get('import_id'))
+            if data is None:
+                return 400, _error('AdmConDataNotFoundError',
+                                   'Nothing to download')
+            token = uuid.uuid4().hex
+            with self.lock:
+                self.files[token] = data
+            return 200, {'token': token, 'url': self._file_url(
+                'DOWNLOAD', token, 'file.csv')}
+        if name == 'downloadcomplete':
+            with self.lock:
+                self.files.pop(args.get('token'), None)
+            return 200, {}
+        return 400, _error('AdmConProtoError',
+                           'Function {0} is not supported'.format(name))
+
+    def _file_url(self, kind, token, filename):
+        return '{0}/http_direct_file_io/req_id-{1}-{2}/{3}'.format(
+            self.url, kind, token, filename)
+
+    def file_io(self, method, token, headers, body):
+        """
+        file_io - Receive an upload or serve a download prepared by fileop
+
+        input   method (string)         HTTP method
+                token (string)          Token of the file
+                headers (dict)          Request headers
+                body (bytes)            multipart/form-data upload
+        output  status (int)            HTTP status code
+                data (bytes)            File for downloads
+        """
+        with self.lock:
+            known = token in self.files
+            data = self.files.get(token)
+        if not known:
+            return 404, b''
+        if method == 'GET':
+            return (404, b'') if data is None else (200, data)
+        boundary = headers.get('Content-Type', '').partition('boundary=')[2]
+        start = body.index(b'\r\n\r\n') + 4
+        end = body.rindex('\r\n--{0}--'.format(boundary).encode('utf-8'))
+        with self.lock:
+            self.files[token] = body[start:end]
+        return 200, b''
+
+    def csv_load(self, task, data):
+        """
+        csv_load - Import an uploaded CSV file, recording the progress and
+                   the rejected rows in the import task
+
+        input   task (dict)             Stored csvimporttask
+                data (bytes)            Uploaded file
+        output  void (void)
+        """
+        with self.lock:
+            task['status'] = 'RUNNING'
+        log = io.StringIO()
+        writer = csv.writer(log, lineterminator='\n')
+        processed, failed = 0, 0
+        header = {}
+        for row in csv.reader(io.StringIO(data.decode('utf-8'), newline='')):
+            if not row:
+                continue
+            csvtype = row[0].lower()
+            if csvtype.startswith('header-'):
+                # header-arecord,fqdn*,address*,EA-Site,...
+                header[csvtype[7:]] = row[1:]
+                continue
+            header.setdefault(csvtype, [])
+            processed += 1
+            error = self.csv_insert(csvtype, dict(
+                (column.rstrip('*'), value)
+                for column, value in zip(header[csvtype], row[1:])))
+            if error is None:
+                continue
+            failed += 1
+            writer.writerow(['header-{0}'.format(csvtype)] +
+                            [c.rstrip('*') for c in header[csvtype]])
+            writer.writerow(row + [error])
+            if task['on_error'] == 'STOP':
+                break
+        with self.lock:
+            self.error_logs[task['import_id']] = log.getvalue().encode('utf-8')
+            task['lines_processed'] = processed
+            task['lines_failed'] = failed
+            task['status'] = ('FAILED' if failed and
+                              task['on_error'] == 'STOP' else 'COMPLETED')
+
+    def csv_insert(self, csvtype, fields):
+        """
+        csv_insert - Create the object described by a CSV row
+
+        input   csvtype (string)        CSV object type
+                fields (dict)           Values by CSV column
+        output  error (string)          Why the row was rejected, or None
+        """
+        if csvtype not in CSV_OBJECTS:
+            return 'Unknown CSV object type {0}'.format(csvtype)
+        objtype, columns, required = CSV_OBJECTS[csvtype]
+        for column in required:
+            if not fields.get(column):
+                return 'Required field missing: {0}'.format(columns[column])
+        record, extattrs = {}, {}
+        for column, value in fields.items():
+            if value == '':
+                continue
+            if column.startswith('EA-'):
+                extattrs[column[3:]] = {'value': value}
+                continue
+            field = columns.get(column.lower())
+            if field is None:
+                return 'Unknown column {0}'.format(column)
+            if field == 'ipv4addrs':
+                value = [{'ipv4addr': a} for a in value.split(',')]
+            elif field == 'aliases':
+                value = value.split(',')
+            elif field == 'configure_for_dhcp':
+                value = value.upper() == 'TRUE'
+            elif field in CSV_INTEGERS:
+                try:
+                    value = int(value)
+                except ValueError:
+                    return 'Invalid value for {0}'.format(column)
+            record[field] = value
+        if extattrs:
+            record['extattrs'] = extattrs
+        required = [columns[column] for column in required]
+        if objtype == 'record:host_ipv4addr':
+            hosts = self.find('record:host', name=record.pop('host'))
+            if not hosts:
+                return 'Parent host record not found'
+            record['host'] = hosts[0]['name']
+            with self.lock:
+                hosts[0].setdefault('ipv4addrs', []).append(record)
+            return None
+        for existing in self.find(objtype, name=record['name']):
+            if all(existing.get(f) == record.get(f) for f in required):
+                return 'Duplicate object'
+        self.create(objtype, record)
+        return None
+
+    def csv_dump(self, objtype):
+        """
+        csv_dump - Export every object of a type as an Infoblox CSV file
+
+        input   objtype (string)        WAPI object type
+        output  data (bytes)            CSV file
+        """
+        if objtype not in [t for t, _, _ in CSV_OBJECTS.values()]:
+            return None
+        text = io.StringIO()
+        writer = _csv_writer(text)
+        for record in self.find(objtype):
+            writer.write(objtype, record)
+        return text.getvalue().encode('utf-8')
+
+    def restart_status(self):
+        """
+        restart_status - Restarts requested so far, each taking
+                         restart_time seconds per member restarted in
+                         turn to finish
+
+        input   void (void)
+        output  status (dict)           grid:servicerestart:status counters
+        """
+        now = time.time()
+        with self.lock:
+            running = len([t for t, duration in self.restart_times
+                           if now - t < duration])
+            done = len(self.restart_times) - running
+        return {'_ref': 'grid:servicerestart:status/1', 'failures': 0,
+                'finished': done, 'pending': 0, 'processing': running,
+                'restarting': 0, 'success': done, 'timeouts': 0}
+
+    def page(self, page_id):
+        """
+        page - Return the next page of a paged search
+
+        input   page_id (string)        Page ID returned with the last page
+        output  status (int)            HTTP status code
+                data (dict)             Page result and next_page_id
+        """
+        with self.lock:
+            cursor = self.pages.pop(page_id, None)
+            if cursor is None:
+                return 400, _error('AdmConProtoError', 'Invalid page ID')
+            size, records = cursor
+            data = {'result': records[:size]}
+            if len(records) > size:
+                data['next_page_id'] = uuid.uuid4().hex
+                self.pages[data['next_page_id']] = (size, records[size:])
+        return 200, data
+
+    def multi(self, ops):
+        """
+        multi - Run a multi-object request. The operations are applied in
+                order and rolled back together if any of them fails
+
+        input   ops (list)              Operation dicts with method, object,
+                                        data, args and discard keys
+        output  status (int)            HTTP status code
+                data (object)           Results of the non discarded
+                                        operations, or the first error
+        """
+        with self.lock:
+            snapshot = copy.deepcopy((self.objects, self.names))
+        results = []
+        for op in ops:
+            status, data = self.handle(op.get('method', 'GET').upper(),
+                                       op.get('object', ''),
+                                       list(op.get('args', {}).items()),
+                                       json.dumps(op.get('data', {})))
+            if status >= 300:
+                with self.lock:
+                    self.objects, self.names = snapshot
+                return status, data
+            if not op.get('discard'):
+                results.append(data)
+        return 200, results
+
+    def authenticate(self, headers):
+        """
+        authenticate - Check the ibapauth session cookie or, failing that,
+                       the Basic credentials sent with a request. A Basic
+                       login opens a new session
+
+        input   headers (dict)          Request headers
+        output  ok (bool)               Request is authenticated
+                cookie (string)         New session cookie to set, if any
+        """
+        now = time.time()
+        cookie = _cookie(headers.get('Cookie', ''))
+        with self.lock:
+            expires = self.sessions.get(cookie)
+            if expires is not None and expires > now:
+                self.sessions[cookie] = now + self.session_timeout
+                return True, None
+            self.sessions.pop(cookie, None)
+        expected = base64.b64encode('{0}:{1}'.format(self.user, self.passwd)
+                                    .encode('utf-8')).decode('utf-8')
+        if headers.get('Authorization') != 'Basic {0}'.format(expected):
+            return False, None
+        cookie = uuid.uuid4().hex
+        with self.lock:
+            self.logins += 1
+            self.sessions[cookie] = now + self.session_timeout
+        return True, cookie
+
+    def logout(self, headers):
+        """
+        logout - Invalidate the session cookie sent with a request
+
+        input   headers (dict)          Request headers
+        output  void (void)
+        """
+        with self.lock:
+            self.sessions.pop(_cookie(headers.get('Cookie', '')), None)
+
+
+def _cookie(header):
+    for part in header.split(';'):
+        key, _, value = part.strip().partition('=')
+        if key == 'ibapauth':
+            return value.strip('"')
+    return None
+
+
+def _match(value):
+    return value.get('ipv4addr') if isinstance(value, dict) else value
+
+
+def _error(code, text):
+    return {'Error': '{0}: {1}'.format(code, text), 'code': code,
+            'text': text}
+
+
+class _server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class _handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.wapi.lock:
+            self.server.wapi.connections += 1
+
+    def _dispatch(self, method):
+        wapi = self.server.wapi
+        with wapi.lock:
+            wapi.requests += 1
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        split = urlsplit(self.path)
+        if split.path.startswith('/http_direct_file_io/'):
+            ok, cookie = wapi.authenticate(self.headers)
+            status, data = 401, b''
+            if ok:
+                token = split.path.split('/')[2].rpartition('-')[2]
+                status, data = wapi.file_io(method, token, self.headers,
+                                            body)
+            return self._reply_raw(status, data, cookie)
+        body = body.decode('utf-8')
+        path = unquote(split.path.split('/', 3)[-1])
+        query = parse_qsl(split.query, keep_blank_values=True)
+        ok, cookie = wapi.authenticate(self.headers)
+        headers = {}
+        if wapi.inject():
+            status, data = wapi.error_status, _error(
+                'AdmConProtoError', 'Injected error')
+            if wapi.retry_after is not None:
+                headers['Retry-After'] = str(wapi.retry_after)
+        elif not ok:
+            status, data = 401, _error('AdmConAuthError', 'Unauthorized')
+        elif path == 'logout':
+            wapi.logout(self.headers)
+            status, data = 200, ''
+        else:
+            status, data = wapi.handle(method, path, query, body)
+        self._reply(status, data, cookie, headers)
+
+    def _reply(self, status, data, cookie=None, headers={}):
+        payload = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        if cookie is not None:
+            self.send_header('Set-Cookie',
+                             'ibapauth="{0}"; httponly; Path=/'.format(cookie))
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _reply_raw(self, status, data, cookie=None):
+        self.send_response(status)
+        if cookie is not None:
+            self.send_header('Set-Cookie',
+                             'ibapauth="{0}"; httponly; Path=/'.format(cookie))
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
@@ -0,0 +1,933 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import warnings
+import infoblox
+from infoblox import aio
+from infoblox.test.fake_wapi import FakeWAPI
+
+
+class ClientTest(unittest.TestCase):
+    """
+    Offline tests of the client against the in-process stand-in WAPI
+    """
+    def setUp(self):
+        self.errors = []
+        self.server = FakeWAPI().start()
+        self.iblox = infoblox.infoblox(auth=self.server.auth,
+                                       callback=self.errors.append)
+
+    def tearDown(self):
+        del(self.iblox)
+        self.server.stop()
+
+    def test_pooled_session(self):
+        for i in range(20):
+            self.assertTrue(self.iblox.a('a{0}.example.com'.format(i))
+                                .add('10.0.0.{0}'.format(i)) == 0)
+        self.assertEqual(len(self.server.find('record:a')), 20)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_handles_share_session(self):
+        host = self.iblox.host('foo.example.com')
+        self.assertTrue(host.infoblox_.session is self.iblox.session)
+        self.assertTrue(host.add('10.0.0.1') == 0)
+        self.assertEqual(self.iblox.host('foo.example.com')
+                             .fetch()['name'], 'foo.example.com')
+        self.assertEqual(self.errors, [])
+
+    def test_session_cookie(self):
+        for i in range(5):
+            self.iblox.host('foo{0}.example.com'.format(i)).fetch()
+        self.assertEqual(self.server.logins, 1)
+        self.assertTrue('ibapauth' in self.iblox.session.cookies)
+
+    def test_reauth_on_expiry(self):
+        self.server.sessions.clear()
+        self.assertTrue(self.iblox.a('foo.example.com').add('10.0.0.1') == 0)
+        self.assertEqual(self.server.logins, 2)
+        self.assertEqual(self.errors, [])
+
+    def test_keepalive_refresh(self):
+        server = FakeWAPI(session_timeout=0.6).start()
+        iblox = infoblox.infoblox(auth=server.auth, keepalive=0.2)
+        time.sleep(1.5)
+        iblox.grid()
+        self.assertEqual(server.logins, 1)
+        del(iblox)
+        server.stop()
+
+    def test_lazy_auth(self):
+        before = (self.server.requests, self.server.logins)
+        iblox = infoblox.infoblox(auth=self.server.auth, lazy_auth=True,
+                                  keepalive=None)
+        self.assertEqual((self.server.requests, self.server.logins), before)
+        self.assertTrue(iblox.a('foo.example.com').add('10.0.0.1') == 0)
+        self.assertEqual(self.server.logins, before[1] + 1)
+        del(iblox)
+
+        auth = dict(self.server.auth, passwd='wrong')
+        iblox = infoblox.infoblox(auth=auth, lazy_auth=True, keepalive=None)
+        self.assertEqual(iblox.a('foo.example.com').add('10.0.0.2'), 401)
+        del(iblox)
+
+    def test_logout(self):
+        iblox = infoblox.infoblox(auth=self.server.auth)
+        self.assertEqual(len(self.server.sessions), 2)
+        del(iblox)
+        self.assertEqual(len(self.server.sessions), 1)
+
+    def test_threads(self):
+        iblox = infoblox.infoblox(auth=self.server.auth, pool_maxsize=64,
+                                  callback=self.errors.append)
+        filters = list(warnings.filters)
+        # Further clients do not add the warning filter again
+        other = infoblox.infoblox(auth=self.server.auth, lazy_auth=True)
+        del(other)
+        self.assertEqual(warnings.filters, filters)
+        failures = []
+
+        def worker(n):
+            for i in range(10):
+                name = 't{0}-{1}.example.com'.format(n, i)
+                if (iblox.a(name).add('10.8.{0}.{1}'.format(n, i)) != 0 or
+                        iblox.a(name).update(ttl=n) != 0 or
+                        iblox.a(name).fetch(ttl=True)['ttl'] != n or
+                        (i % 2 and iblox.a(name).delete() != 0)):
+                    failures.append(name)
+
+        threads = [threading.Thread(target=worker, args=(n,))
+                   for n in range(64)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(failures, [])
+        self.assertEqual(self.errors, [])
+        self.assertEqual(len(self.server.find('record:a')), 64 * 5)
+        self.assertEqual(warnings.filters, filters)
+        self.assertTrue(self.server.connections <= 64 + 1)
+        del(iblox)
+
+    def test_map(self):
+        items = [('m{0}.example.com'.format(i), '10.9.0.{0}'.format(i))
+                 for i in range(40)]
+        bulk = self.iblox.map(lambda i: self.iblox.a(i[0]).add(i[1]), items,
+                              workers=8)
+        self.assertEqual(bulk.results, [0] * 40)
+        self.assertEqual(len(self.server.find('record:a')), 40)
+
+        names = [i[0] for i in items]
+        names.insert(3, 'missing.example.com')
+        bulk = self.iblox.map(lambda n: self.iblox.a(n).delete(), names,
+                              workers=8)
+        self.assertEqual(bulk.results, [404 if i == 3 else 0
+                                        for i in range(41)])
+        self.assertEqual([e[:2] for e in bulk.errors],
+                         [(3, 'missing.example.com')])
+        self.assertEqual(self.errors, [])
+        stats = bulk.stats()
+        self.assertEqual((stats['count'], stats['errors']), (41, 1))
+        self.assertTrue(stats['throughput'] > 0)
+        self.assertTrue(stats['p99'] >= stats['p50'] > 0)
+
+        bulk = self.iblox.map(lambda i: 1 // i, [1, 0])
+        self.assertEqual(bulk.results, [1, None])
+        self.assertEqual(bulk.errors[0][:2], (1, 0))
+        self.iblox.a('m99.example.com').delete()
+        self.assertEqual(len(self.errors), 1)
+
+    def test_injection(self):
+        server = FakeWAPI(latency=(0.01, 0.02), error_rate=0.5,
+                          seed=1).start()
+        iblox = infoblox.infoblox(auth=server.auth, keepalive=None,
+                                  lazy_auth=True, retries=0)
+        start = time.time()
+        codes = [iblox.get('grid').status_code for _ in range(20)]
+        self.assertTrue(time.time() - start >= 0.2)
+        self.assertEqual(codes.count(503), server.injected)
+        self.assertTrue(0 < server.injected < 20)
+        server.error_rate = 0
+        self.assertEqual(iblox.get('?_schema').json()['supported_versions'],
+                         ['2.6.1'])
+        del(iblox)
+        server.stop()
+
+    def test_hooks(self):
+        calls = []
+        hook = self.iblox.add_hook(calls.append)
+        metrics = self.iblox.metrics(buckets=(0.5, 5))
+        self.assertTrue(self.iblox.a('h.example.com').add('10.0.0.1') == 0)
+        self.iblox.a('h.example.com').update(ttl=5)
+        self.iblox.a('missing.example.com').delete()
+        self.assertEqual([(c['method'], c['object'], c['status'])
+                          for c in calls],
+                         [('POST', 'record:a', 201), ('PUT', 'record:a', 200),
+                          ('GET', 'record:a', 200),
+                          ('DELETE', 'None', 404)])
+        self.assertTrue(calls[0]['sent'] > 0 and calls[0]['received'] > 0)
+        self.assertTrue(all(c['latency'] >= 0 for c in calls))
+
+        self.assertEqual(metrics.stats()[('DELETE', 'None')]['errors'], 1)
+        text = metrics.prometheus()
+        self.assertTrue('infoblox_wapi_requests_total{method="POST",'
+                        'object="record:a",status="201"} 1' in text)
+        self.assertTrue('infoblox_wapi_request_seconds_bucket{method="PUT",'
+                        'object="record:a",le="+Inf"} 1' in text)
+        statsd = infoblox._internal._statsd()
+        self.assertEqual(statsd.lines(calls[0])[0],
+                         'infoblox.wapi.post.record_a.status.201:1|c')
+        statsd.close()
+
+        self.iblox.remove_hook(hook)
+        self.iblox.remove_hook(metrics)
+        self.iblox.grid()
+        self.assertEqual(len(calls), 4)
+
+    def test_retry(self):
+        iblox = infoblox.infoblox(auth=self.server.auth, keepalive=None,
+                                  retries=10, backoff=0.001)
+        self.server.error_rate = 0.5
+        self.assertEqual([iblox.get('grid').status_code for _ in range(20)],
+                         [200] * 20)
+        self.assertTrue(self.server.injected > 0)
+        self.server.error_rate = 0
+        host = iblox.host('r.example.com')
+        self.assertEqual(host.add('10.0.0.2'), 0)
+
+        self.server.error_rate = 1
+        before = self.server.requests
+        self.assertEqual(iblox.a('r.example.com').add('10.0.0.1'), 503)
+        self.assertEqual(self.server.requests, before + 1)
+        before = self.server.requests
+        self.assertEqual(iblox.grid().restart(), 503)
+        self.assertEqual(self.server.requests, before + 11 * 2)
+        # Modifiers would be applied twice if repeated
+        before = self.server.requests
+        self.assertEqual(host.update(ip='10.0.0.3', mac='00:00:00:00:00:01',
+                                     old_ip='10.0.0.2'), 503)
+        self.assertEqual(self.server.requests, before + 1)
+        before = self.server.requests
+        self.assertEqual(host.update(ttl=60), 503)
+        self.assertEqual(self.server.requests, before + 11)
+        del(iblox)
+
+        self.server.retry_after = 0.3
+        iblox = infoblox.infoblox(auth=self.server.auth, keepalive=None,
+                                  lazy_auth=True, retries=1, backoff=0.001)
+        start = time.time()
+        self.assertEqual(iblox.get('grid').status_code, 503)
+        self.assertTrue(time.time() - start >= 0.3)
+        del(iblox)
+
+    def test_breaker(self):
+        iblox = infoblox.infoblox(auth=self.server.auth, keepalive=None,
+                                  retries=0, breaker_threshold=3,
+                                  breaker_reset=0.3)
+        self.server.error_rate = 1
+        for _ in range(3):
+            self.assertEqual(iblox.get('grid').status_code, 503)
+        self.assertEqual(iblox.breaker.state, 'open')
+        before = self.server.requests
+        resp = iblox.get('grid')
+        self.assertEqual((resp.status_code, resp.json()['code']),
+                         (503, 'CircuitOpen'))
+        self.assertEqual(self.server.requests, before)
+
+        time.sleep(0.3)
+        self.server.error_rate = 0
+        self.assertEqual(iblox.breaker.state, 'half-open')
+        self.assertEqual(iblox.get('grid').status_code, 200)
+        self.assertEqual(iblox.breaker.state, 'closed')
+        del(iblox)
+
+    def test_rate_limit(self):
+        iblox = infoblox.infoblox(auth=self.server.auth, keepalive=None,
+                                  read_rate=1000, write_rate=40,
+                                  rate_burst=1)
+        start = time.time()
+        bulk = iblox.map(lambda i: iblox.a('rl{0}.example.com'.format(i))
+                                        .add('10.0.0.{0}'.format(i)),
+                         range(9), workers=8)
+        self.assertEqual(bulk.results, [0] * 9)
+        self.assertTrue(time.time() - start >= 0.2)
+        del(iblox)
+
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'wapi')
+            clients = [infoblox.infoblox(auth=self.server.auth,
+                                         keepalive=None, lazy_auth=True,
+                                         read_rate=40, rate_burst=1,
+                                         rate_file=path) for _ in range(2)]
+            start = time.time()
+            threads = [threading.Thread(target=lambda c=c: [c.get('grid')
+                                                            for _ in range(5)])
+                       for c in clients]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertTrue(time.time() - start >= 0.2)
+            self.assertTrue(os.path.exists(path + '.read'))
+            self.assertFalse(os.path.exists(path + '.write'))
+            del(clients)
+
+            # Without blocking, a bucket locked by another process is
+            # reported busy instead of being waited on
+            import fcntl
+            limiter = infoblox._internal._rate_limiter(40, path=path)
+            with open(path + '.read', 'rb') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                self.assertEqual(limiter.reserve('GET', blocking=False),
+                                 None)
+                fcntl.flock(f, fcntl.LOCK_UN)
+            self.assertTrue(limiter.reserve('GET', blocking=False) >= 0)
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_batch(self):
+        with self.iblox.batch(chunk_size=3) as b:
+            for i in range(7):
+                self.assertTrue(b.a('b{0}.example.com'.format(i))
+                                 .add('10.0.1.{0}'.format(i)) == 0)
+            self.assertTrue(b.host('foo.example.com').add('10.0.1.100') == 0)
+        self.assertEqual(len(b.results), 8)
+        self.assertEqual([r.split(':', 2)[-1] for r in b.results[:7]],
+                         ['b{0}.example.com'.format(i) for i in range(7)])
+        self.assertEqual(len(self.server.find('record:a')), 7)
+        self.assertEqual(self.errors, [])
+
+        with self.iblox.batch() as b:
+            b.a('b0.example.com').update(ttl=60)
+            b.a('b1.example.com').delete()
+        self.assertEqual(self.server.find('record:a',
+                                          name='b0.example.com')[0]['ttl'], 60)
+        self.assertEqual(len(self.server.find('record:a')), 6)
+
+    def test_batch_abort(self):
+        with self.iblox.batch(chunk_size=2) as b:
+            b.a('x.example.com').add('10.0.2.1')
+            b.put('record:a/missing:x.example.com', '{"ttl": 5}')
+            b.a('y.example.com').add('10.0.2.2')
+        self.assertEqual(b.errors, 2)
+        self.assertEqual(b.results[2], None)
+        self.assertEqual(self.server.find('record:a'), [])
+        self.assertEqual(len(self.errors), 1)
+
+    def test_iter_paging(self):
+        self.server.load('record:host', [
+            {'name': 'h{0}.example.com'.format(i),
+             'ipv4addrs': [{'ipv4addr': '10.1.0.{0}'.format(i)}]}
+            for i in range(25)])
+        self.server.load('record:host', [{'name': 'h.other.com'}])
+        hosts = self.iblox.iter_hosts(zone='example.com', page_size=10)
+        self.assertEqual([h['name'] for h in hosts],
+                         ['h{0}.example.com'.format(i) for i in range(25)])
+        self.assertEqual(self.server.pages, {})
+        self.assertEqual(len(list(self.iblox.iter_hosts(page_size=100))), 26)
+
+        self.server.load('network', [{'network': '10.2.0.0/24'}])
+        self.assertEqual([n['network'] for n in self.iblox.iter_networks()],
+                         ['10.2.0.0/24'])
+        self.assertEqual(list(self.iblox.iter_leases(network='10.2.0.0/24')),
+                         [])
+
+    def test_stream(self):
+        self.server.load('record:a', [
+            {'name': u'\u00e9{0}.example.com'.format(i),
+             'ipv4addr': '10.11.0.{0}'.format(i)} for i in range(30)])
+        iblox = infoblox.infoblox(auth=self.server.auth, keepalive=None,
+                                  chunk_size=7)
+        names = [u'\u00e9{0}.example.com'.format(i) for i in range(30)]
+        self.assertEqual([a['name'] for a in iblox.iter_get('record:a')],
+                         names)
+        self.assertEqual([a['name'] for a in iblox.iter_a(page_size=8)],
+                         names)
+        records = iblox.iter_get('record:a')
+        next(records)
+        records.close()
+        self.assertEqual(list(iblox.iter_get('record:nope')), [])
+        self.assertEqual(iblox.get('grid').status_code, 200)
+        del(iblox)
+
+    def test_compact(self):
+        self.server.load('record:host', [
+            {'name': 'c{0}.example.com'.format(i), 'view': 'default',
+             'ipv4addrs': [{'ipv4addr': '10.12.0.{0}'.format(i),
+                            'host': 'c{0}.example.com'.format(i),
+                            'mac': '00:00:00:00:00:{0:02x}'.format(i)}],
+             'extattrs': {'Site': {'value': 'dc1'}}} for i in range(5)])
+        self.server.load('network', [{'network': '10.12.0.0/24',
+                                      'network_view': 'default'}])
+        dicts = list(self.iblox.iter_hosts())
+        hosts = list(self.iblox.iter_hosts(compact=True))
+        self.assertEqual(hosts, dicts)
+        self.assertFalse(hasattr(hosts[0], '__dict__'))
+        self.assertEqual(hosts[0].name, 'c0.example.com')
+        self.assertEqual(hosts[1].ipv4addrs[0].ipv4addr, '10.12.0.1')
+        self.assertEqual(hosts[1].ipv4addrs[0]._ipv4addr, 0x0a0c0001)
+        self.assertTrue(hosts[0].view is hosts[1].view)
+        self.assertEqual(hosts[2]['ipv4addrs'][0]['mac'],
+                         '00:00:00:00:00:02')
+        self.assertEqual(hosts[0].get('ttl', 60), 60)
+        self.assertEqual(hosts[0].to_dict(), dicts[0])
+
+        network = list(self.iblox.iter_networks(compact=True))[0]
+        self.assertEqual(network._network, (0x0a0c0000, 24))
+        self.assertEqual(network['network'], '10.12.0.0/24')
+
+        iblox = infoblox.infoblox(auth=self.server.auth, keepalive=None,
+                                  compact=True)
+        host = iblox.host('c3.example.com')
+        self.assertEqual(host.fetch().name, 'c3.example.com')
+        self.assertTrue(host.update(mac='00:00:00:00:00:33') == 0)
+        self.assertEqual(host.fetch(ipv4addrs=True).ipv4addrs[0].mac,
+                         '00:00:00:00:00:33')
+        self.assertEqual(type(next(iblox.iter_get('record:host'))).__name__,
+                         '_host_record')
+        self.assertTrue(isinstance(next(iblox.iter_get('grid')), dict))
+        del(iblox)
+
+    def test_merged_update(self):
+        calls = []
+        host = self.iblox.host('u.example.com')
+        self.assertTrue(host.add('10.14.0.1') == 0)
+        self.server.find('record:host')[0]['ipv4addrs'].append(
+            {'ipv4addr': '10.14.0.2'})
+        self.iblox.add_hook(calls.append)
+        self.assertTrue(host.update(ip='10.14.0.3', mac='00:00:00:00:00:44',
+                                    old_ip='10.14.0.1', ttl=30,
+                                    comment='moved',
+                                    extattrs={'Site': 'lab'}) == 0)
+        self.assertTrue(host.update(extattrs={'Owner': {'value': 'ops'}})
+                        == 0)
+        self.assertEqual([c['method'] for c in calls], ['PUT', 'PUT'])
+        record = self.server.find('record:host')[0]
+        self.assertEqual([(a['ipv4addr'], a.get('mac'))
+                          for a in record['ipv4addrs']],
+                         [('10.14.0.2', None),
+                          ('10.14.0.3', '00:00:00:00:00:44')])
+        self.assertEqual((record['ttl'], record['comment']), (30, 'moved'))
+        self.assertEqual(record['extattrs'], {'Site': {'value': 'lab'},
+                                              'Owner': {'value': 'ops'}})
+
+        self.assertTrue(self.iblox.a('u.example.com').add('10.14.1.1') == 0)
+        self.assertTrue(self.iblox.cname('w.example.com')
+                        .add('u.example.com') == 0)
+        self.assertTrue(self.iblox.srv('_s._tcp.example.com', 80)
+                        .add('u.example.com') == 0)
+        del calls[:]
+        self.assertTrue(self.iblox.a('u.example.com').update(
+            ip='10.14.1.2', ttl=40, comment='a') == 0)
+        self.assertTrue(self.iblox.cname('w.example.com').update(
+            canonical='v.example.com', ttl=50) == 0)
+        self.assertTrue(self.iblox.srv('_s._tcp.example.com', 80).update(
+            weight=5, priority=7) == 0)
+        self.assertEqual(self.iblox.a('u.example.com').update(), 0)
+        self.assertEqual([c['method'] for c in calls if c['method'] != 'GET'],
+                         ['PUT'] * 3)
+        a = self.server.find('record:a')[0]
+        self.assertEqual((a['ipv4addr'], a['ttl'], a['comment']),
+                         ('10.14.1.2', 40, 'a'))
+        cname = self.server.find('record:cname')[0]
+        self.assertEqual((cname['canonical'], cname['ttl']),
+                         ('v.example.com', 50))
+        srv = self.server.find('record:srv')[0]
+        self.assertEqual((srv['target'], srv['weight'], srv['priority']),
+                         ('u.example.com', 5, 7))
+
+        host = self.iblox.host('m.example.com')
+        self.assertTrue(host.add('10.14.3.1', '00:00:00:00:00:55') == 0)
+        self.server.find('record:host', name='m.example.com')[0][
+            'ipv4addrs'].append({'ipv4addr': '10.14.3.2'})
+        self.assertTrue(host.update(ip='10.14.3.3') == 0)
+        self.assertTrue(host.update(ip='10.14.3.4', old_ip='10.14.3.3') == 0)
+        self.assertTrue(host.update(comment='m', old_ip='10.14.3.4') == 0)
+        record = self.server.find('record:host', name='m.example.com')[0]
+        self.assertEqual(sorted((a['ipv4addr'], a.get('mac'))
+                                for a in record['ipv4addrs']),
+                         [('10.14.3.2', None),
+                          ('10.14.3.4', '00:00:00:00:00:55')])
+        self.assertEqual(self.errors, [])
+
+    def test_csv(self):
+        self.server.load('record:a', [{'name': 'dup.example.com',
+                                       'ipv4addr': '10.13.0.1',
+                                       'comment': 'https://wiki/x'}])
+        # Only queries starting with a scheme are taken as full URLs
+        self.assertEqual(len(self.iblox.get('record:a?comment=https://wiki/x')
+                             .json()), 1)
+        self.assertEqual(len(list(self.iblox.iter_a(
+            comment='https://wiki/x'))), 1)
+        self.assertEqual(infoblox._internal.metrics._object(
+            'record:a?comment=https://wiki/x'), 'record:a')
+        records = [{'name': 'i{0}.example.com'.format(i),
+                    'ipv4addr': '10.13.1.{0}'.format(i), 'ttl': i,
+                    'extattrs': {'Site': {'value': 'dc{0}'.format(i % 2)}}}
+                   for i in range(50)]
+        records.insert(10, {'name': 'dup.example.com',
+                            'ipv4addr': '10.13.0.1'})
+        job = self.iblox.csv_import()
+        self.assertTrue(job.run(records, 'record:a', interval=0.01) == 0)
+        self.assertEqual(job.rows, 51)
+        self.assertEqual(job.status, 'COMPLETED')
+        self.assertEqual((job.task['lines_processed'],
+                          job.task['lines_failed']), (51, 1))
+        self.assertEqual(job.errors, [{
+            'object': 'arecord', 'error': 'Duplicate object',
+            'fields': {'fqdn': 'dup.example.com', 'address': '10.13.0.1',
+                       'view': '', 'ttl': '', 'comment': ''}}])
+        a = self.server.find('record:a', name='i7.example.com')[0]
+        self.assertEqual((a['ipv4addr'], a['ttl'], a['extattrs']),
+                         ('10.13.1.7', 7, {'Site': {'value': 'dc1'}}))
+        self.assertEqual(self.server.files, {})
+
+        hosts = [{'name': 'ch.example.com', 'view': 'default',
+                  'ipv4addrs': [{'ipv4addr': '10.13.2.1'},
+                                {'ipv4addr': '10.13.2.2',
+                                 'mac': '00:00:00:00:00:01'}]}]
+        expired = []
+
+        def expire(call):
+            # The session expires between uploadinit and the upload, which
+            # is sent again after logging back in
+            if call['object'] == 'fileop' and not expired:
+                expired.append(self.server.logins)
+                self.server.sessions.clear()
+
+        hook = self.iblox.add_hook(expire)
+        job = self.iblox.csv_import()
+        self.assertTrue(job.run(hosts, 'record:host', interval=0.01) == 0)
+        self.iblox.remove_hook(hook)
+        self.assertEqual(self.server.logins, expired[0] + 1)
+        self.assertEqual((job.rows, job.errors), (2, []))
+        host = self.iblox.host('ch.example.com').fetch(ipv4addrs=True)
+        self.assertEqual([(i['ipv4addr'], i.get('mac'))
+                          for i in host['ipv4addrs']],
+                         [('10.13.2.1', None),
+                          ('10.13.2.2', '00:00:00:00:00:01')])
+
+        path = os.path.join(tempfile.mkdtemp(), 'a.csv')
+        try:
+            self.assertTrue(self.iblox.csv_export('record:a', path) == 0)
+            with open(path) as f:
+                lines = f.read().splitlines()
+            os.remove(path)
+            self.assertEqual(self.iblox.csv_export('zone_auth', path), None)
+            self.assertFalse(os.path.exists(path))
+
+            # A failed download leaves neither a partial file nor a
+            # clobbered one behind
+            with open(path, 'w') as f:
+                f.write('old')
+            hook = self.iblox.add_hook(
+                lambda call: call['object'] == 'fileop' and
+                self.server.files.clear())
+            self.assertEqual(self.iblox.csv_export('record:a', path), None)
+            self.iblox.remove_hook(hook)
+            self.assertEqual(os.listdir(os.path.dirname(path)), ['a.csv'])
+            with open(path) as f:
+                self.assertEqual(f.read(), 'old')
+        finally:
+            shutil.rmtree(os.path.dirname(path))
+        self.assertEqual(lines[0], 'header-arecord,fqdn*,address*,view,ttl,'
+                                   'comment')
+        self.assertEqual(len([l for l in lines if l.startswith('arecord')]),
+                         51)
+        self.assertEqual(len(self.errors), 2)
+
+    def test_reconcile(self):
+        self.server.load('record:a', [
+            {'name': 'r{0}.example.com'.format(i),
+             'ipv4addr': '10.14.0.{0}'.format(i), 'ttl': 60}
+            for i in range(10)] + [{'name': 'other.example.org',
+                                    'ipv4addr': '10.14.1.1'}])
+        self.server.load('record:host', [
+            {'name': 'rh.example.com',
+             'ipv4addrs': [{'ipv4addr': '10.14.2.1', 'mac': 'aa'}]}])
+        desired = {
+            'record:a': [{'name': 'r{0}.example.com'.format(i),
+                          'ipv4addr': '10.14.0.{0}'.format(i),
+                          'ttl': 300 if i < 3 else 60}
+                         for i in range(8)] +
+                        [{'name': 'new.example.com', 'ipv4addr': '10.14.0.99'}],
+            'record:host': [{'name': 'rh.example.com',
+                             'ipv4addrs': [{'ipv4addr': '10.14.2.1'}]}],
+            'record:cname': [{'name': 'www.example.com',
+                              'canonical': 'r0.example.com'}]}
+        before = self.server.requests
+        plan = self.iblox.reconcile(desired, zone='example.com',
+                                    page_size=4)
+        self.assertEqual(self.server.requests - before, 3 + 1 + 1)
+        self.assertEqual(plan.report(chunk_size=3), {
+            'add': 2, 'update': 3, 'delete': 2, 'unchanged': 6, 'reads': 5,
+            'calls': {'batched': 3, 'unbatched': 7}})
+        self.assertEqual(str(plan), '2 to add, 3 to update, 2 to delete, '
+                                    '6 unchanged - 5 reads, 1 write calls '
+                                    'batched (7 unbatched)')
+        self.assertEqual(plan.updates[0][2], {'ttl': 300})
+
+        before = self.server.requests
+        self.assertTrue(plan.apply(chunk_size=3) == 0)
+        self.assertEqual(self.server.requests - before, 3)
+        self.assertEqual(len(self.server.find('record:a')), 10)
+        self.assertEqual(self.server.find('record:a', name='r1.example.com')
+                         [0]['ttl'], 300)
+        self.assertEqual(self.server.find('record:a', name='r9.example.com'),
+                         [])
+        self.assertEqual(len(self.server.find('record:cname')), 1)
+
+        plan = self.iblox.reconcile(desired, zone='example.com')
+        self.assertEqual((plan.changes, plan.unchanged), (0, 11))
+        self.assertTrue(plan.apply(batch=False) == 0)
+
+        self.server.load('record:a', [{'name': 'gone.example.com',
+                                       'ipv4addr': '10.14.0.50'}])
+        self.assertRaises(ValueError, self.iblox.reconcile, desired)
+        self.assertEqual(self.iblox.reconcile(desired, delete=False).deletes,
+                         [])
+        plan = self.iblox.reconcile(desired, zone='example.com')
+        self.assertEqual(len(plan.deletes), 1)
+        self.assertTrue(self.iblox.a('gone.example.com').delete() == 0)
+        self.assertEqual(plan.apply(batch=False), 404)
+        self.assertEqual(plan.errors[0][:2],
+                         (('delete', 'record:a', plan.deletes[0][1]), 404))
+        self.assertEqual(len(self.errors), 1)
+
+    def test_restart_scheduler(self):
+        self.assertTrue(self.iblox.grid().restart(
+            member_order='SIMULTANEOUSLY', service_option='DNS') == 0)
+        self.assertEqual(self.server.restarts[-1], {
+            'member_order': 'SIMULTANEOUSLY', 'service_option': 'DNS',
+            'restart_option': 'RESTART_IF_NEEDED'})
+
+        self.server.restart_time = 0.1
+        scheduler = self.iblox.restart_scheduler(
+            debounce=0.1, max_delay=2, sequential_delay=2, poll_interval=0.02)
+        tickets = []
+
+        def worker():
+            tickets.append(self.iblox.request_restart())
+
+        threads = [threading.Thread(target=worker) for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(set(id(t) for t in tickets)), 1)
+        self.assertEqual(tickets[0].wait(5), 0)
+        self.assertEqual((scheduler.requests, scheduler.restarts), (20, 1))
+        self.assertEqual(len(self.server.restarts), 2)
+        self.assertEqual(self.server.restarts[-1]['sequential_delay'], 2)
+        self.assertTrue(tickets[0].finished - tickets[0].sent >= 0.1)
+        self.assertEqual(tickets[0].status['success'], 2)
+
+        scheduler.max_delay = 0.25
+        start = time.time()
+        while time.time() - start < 0.8:
+            ticket = self.iblox.request_restart()
+            time.sleep(0.02)
+        self.assertEqual(ticket.wait(5), 0)
+        self.assertTrue(3 <= scheduler.restarts <= 5)
+        self.assertEqual(scheduler.flush(), None)
+        self.assertEqual(self.errors, [])
+
+        # Only restarts made if needed are retried
+        iblox = infoblox.infoblox(auth=self.server.auth, keepalive=None,
+                                  retries=2, backoff=0.01)
+        grid = iblox.grid()
+        self.server.error_rate = 1
+        for option, sent in (('RESTART_IF_NEEDED', 3), ('FORCE_RESTART', 1)):
+            before = self.server.requests
+            self.assertEqual(grid.restart(restart_option=option), 503)
+            self.assertEqual(self.server.requests - before, sent)
+        self.server.error_rate = 0
+        del(iblox)
+
+    def test_restart_affected(self):
+        for i in range(1, 6):
+            self.server.create('member', {'host_name': 'm{0}'.format(i)})
+        self.server.create('zone_auth', {
+            'fqdn': 'example.com', 'grid_primary': [{'name': 'm1'}],
+            'grid_secondaries': [{'name': 'm2'}]})
+        self.server.create('zone_auth', {'fqdn': 'other.com',
+                                         'ns_group': 'ext'})
+        self.server.create('nsgroup', {'name': 'ext',
+                                       'grid_primary': [{'name': 'm3'}]})
+        self.server.create('network', {'network': '10.0.0.0/24',
+                                       'members': [{'name': 'm2'},
+                                                   {'name': 'm4'}]})
+        iblox = infoblox.infoblox(auth=self.server.auth,
+                                  callback=self.errors.append,
+                                  track_changes=True)
+        self.assertEqual(iblox.restart_affected(), [])
+        self.assertTrue(iblox.a('www.sub.example.com').add('10.1.0.1') == 0)
+        self.assertTrue(iblox.host('h.example.com').add(
+            '10.0.0.5', '00:11:22:33:44:55') == 0)
+        self.assertTrue(self.iblox.a('untracked.other.com')
+                        .add('10.1.0.2') == 0)
+        self.assertEqual(iblox.affected_members(), {
+            'm1': ['DNS'], 'm2': ['DHCP', 'DNS'], 'm4': ['DHCP']})
+
+        self.server.restart_time = 0.1
+        calls = iblox.restart_affected(sequential_delay=0)
+        # m1/m2 share example.com and m2/m4 the network: one sequential call
+        self.assertEqual(calls, [{
+            'members': ['m1', 'm2', 'm4'], 'service_option': 'ALL',
+            'restart_option': 'RESTART_IF_NEEDED',
+            'member_order': 'SEQUENTIALLY', 'sequential_delay': 0}])
+        self.assertEqual(self.server.restarts[-1:], calls)
+        calls = infoblox._internal._restart_calls(
+            {'m1': set(['DNS']), 'm4': set(['DHCP'])},
+            [set(['m1', 'm2']), set(['m2', 'm4'])], set())
+        self.assertEqual([(c['members'], c['service_option'],
+                           c['member_order']) for c in calls],
+                         [(['m4'], 'DHCP', 'SIMULTANEOUSLY'),
+                          (['m1'], 'DNS', 'SIMULTANEOUSLY')])
+        self.assertEqual(iblox.restart_affected(), [])
+
+        self.assertTrue(iblox.host('h.example.com').update(
+            ip='10.0.0.6', mac='00:11:22:33:44:66') == 0)
+        self.assertEqual(iblox.affected_members(), {
+            'm1': ['DNS'], 'm2': ['DHCP', 'DNS'], 'm4': ['DHCP']})
+        self.assertEqual(iblox.tracker.changes()[1],
+                         set(['10.0.0.5', '10.0.0.6']))
+        iblox.restart_affected(sequential_delay=0)
+
+        self.assertTrue(iblox.a('www.sub.example.com').update(ttl=60) == 0)
+        self.assertTrue(iblox.a('mail.other.com').add('10.1.0.3') == 0)
+        calls = iblox.restart_affected(dry_run=True, sequential_delay=0)
+        self.assertEqual(calls, [{
+            'members': ['m1', 'm2', 'm3'], 'service_option': 'DNS',
+            'restart_option': 'RESTART_IF_NEEDED',
+            'member_order': 'SEQUENTIALLY', 'sequential_delay': 0}])
+        self.assertEqual(iblox.restart_affected(sequential_delay=0), calls)
+
+        self.assertTrue(iblox.a('www.unknown.org').add('10.1.0.4') == 0)
+        self.assertEqual(iblox.restart_affected(dry_run=True)[0], {
+            'service_option': 'DNS', 'restart_option': 'RESTART_IF_NEEDED',
+            'member_order': 'SEQUENTIALLY', 'sequential_delay': 10})
+        self.assertEqual(self.errors, [])
+        self.assertRaises(ValueError, self.iblox.restart_affected)
+        del(iblox)
+
+    def test_lazy_ref(self):
+        before = self.server.requests
+        hosts = [self.iblox.host('l{0}.example.com'.format(i))
+                 for i in range(10)]
+        self.assertEqual(self.server.requests, before)
+        for i, host in enumerate(hosts):
+            self.assertTrue(host.add('10.4.0.{0}'.format(i)) == 0)
+        self.assertEqual(self.server.requests, before + 10)
+        self.assertTrue(hosts[0]._ref_.startswith('record:host/'))
+        self.assertEqual(self.server.requests, before + 10)
+
+        a = self.iblox.a('l.example.com')
+        self.assertEqual(a._ref_, None)
+        self.assertTrue(a.add('10.4.1.1') == 0)
+        self.assertTrue(a.update(ttl=10) == 0)
+        self.assertTrue(a.delete() == 0)
+        self.assertEqual(self.server.find('record:a'), [])
+
+        # A failed delete keeps the _ref, and unicode _refs are cached
+        host = self.iblox.host('l.example.com')
+        self.assertTrue(host.add('10.4.2.1') == 0)
+        self.server.error_rate, self.server.error_status = 1, 400
+        host.delete()
+        self.server.error_rate = 0
+        before = self.server.requests
+        self.iblox.host('l.example.com').delete()
+        self.assertEqual(self.server.requests, before + 1)
+        self.assertEqual(self.server.find('record:host', name='l.example.com'),
+                         [])
+        a._ref_ = u'record:a/ZG5z:l.example.com/default'
+        self.assertEqual(self.iblox.a('l.example.com')._ref_,
+                         u'record:a/ZG5z:l.example.com/default')
+        self.assertEqual(self.server.requests, before + 1)
+
+    def test_exact_lookup(self):
+        self.server.load('record:a', [
+            {'name': 'web10.example.com', 'ipv4addr': '10.5.0.10'},
+            {'name': 'web1.example.com', 'ipv4addr': '10.5.0.1'},
+            {'name': 'web1.example.com', 'ipv4addr': '10.5.1.1',
+             'view': 'internal'}])
+        self.assertEqual(self.iblox.a('web1.example.com')
+                             .fetch()['ipv4addr'], '10.5.0.1')
+        self.assertEqual(self.iblox.a('web1.example.com', view='internal')
+                             .fetch()['ipv4addr'], '10.5.1.1')
+        self.assertEqual(self.iblox.a('web1.example.com', zone='example.org')
+                             .fetch(), None)
+        self.assertEqual(self.iblox.a('web1', regex=True)
+                             .fetch()['ipv4addr'], '10.5.0.10')
+
+        cname = self.iblox.rpz_cname('web1.example.com')
+        self.assertTrue(cname.add('other.example.com', 'rpz.local') == 0)
+        self.assertEqual(self.iblox.rpz_cname('web1.example.com').fetch()
+                             ['name'], 'web1.example.com.rpz.local')
+        self.assertEqual(self.iblox.rpz_cname('web1.example.com',
+                                              zone='rpz.local').fetch()
+                             ['canonical'], 'other.example.com')
+
+    def test_return_fields(self):
+        self.server.load('record:host', [{
+            'name': 'big.example.com', 'comment': 'x' * 1000,
+            'ipv4addrs': [{'ipv4addr': '10.10.0.{0}'.format(i)}
+                          for i in range(50)]}])
+        calls = []
+        self.iblox.add_hook(calls.append)
+        self.assertTrue(self.iblox.host('big.example.com')
+                            ._ref_.startswith('record:host/'))
+        self.assertTrue(calls[0]['received'] < 200)
+        self.assertEqual(len(self.iblox.host('big.example.com').fetch()
+                                 ['ipv4addrs']), 50)
+
+        self.server.load('record:a', [{'name': 'p.example.com',
+                                       'ipv4addr': '10.10.1.1', 'ttl': 5}])
+        iblox = infoblox.infoblox(auth=self.server.auth, keepalive=None,
+                                  return_fields={'record:a': ['ttl']})
+        self.assertEqual(iblox.a('p.example.com').fetch(),
+                         {'_ref': iblox.a('p.example.com')._ref_, 'ttl': 5})
+        self.assertEqual(iblox.a('p.example.com').fetch(name=True)['name'],
+                         'p.example.com')
+        self.assertEqual(sorted(next(iblox.iter_a())), ['_ref', 'ttl'])
+        del(iblox)
+
+    def test_ref_cache(self):
+        self.server.load('record:a', [{'name': 'c.example.com',
+                                       'ipv4addr': '10.6.0.1'}])
+        before = self.server.requests
+        self.assertTrue(self.iblox.a('c.example.com').update(ttl=1) == 0)
+        self.assertTrue(self.iblox.a('c.example.com').update(ttl=2) == 0)
+        self.assertEqual(self.server.requests, before + 3)
+        self.assertEqual(self.iblox.ref_cache.stats(),
+                         {'hits': 1, 'misses': 1, 'size': 1})
+
+        self.assertTrue(self.iblox.a('c.example.com').delete() == 0)
+        self.assertEqual(self.iblox.a('c.example.com')._ref_, None)
+        self.assertTrue(self.iblox.a('c.example.com').add('10.6.0.2') == 0)
+        self.assertTrue(self.iblox.a('c.example.com').update(ttl=3) == 0)
+        self.assertEqual(self.server.find('record:a')[0]['ttl'], 3)
+
+        name = '_sip._tcp.example.com'
+        for port in (5060, 5061):
+            self.assertTrue(self.iblox.srv(name, port).add('sip.example.com')
+                            == 0)
+        self.assertTrue(self.iblox.srv(name, 5061).update(weight=7) == 0)
+        self.assertTrue(self.iblox.srv(name, 5060).delete() == 0)
+        self.assertEqual([(r['port'], r['weight'])
+                          for r in self.server.find('record:srv')],
+                         [(5061, 7)])
+
+        cache = infoblox._internal._ref_cache(maxsize=2, ttl=0.1)
+        cache.set(1, 'a')
+        cache.set(2, 'b')
+        cache.get(1)
+        cache.set(3, 'c')
+        self.assertEqual((cache.get(1), cache.get(2)), ('a', None))
+        time.sleep(0.2)
+        self.assertEqual(cache.get(3), None)
+
+    def test_next_available_ips(self):
+        self.server.load('network', [{'network': '10.7.0.0/24',
+                                      'comment': 'test'}])
+        self.server.load('record:a', [{'name': 'used.example.com',
+                                       'ipv4addr': '10.7.0.3'}])
+        subnet = self.iblox.subnet('10.7.0.0/24')
+        before = self.server.requests
+        ips = subnet.next_available_ips(5, exclude=['10.7.0.5'])
+        self.assertEqual(self.server.requests, before + 1)
+        self.assertEqual(ips, ['10.7.0.2', '10.7.0.4', '10.7.0.6',
+                               '10.7.0.7', '10.7.0.8'])
+        self.assertEqual(subnet.next_available_ip(), '10.7.0.2')
+        self.assertEqual(subnet.next_available_ip(offset=1), '10.7.0.1')
+
+        names = ['n{0}.example.com'.format(i) for i in range(3)]
+        ips = subnet.next_available_ips(3, hostnames=names)
+        self.assertEqual(ips, ['10.7.0.2', '10.7.0.4', '10.7.0.5'])
+        self.assertEqual(self.iblox.host(names[2]).fetch()['ipv4addrs'][0]
+                             ['ipv4addr'], '10.7.0.5')
+        self.assertEqual(subnet.next_available_ips(2),
+                         ['10.7.0.6', '10.7.0.7'])
+        before = self.server.requests
+        self.assertRaises(ValueError, subnet.next_available_ips, 2, offset=0)
+        self.assertRaises(ValueError, subnet.next_available_ip, offset=-1)
+        self.assertRaises(ValueError, subnet.next_available_ips, 2,
+                          hostnames=names)
+        self.assertEqual(self.server.requests, before)
+
+    def test_network_index(self):
+        self.server.load('network', [
+            {'network': '10.0.0.0/8', 'comment': 'wide'},
+            {'network': '10.8.0.0/16', 'comment': 'mid'},
+            {'network': '10.8.1.0/24', 'comment': 'narrow'},
+            {'network': '10.9.0.0/16', 'comment': 'other'}])
+        self.assertEqual(self.iblox.subnet_from_ip('10.8.1.7').subnet,
+                         '10.0.0.0/8')
+
+        index = self.iblox.network_index(page_size=2)
+        self.assertEqual(len(index), 4)
+        before = self.server.requests
+        self.assertEqual(self.iblox.subnet_from_ip('10.8.1.7').subnet,
+                         '10.8.1.0/24')
+        self.assertEqual(self.iblox.subnet_from_ip('10.8.2.7').comment, 'mid')
+        self.assertEqual(self.iblox.subnet_from_ip('192.168.0.1'), None)
+        self.assertEqual(self.server.requests, before)
+        self.assertEqual([r and r['comment'] for r in index.lookup_many(
+                             ['10.9.9.9', '11.0.0.1', '10.8.1.255',
+                              '10.255.0.1'])],
+                         ['other', None, 'narrow', 'wide'])
+
+        self.server.load('network', [{'network': '10.8.2.0/24',
+                                      'comment': 'new'}])
+        index.update('10.8.2.0/24')
+        self.assertEqual(index.lookup('10.8.2.7')['comment'], 'new')
+        ref = self.server.find('network', network='10.8.1.0/24')[0]['_ref']
+        self.iblox.delete(ref)
+        self.assertEqual(index.update('10.8.1.0/24'), None)
+        self.assertEqual(index.lookup('10.8.1.7')['comment'], 'mid')
+
+    @unittest.skipIf(aio.aiohttp is None, 'aiohttp is not installed')
+    def test_async_client(self):
+        async def run():
+            async with aio.AsyncInfoblox(auth=self.server.auth,
+                                         limit=8) as iblox:
+                metrics = iblox.metrics()
+                rets = await asyncio.gather(*[
+                    iblox.a('x{0}.example.com'.format(i))
+                         .add('10.3.0.{0}'.format(i)) for i in range(50)])
+                self.assertEqual(rets, [0] * 50)
+                a = iblox.a('x1.example.com')
+                self.assertEqual(await a.update(ip='10.3.1.1', ttl=30), 0)
+                self.assertEqual((await a.fetch(ttl=True))['ttl'], 30)
+                self.assertEqual(await a.delete(), 0)
+                host = iblox.host('h.example.com')
+                self.assertEqual(await host.add('10.3.2.1'), 0)
+                self.assertEqual(await host.alias().add('al.example.com'), 0)
+                self.assertEqual(await host.alias().fetch(),
+                                 ['al.example.com'])
+                other = iblox.host('h2.example.com')
+                self.assertEqual(await other.add('10.3.2.2'), 0)
+                # As with the blocking handle
+                self.assertEqual(await other.delete(), 200)
+                names = [r['name'] async for r in
+                         iblox.iter_objects('record:a', page_size=7)]
+                self.assertEqual(len(names), 49)
+                self.assertEqual(await iblox.grid().restart(), 0)
+                self.assertEqual(
+                    metrics.stats()[('POST', 'record:a')]['count'], 50)
+        asyncio.run(run())
+        self.assertEqual(self.iblox.host('h.example.com').delete(), 200)
+        self.assertEqual(len(self.server.find('record:a')), 49)
+        self.assertEqual(len(self.server.sessions), 1)
+        self.assertEqual(self.errors, [])
+        self.assertIs(aio._ssl(False), False)
+        self.assertTrue(aio._ssl(True).check_hostname)
+
+
+if __name__ == "__main__":
+    unittest.main()